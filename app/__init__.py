@@ -5,26 +5,31 @@ from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from datetime import timedelta
 
+from .startup import timed
+
 db = SQLAlchemy()
 
-def create_app(config_name=None):
+def create_app(config_name=None, overrides=None):
     app = Flask(__name__)
-    print('call create app')
-    CORS(app)
-    # app.config.from_object('instance.config.Config')
-    app.config['DEBUG'] = True
-    if config_name:
-        app.config.from_object(f'instance.config.{config_name}')  # Dynamically load config based on config_name
-    else:
-        app.config.from_object('instance.config.Config')
-
-    db.init_app(app)
-    jwt = JWTManager(app)
-    print(app)
-
-    migrate = Migrate(app, db)
-    # In your Flask app config
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+
+    with timed(app, 'config'):
+        CORS(app)
+        # app.config.from_object('instance.config.Config')
+        app.config['DEBUG'] = True
+        if config_name:
+            app.config.from_object(f'instance.config.{config_name}')  # Dynamically load config based on config_name
+        else:
+            app.config.from_object('instance.config.Config')
+        # Applied before the extensions read the config (the database engine is created in db.init_app)
+        app.config.update(overrides or {})
+
+    with timed(app, 'extensions'):
+        db.init_app(app)
+        jwt = JWTManager(app)
+
+        migrate = Migrate(app, db)
+        # In your Flask app config
+        app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 
     @jwt.unauthorized_loader
     def custom_unauthorized_response(callback):
@@ -40,10 +45,52 @@ def create_app(config_name=None):
             "message": "The token is invalid or expired"
         }), 422
 
-    from .routes import main
-    from .auth import auth_blueprint
+    @jwt.user_lookup_error_loader
+    def custom_user_lookup_error(jwt_header, jwt_data):
+        return jsonify({
+            "status": 404,
+            "message": "User not found"
+        }), 404
+
+    with timed(app, 'blueprints'):
+        from . import commands, identity, jobs, llm, metrics, passwords, persistence, prediction, query_profiler
+        from .routes import main
+        from .auth import auth_blueprint
+
+        metrics.init_app(app)
+        query_profiler.init_app(app)
+        identity.init_app(app, jwt)
+        passwords.init_app(app)
+        prediction.init_app(app)
+        llm.init_app(app)
+        jobs.init_app(app)
+        persistence.init_app(app)
+        commands.init_app(app)
+        app.register_blueprint(main)
+        app.register_blueprint(auth_blueprint)
+
+    return app
+
+
+def warm_up(app):
+    """Loads the heavy resources (emotion model, LLM client, password hashing pool) up front.
 
-    app.register_blueprint(main)
-    app.register_blueprint(auth_blueprint)
+    create_app() leaves them to be initialized on first use so CLI commands and
+    test collection stay cheap. Serving processes call this once per worker,
+    before taking traffic, so the first request does not pay for it. It also
+    starts picking up report jobs an earlier process left queued or running.
+    """
+    from . import passwords
+    from .prediction import get_model
+    from .llm import get_llm_client
 
+    with timed(app, 'warm_up.model'):
+        get_model()
+    with timed(app, 'warm_up.llm_client'):
+        get_llm_client()
+    with timed(app, 'warm_up.password_pool'):
+        passwords.warm_up()
+    runner = app.extensions.get('report_jobs')
+    if runner is not None:
+        runner.start_recovery()
     return app
@@ -0,0 +1,66 @@
+import click
+from flask.cli import AppGroup
+
+from app import jobs
+from app.emotion_vectors import storage_mode
+from app.models import db
+from app.persistence import (rebuild_daily_rollups, pack_emotion_reports, unpack_emotion_vectors,
+                             drop_packed_emotion_reports)
+
+rollups_cli = AppGroup('rollups', help='Maintain the daily_emotion_rollups table.')
+
+
+@rollups_cli.command('backfill')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def backfill_rollups(user_id):
+    """Rebuild daily_emotion_rollups from diary_entries/emotion_reports."""
+    written = rebuild_daily_rollups(user_id)
+    db.session.commit()
+    click.echo(f'Wrote {written} rollup rows')
+
+
+emotions_cli = AppGroup('emotions', help='Convert between emotion_reports rows and packed emotion vectors.')
+
+
+@emotions_cli.command('pack')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+@click.option('--drop-rows', is_flag=True,
+              help='Afterwards delete the emotion_reports rows of packed entries (EMOTION_STORAGE=vector only).')
+def pack_emotions_command(batch_size, drop_rows):
+    """Fill diary_entries.emotion_vector from the emotion_reports rows."""
+    # 'rows' and 'dual' still read emotion_reports, so the entries would lose their emotions in the API
+    if drop_rows and storage_mode() != 'vector':
+        raise click.UsageError(f"--drop-rows needs EMOTION_STORAGE=vector, not {storage_mode()!r}")
+    click.echo(f'Packed {pack_emotion_reports(batch_size)} entries')
+    if drop_rows:
+        click.echo(f'Deleted {drop_packed_emotion_reports()} emotion_reports rows')
+
+
+@emotions_cli.command('unpack')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+def unpack_emotions_command(batch_size):
+    """Recreate emotion_reports rows for entries that only have a vector."""
+    click.echo(f'Unpacked {unpack_emotion_vectors(batch_size)} entries')
+
+
+jobs_cli = AppGroup('jobs', help='Run background /emotion-reports jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--poll-interval', type=float, default=1.0, show_default=True,
+              help='Seconds to wait when the queue is empty.')
+@click.option('--once', is_flag=True, help='Exit once the queue is empty.')
+@click.option('--requeue-after', type=float, default=None,
+              help='First requeue jobs left running for this many seconds.')
+def work_jobs(poll_interval, once, requeue_after):
+    """Process queued report jobs (run several for more throughput)."""
+    if requeue_after is not None:
+        click.echo(f'Requeued {jobs.requeue_stale_jobs(requeue_after)} stale jobs')
+    processed = jobs.work(poll_interval=poll_interval, once=once)
+    click.echo(f'Processed {processed} jobs')
+
+
+def init_app(app):
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(emotions_cli)
+    app.cli.add_command(jobs_cli)
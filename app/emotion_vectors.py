@@ -0,0 +1,49 @@
+import math
+import struct
+
+from flask import current_app
+
+# Storage order of DiaryEntry.emotion_vector. Appending is fine (older vectors
+# are shorter and simply lack the new emotion); never reorder or rename.
+VECTOR_LABELS = ('anger', 'disgust', 'fear', 'joy', 'natural', 'sadness', 'shame', 'surprise')
+
+STORAGE_MODES = ('rows', 'dual', 'vector')
+
+
+def pack_emotions(probability):
+    """Packs {emotion: percentage} into little-endian float32s in VECTOR_LABELS order (NaN = missing)."""
+    values = [probability.get(label, math.nan) for label in VECTOR_LABELS]
+    return struct.pack(f'<{len(values)}f', *[math.nan if value is None else value for value in values])
+
+
+def unpack_emotions(blob):
+    """Inverse of pack_emotions: {emotion: percentage} in VECTOR_LABELS order, missing emotions left out."""
+    values = struct.unpack(f'<{len(blob) // 4}f', blob)
+    return {label: value for label, value in zip(VECTOR_LABELS, values) if not math.isnan(value)}
+
+
+def storage_mode():
+    """EMOTION_STORAGE of the current app: 'rows', 'dual' or 'vector'."""
+    mode = current_app.config.get('EMOTION_STORAGE', 'rows')
+    if mode not in STORAGE_MODES:
+        raise ValueError(f'EMOTION_STORAGE must be one of {", ".join(STORAGE_MODES)}, not {mode!r}')
+    return mode
+
+
+def writes_rows():
+    return storage_mode() in ('rows', 'dual')
+
+
+def writes_vectors():
+    return storage_mode() in ('dual', 'vector')
+
+
+def entry_emotions(entry):
+    """[(emotion_name, emotion_percentage)] for a diary entry, from its vector when there is one.
+
+    Falls back to the EmotionReport rows for entries written before vectors
+    (or everything in 'rows' mode).
+    """
+    if entry.emotion_vector is not None and storage_mode() != 'rows':
+        return list(unpack_emotions(entry.emotion_vector).items())
+    return [(report.emotion_name, report.emotion_percentage) for report in entry.emotion_reports]
@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+
+from app.models import db, User
+
+# What protected routes get as the current user; a plain tuple, so it can be
+# cached across requests without a session
+Identity = namedtuple('Identity', ['id', 'email'])
+
+
+class IdentityCache:
+    """Small per-process TTL cache of token subject -> Identity.
+
+    Keys are ('uid', id) for tokens carrying the user id claim and
+    ('email', email) for older email-only tokens. Beyond ``max_entries`` the
+    least recently used entries are dropped.
+    """
+
+    def __init__(self, ttl=60, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or item[1] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, identity):
+        with self._lock:
+            self._entries[key] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None, email=None):
+        with self._lock:
+            self._entries.pop(('uid', user_id), None)
+            self._entries.pop(('email', email), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def token_claims(user):
+    """Extra access token claims; ``uid`` lets requests skip the user lookup."""
+    return {'uid': user.id}
+
+
+def _fetch_identity(key):
+    kind, value = key
+    column = User.id if kind == 'uid' else User.email
+    row = db.session.execute(db.select(User.id, User.email).where(column == value)).first()
+    return Identity(*row) if row is not None else None
+
+
+def load_identity(jwt_data, cache=None):
+    """Identity for a decoded token, or None if its user no longer exists.
+
+    Tokens with a ``uid`` claim are looked up by id, older ones by the email
+    in their identity. Hits in ``cache`` need no query at all.
+    """
+    if jwt_data.get('uid') is not None:
+        key = ('uid', jwt_data['uid'])
+    else:
+        key = ('email', (jwt_data.get('sub') or {}).get('email'))
+
+    identity = cache.get(key) if cache is not None else None
+    if identity is None:
+        identity = _fetch_identity(key)
+        if identity is not None and cache is not None:
+            cache.set(key, identity)
+    return identity
+
+
+def _invalidate_user(mapper, connection, target):
+    """Drops a changed or deleted user from this process's identity cache (ORM flushes only)."""
+    cache = current_app.extensions.get('identity_cache') if has_app_context() else None
+    if cache is None:
+        return
+    cache.invalidate(user_id=target.id, email=target.email)
+    for old_email in inspect(target).attrs.email.history.deleted:
+        cache.invalidate(email=old_email)
+
+
+def init_app(app, jwt):
+    """Registers the user lookup on ``jwt``; IDENTITY_CACHE_TTL=0 turns the cache off.
+
+    Users updated or deleted through the ORM leave this process's cache right
+    away. Other processes, and changes made outside the ORM, keep the cached
+    identity until IDENTITY_CACHE_TTL runs out.
+    """
+    ttl = app.config.get('IDENTITY_CACHE_TTL', 60)
+    cache = IdentityCache(ttl, app.config.get('IDENTITY_CACHE_MAX_ENTRIES', 10000)) if ttl else None
+    app.extensions['identity_cache'] = cache
+    if not event.contains(User, 'after_delete', _invalidate_user):
+        event.listen(User, 'after_update', _invalidate_user)
+        event.listen(User, 'after_delete', _invalidate_user)
+
+    @jwt.user_lookup_loader
+    def user_lookup_callback(jwt_header, jwt_data):
+        return load_identity(jwt_data, cache)
@@ -0,0 +1,209 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from app.llm import generate_report_texts
+from app.models import db, ReportJob
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def create_report_job(user_id, emotions_data, overall_report, main_emotions):
+    """Stores a queued job for the LLM stages of an /emotion-reports call.
+
+    The aggregates are part of the result from the start, so a poll sees them
+    right away and the text fields as they arrive.
+    """
+    job = ReportJob(id=uuid.uuid4().hex, user_id=user_id, status=QUEUED,
+                    payload=json.dumps({'detailed_reports': emotions_data, 'overall_report': overall_report,
+                                        'main_emotions': main_emotions}),
+                    result=json.dumps({'detailed_reports': emotions_data, 'overall_report': overall_report}))
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def enqueue_report_job(user_id, emotions_data, overall_report, main_emotions):
+    """Creates the job and hands it to the in-process pool, if there is one.
+
+    With REPORT_JOBS_MODE='worker' the job waits for `flask jobs work`.
+    """
+    job = create_report_job(user_id, emotions_data, overall_report, main_emotions)
+    runner = current_app.extensions.get('report_jobs')
+    if runner is not None:
+        runner.submit(job.id)
+    return job
+
+
+def claim_job(job_id):
+    """Moves a queued job to running; False if another worker got it first."""
+    claimed = db.session.execute(
+        update(ReportJob).where(ReportJob.id == job_id, ReportJob.status == QUEUED)
+        .values(status=RUNNING, started_at=datetime.utcnow())).rowcount
+    db.session.commit()
+    return claimed == 1
+
+
+def claim_next_job():
+    """Claims the oldest queued job and returns its id, or None if the queue is empty."""
+    while True:
+        job_id = db.session.scalar(select(ReportJob.id).where(ReportJob.status == QUEUED)
+                                   .order_by(ReportJob.created_at, ReportJob.id).limit(1))
+        db.session.commit()
+        if job_id is None or claim_job(job_id):
+            return job_id
+
+
+def run_report_job(job_id):
+    """Runs the LLM stages of a claimed job, saving each field as soon as it is ready.
+
+    A field whose call failed holds the error text, as in the synchronous
+    response, and is named in the job's error. The job is failed when no
+    field succeeded.
+    """
+    job = db.session.get(ReportJob, job_id)
+    payload = json.loads(job.payload)
+    result = json.loads(job.result or '{}')
+
+    def save_partial(name, value):
+        result[name] = value
+        job.result = json.dumps(result)
+        db.session.commit()
+
+    try:
+        texts, failed = generate_report_texts(payload['detailed_reports'], payload['overall_report'],
+                                              payload['main_emotions'], on_result=save_partial)
+        job.status = FAILED if failed and failed == set(texts) else DONE
+        if failed:
+            job.error = '; '.join(texts[name] for name in sorted(failed))
+    except Exception as e:
+        db.session.rollback()
+        job.status = FAILED
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def requeue_stale_jobs(older_than):
+    """Puts jobs left running for more than ``older_than`` seconds (a dead worker) back in the queue."""
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    requeued = db.session.execute(
+        update(ReportJob).where(ReportJob.status == RUNNING, ReportJob.started_at < cutoff)
+        .values(status=QUEUED, started_at=None)).rowcount
+    db.session.commit()
+    return requeued
+
+
+def work(poll_interval=1.0, once=False):
+    """Worker loop behind `flask jobs work`; returns the number of jobs run."""
+    processed = 0
+    while True:
+        job_id = claim_next_job()
+        if job_id is not None:
+            run_report_job(job_id)
+            processed += 1
+        elif once:
+            return processed
+        else:
+            time.sleep(poll_interval)
+
+
+def serialize_job(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'result': json.loads(job.result or '{}'),
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def queued_job_ids():
+    job_ids = db.session.scalars(select(ReportJob.id).where(ReportJob.status == QUEUED)
+                                 .order_by(ReportJob.created_at, ReportJob.id)).all()
+    db.session.commit()
+    return job_ids
+
+
+class JobRunner:
+    """In-process pool that runs report jobs off the request threads.
+
+    Jobs only reach the pool through submit() in the process that created
+    them, so ones queued or running when a process exits would never finish.
+    start_recovery() (called by app.warm_up) covers that: it requeues jobs
+    left running for ``stale_after`` seconds and submits every queued job,
+    at startup and then every ``stale_after`` seconds.
+    """
+
+    def __init__(self, app, max_workers, stale_after=300):
+        self.app = app
+        self.max_workers = max_workers
+        self.stale_after = stale_after
+        self._executor = None
+        self._lock = threading.Lock()
+        self._recovery = None
+
+    def submit(self, job_id):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='report-job')
+        return self._executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            if claim_job(job_id):
+                run_report_job(job_id)
+
+    def recover(self):
+        """Requeues stale running jobs and submits all queued ones; returns the number submitted."""
+        with self.app.app_context():
+            requeued = requeue_stale_jobs(self.stale_after)
+            job_ids = queued_job_ids()
+        if requeued:
+            logger.warning('Requeued %d report jobs left running for over %ss', requeued, self.stale_after)
+        # Claiming is conditional, so a job another process (or an earlier submit) runs is skipped
+        for job_id in job_ids:
+            self.submit(job_id)
+        return len(job_ids)
+
+    def start_recovery(self):
+        """Runs recover() now and then every ``stale_after`` seconds in a daemon thread."""
+        with self._lock:
+            if self._recovery is None:
+                self._recovery = threading.Thread(target=self._recover_forever, name='report-job-recovery',
+                                                  daemon=True)
+                self._recovery.start()
+
+    def _recover_forever(self):
+        while True:
+            try:
+                self.recover()
+            except Exception:
+                logger.exception('Report job recovery failed')
+            time.sleep(self.stale_after)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+def init_app(app):
+    """REPORT_JOBS_MODE='thread' runs jobs in this process, 'worker' leaves them to `flask jobs work`."""
+    if app.config.get('REPORT_JOBS_MODE', 'thread') == 'thread':
+        app.extensions['report_jobs'] = JobRunner(app, app.config.get('REPORT_JOBS_WORKERS', 4),
+                                                  app.config.get('REPORT_JOBS_STALE_SECONDS', 300))
@@ -0,0 +1,299 @@
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+
+from app.metrics import stage
+from app.prompts import build_emotion_prompt, format_emotion_data
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+_executor = None
+
+# Filled from the app config by init_app()
+_settings = {
+    'api_key': None,
+    'base_url': None,
+    'model': 'gpt-4o',
+    'timeout': 60.0,
+    'max_workers': 16,
+    'prompt_token_budget': 3000,
+}
+
+
+def init_app(app):
+    """Reads the LLM settings; the client is still only created on first use."""
+    global _client, _executor
+    settings = {
+        'api_key': app.config.get('OPENAI_API_KEY'),
+        'base_url': app.config.get('OPENAI_BASE_URL'),
+        'model': app.config.get('LLM_MODEL', 'gpt-4o'),
+        'timeout': app.config.get('LLM_TIMEOUT_SECONDS', 60.0),
+        'max_workers': app.config.get('LLM_MAX_WORKERS', 16),
+        'prompt_token_budget': app.config.get('LLM_PROMPT_TOKEN_BUDGET', 3000),
+    }
+    with _client_lock:
+        if settings != _settings:
+            _settings.update(settings)
+            _client = None
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+
+
+def get_llm_client():
+    """Returns the OpenAI client, creating it (and reading .env) on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from dotenv import load_dotenv
+                from openai import OpenAI
+
+                load_dotenv()
+                _client = OpenAI(api_key=_settings['api_key'] or os.getenv('OPENAI_API_KEY'),
+                                 base_url=_settings['base_url'] or os.getenv('OPENAI_BASE_URL'),
+                                 timeout=_settings['timeout'])
+    return _client
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=_settings['max_workers'], thread_name_prefix='llm')
+    return _executor
+
+
+def description_messages(data_type, data):
+    # Long ranges are summarised per week or month so the prompt stays within the token budget
+    prompt_created, _ = build_emotion_prompt(data, _settings['prompt_token_budget'])
+
+    prompt = f"Here is the {data_type} data about emotions: {prompt_created}. Can you provide a summary or description of the emotional state in a paragraph?write using simple english.and limit your pargaph into 800 words. "
+
+    return [
+        {"role": "system", "content": f"Summarize the given {data_type} emotion data."},
+        {"role": "user", "content": prompt}]
+
+
+@stage('llm')
+def _complete(messages):
+    completion = get_llm_client().chat.completions.create(model=_settings['model'], messages=messages)
+
+    logger.debug('LLM completion: %s', completion)
+    return completion.choices[0].message.content
+
+
+def convert_emotion_data_to_prompt(emotion_data):
+    """Converts detailed or overall emotion data into a readable prompt format for GPT (one line per point)."""
+    return format_emotion_data(emotion_data, 'daily')
+
+
+def suggestions_messages(main_emotions):
+    prompt = f"""
+        Act like an expert psychologist with 20 years of experience in emotional well-being and mental health. You specialize in creating practical, evidence-based strategies for managing emotions and promoting mental health.
+
+        Objective: You are provided with the following emotions: {', '.join(main_emotions)}. Your task is to create 10 highly actionable and detailed suggestions that individuals can use to improve their emotional well-being and manage the listed emotions effectively. 
+
+        Instructions:
+        1. Each suggestion should focus on real-world application, providing clear steps that individuals can follow.
+        2. Use simple language to ensure accessibility for all audiences, but ensure depth and detail to offer meaningful solutions.
+        
+        can you give this suggestion as a array object
+         Output Format (JSON):
+    [
+       {{
+          "topic": "Practice Mindfulness Meditation",
+          "explanation": "Mindfulness meditation allows you to become more aware of your emotions in a non-judgmental way. This practice helps manage emotions like anxiety or sadness by focusing on the present moment.",
+          "steps": "Start with 5 minutes a day, focusing on your breath."
+       }},
+       {{
+          "topic": "Engage in Creative Expression",
+          "explanation": "Creative activities such as drawing or journaling can provide an emotional outlet and help reduce stress by externalizing your emotions in a constructive way.",
+          "steps": "Set aside 30 minutes for drawing or journaling daily."
+       }},
+       ...other suggestions
+    ]
+        """
+    return [
+        {"role": "system", "content": "You are an expert in mental health and well-being."},
+        {"role": "user", "content": prompt}]
+
+
+def parse_suggestions(response_text):
+    """Extracts the JSON array of suggestions from the completion text."""
+    # Log the raw response for debugging purposes
+    logger.debug('Suggestions response: %s', response_text)
+
+    json_array_match = re.search(r'(\[\s*{.*}\s*\])', response_text, re.DOTALL)
+    if not json_array_match:
+        raise ValueError("no JSON array in the response")
+
+    # Parse the JSON string into a Python list
+    return json.loads(json_array_match.group(1))
+
+
+def _run_task(messages, parse):
+    return parse(_complete(messages))
+
+
+def _report_tasks(emotions_data, overall_report, main_emotions):
+    """The /emotion-reports completions: {field: (messages, parse, error prefix)}."""
+    return {
+        'detailed_reports_desc': (description_messages("detailed reports", emotions_data), str,
+                                  'Error generating description'),
+        'overall_report_desc': (description_messages("overall report", overall_report), str,
+                                'Error generating description'),
+        'suggestions': (suggestions_messages(main_emotions), parse_suggestions, 'Error generating suggestions'),
+    }
+
+
+def _cached_results(tasks):
+    """Looks the tasks up in the LLM response cache; returns (cache, keys, cached values)."""
+    from app.llm_cache import get_llm_cache
+
+    cache = get_llm_cache()
+    if cache is None:
+        return None, {}, {}
+    keys = {name: cache.make_key(_settings['model'], messages) for name, (messages, _, _) in tasks.items()}
+    try:
+        return cache, keys, cache.get_many(keys)
+    except Exception:
+        logger.warning('LLM cache lookup failed, calling the model', exc_info=True)
+        return cache, keys, {}
+
+
+def _store_results(cache, keys, fresh):
+    """Writes the fresh outputs to the LLM response cache; a failure only costs the caching."""
+    if cache is None or not fresh:
+        return
+    try:
+        cache.set_many({keys[name]: value for name, value in fresh.items()}, _settings['model'])
+    except Exception:
+        logger.warning('LLM cache write failed', exc_info=True)
+
+
+@stage('llm')
+def generate_report_texts(emotions_data, overall_report, main_emotions, on_result=None):
+    """Runs the three /emotion-reports completions concurrently.
+
+    Wall time is roughly the slowest call instead of the sum of all three. Each
+    call gets LLM_TIMEOUT_SECONDS; one that fails or runs over is reported as
+    an error string in its field. Successful outputs are stored in the LLM
+    response cache (when enabled) and served from it for identical prompts.
+    ``on_result(name, value)`` is called in this thread as each field is ready.
+    Returns ``(texts, failed)``: the value of every field and the set of the
+    fields holding an error string.
+    """
+    tasks = _report_tasks(emotions_data, overall_report, main_emotions)
+
+    def finish(name, value):
+        results[name] = value
+        if on_result is not None:
+            on_result(name, value)
+
+    cache, keys, cached = _cached_results(tasks)
+    results = {}
+    for name, value in cached.items():
+        finish(name, value)
+
+    executor = _get_executor()
+    futures = {executor.submit(_run_task, messages, parse): name
+               for name, (messages, parse, _) in tasks.items() if name not in results}
+
+    # The calls run side by side, so they share one deadline
+    fresh = {}
+    try:
+        for future in as_completed(futures, timeout=_settings['timeout']):
+            name = futures[future]
+            try:
+                fresh[name] = future.result()
+                finish(name, fresh[name])
+            except Exception as e:
+                finish(name, f"{tasks[name][2]}: {str(e)}")
+    except FutureTimeoutError:
+        for future, name in futures.items():
+            if name not in results:
+                future.cancel()
+                finish(name, f"{tasks[name][2]}: timed out after {_settings['timeout']} seconds")
+
+    _store_results(cache, keys, fresh)
+    failed = {name for name in futures.values() if name not in fresh}
+    return {name: results[name] for name in tasks}, failed
+
+
+def _stream_task(messages, parse, name, events, stop):
+    """Streams one completion into ``events`` as ('delta', name, text) items; returns the parsed output."""
+    stream = get_llm_client().chat.completions.create(model=_settings['model'], messages=messages, stream=True)
+    parts = []
+    try:
+        for chunk in stream:
+            if stop.is_set():
+                raise RuntimeError("stream abandoned")
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                parts.append(text)
+                events.put(('delta', name, text))
+    finally:
+        stream.close()
+    return parse(''.join(parts))
+
+
+def stream_report_texts(emotions_data, overall_report, main_emotions):
+    """Streaming counterpart of generate_report_texts.
+
+    Yields ``('delta', name, text)`` for every chunk the model produces, from
+    all three completions as they interleave, and ``('result', name, value)``
+    once a field is complete (cached fields right away). Suggestions are only
+    parsed at the end, so their deltas are raw JSON text. Errors, the shared
+    deadline and caching work as in generate_report_texts. Closing the
+    generator early stops the remaining streams. Time spent waiting for the
+    model is billed to the 'llm' stage of the request being streamed.
+    """
+    tasks = _report_tasks(emotions_data, overall_report, main_emotions)
+    cache, keys, cached = _cached_results(tasks)
+    for name, value in cached.items():
+        yield 'result', name, value
+
+    events = queue.Queue()
+    stop = threading.Event()
+    executor = _get_executor()
+    pending = set()
+    for name, (messages, parse, _) in tasks.items():
+        if name in cached:
+            continue
+        future = executor.submit(_stream_task, messages, parse, name, events, stop)
+        future.add_done_callback(lambda f, name=name: events.put(('done', name, f)))
+        pending.add(name)
+
+    deadline = time.monotonic() + _settings['timeout']
+    fresh = {}
+    try:
+        while pending:
+            try:
+                with stage('llm'):
+                    kind, name, payload = events.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                for name in sorted(pending):
+                    yield 'result', name, f"{tasks[name][2]}: timed out after {_settings['timeout']} seconds"
+                break
+            if kind == 'delta':
+                yield 'delta', name, payload
+                continue
+            pending.discard(name)
+            try:
+                fresh[name] = payload.result()
+                yield 'result', name, fresh[name]
+            except Exception as e:
+                yield 'result', name, f"{tasks[name][2]}: {str(e)}"
+    finally:
+        stop.set()
+
+    _store_results(cache, keys, fresh)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select, update
+
+from app.models import db, Recommendation
+
+
+class LLMResponseCache:
+    """Persistent cache of LLM outputs stored in the recommendations table.
+
+    Keys fingerprint the model name, the system prompt and a hash of the user
+    prompt (which embeds the emotion data), so a re-opened date range with
+    unchanged data is answered without calling the model. Entries expire
+    after ``ttl`` seconds; beyond ``max_entries`` the least recently used go.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(model, messages):
+        system_prompt = '\n'.join(m['content'] for m in messages if m['role'] == 'system')
+        user_prompt = '\n'.join(m['content'] for m in messages if m['role'] != 'system')
+        prompt_hash = hashlib.sha256(user_prompt.encode('utf-8')).hexdigest()
+        return hashlib.sha256(json.dumps([model, system_prompt, prompt_hash]).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """Maps each name in ``keys`` ({name: cache key}) to its cached value, skipping misses."""
+        if not keys:
+            return {}
+        now = datetime.utcnow()
+        # In a SAVEPOINT, so a failure leaves the caller's session usable
+        with db.session.begin_nested():
+            rows = db.session.execute(
+                select(Recommendation.cache_key, Recommendation.recommendation_text)
+                .where(Recommendation.cache_key.in_(list(keys.values())), Recommendation.expires_at > now)).all()
+            if not rows:
+                return {}
+            found = {cache_key: json.loads(text) for cache_key, text in rows}
+            db.session.execute(update(Recommendation).where(Recommendation.cache_key.in_(list(found)))
+                               .values(last_used_at=now))
+        db.session.commit()
+        return {name: found[key] for name, key in keys.items() if key in found}
+
+    def set_many(self, values, model):
+        """Stores {cache key: value} and applies expiry and the size bound.
+
+        Two requests that missed on the same key both write it; the upsert
+        lets the later one overwrite the row instead of failing on the
+        unique cache_key. Runs in a SAVEPOINT, so on an error only the cache
+        write is undone and the caller's session stays usable.
+        """
+        now = datetime.utcnow()
+        rows = [{'cache_key': key, 'recommendation_text': json.dumps(value), 'model': model,
+                 'expires_at': now + timedelta(seconds=self.ttl), 'last_used_at': now}
+                for key, value in values.items()]
+        with db.session.begin_nested():
+            stmt = _upsert_statement(db.session.get_bind().dialect.name)
+            if stmt is not None:
+                db.session.execute(stmt, rows)
+            else:
+                self._store(rows)
+            self._evict(now)
+        db.session.commit()
+
+    def _store(self, rows):
+        """Portable fallback for dialects without an upsert; a concurrent insert of the same key raises."""
+        existing = {row.cache_key: row for row in Recommendation.query.filter(
+            Recommendation.cache_key.in_([row['cache_key'] for row in rows])).all()}
+        for values in rows:
+            row = existing.get(values['cache_key']) or Recommendation()
+            for column, value in values.items():
+                setattr(row, column, value)
+            db.session.add(row)
+        db.session.flush()
+
+    def _evict(self, now):
+        cached = Recommendation.cache_key.isnot(None)
+        db.session.execute(delete(Recommendation).where(cached, Recommendation.expires_at <= now))
+
+        excess = db.session.scalar(select(func.count()).select_from(Recommendation).where(cached)) - self.max_entries
+        if excess > 0:
+            stale_ids = db.session.scalars(select(Recommendation.id).where(cached)
+                                           .order_by(Recommendation.last_used_at, Recommendation.id)
+                                           .limit(excess)).all()
+            db.session.execute(delete(Recommendation).where(Recommendation.id.in_(stale_ids)))
+
+
+def _upsert_statement(dialect_name):
+    """Dialect specific INSERT that overwrites the row with the same cache_key, or None if unsupported."""
+    table = Recommendation.__table__
+    overwritten = ('recommendation_text', 'model', 'expires_at', 'last_used_at')
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(index_elements=['cache_key'],
+                                          set_={column: stmt.excluded[column] for column in overwritten})
+    if dialect_name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in overwritten})
+    return None
+
+
+def get_llm_cache():
+    """The LLM response cache configured for the current app, or None when disabled."""
+    config = current_app.config
+    if not config.get('LLM_CACHE_ENABLED'):
+        return None
+    return LLMResponseCache(ttl=config.get('LLM_CACHE_TTL_SECONDS', 86400),
+                            max_entries=config.get('LLM_CACHE_MAX_ENTRIES', 10000))
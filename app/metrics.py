@@ -0,0 +1,260 @@
+import hmac
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import Response, g, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils import create_error
+
+STAGES = ('db', 'inference', 'llm', 'serialization')
+# Seconds; covers sub-millisecond lookups up to LLM calls near their timeout
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Stage timings of the request being served in this thread/context, None outside requests
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Exclusive time per stage for one request.
+
+    Stages can nest (an LLM call that reads the response cache runs SQL); the
+    inner stage's time is taken off the outer one, so the stages never add up
+    to more than the request and the rest is reported as 'other'.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self._stack = []
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, start, inner = self._stack.pop()
+        elapsed = time.perf_counter() - start
+        self.stages[name] += elapsed - inner
+        if self._stack:
+            self._stack[-1][2] += elapsed
+
+
+@contextmanager
+def stage(name):
+    """Bills the enclosed block to ``name`` in the current request; free outside requests.
+
+    Also works as a decorator. Work handed to other threads is only seen as
+    the time this thread waits for it.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    timings.enter(name)
+    try:
+        yield
+    finally:
+        timings.exit()
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labelnames, labels)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._values = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def collect(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                le = bound if bound == '+Inf' else repr(float(bound))
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames + ("le",), labels + (le,))} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {counts[-1]}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class RequestMetrics:
+    """The request counters and histograms of one app, rendered for /metrics."""
+
+    def __init__(self):
+        self.requests = Counter('http_requests_total', 'Requests handled.', ('method', 'endpoint', 'status'))
+        self.duration = Histogram('http_request_duration_seconds', 'Request handling time.', ('method', 'endpoint'))
+        self.stages = Histogram('http_request_stage_duration_seconds',
+                                'Request time per stage (db, inference, llm, serialization, other).',
+                                ('endpoint', 'stage'))
+
+    def record(self, method, endpoint, status, total, stages):
+        self.requests.inc((method, endpoint, str(status)))
+        self.duration.observe((method, endpoint), total)
+        other = total
+        for name, seconds in stages.items():
+            if seconds:
+                self.stages.observe((endpoint, name), seconds)
+                other -= seconds
+        self.stages.observe((endpoint, 'other'), max(other, 0.0))
+
+    def render(self):
+        lines = self.requests.collect() + self.duration.collect() + self.stages.collect()
+        return '\n'.join(lines) + '\n'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with encoding billed to the 'serialization' stage."""
+
+    def dumps(self, obj, **kwargs):
+        with stage('serialization'):
+            return super().dumps(obj, **kwargs)
+
+
+def server_timing(timings, total):
+    parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.stages.items() if seconds]
+    return ', '.join(parts + [f'total;dur={total * 1000:.1f}'])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    if timings is not None:
+        timings.enter('db')
+        conn.info['metrics_timings'] = timings
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = conn.info.pop('metrics_timings', None)
+    if timings is not None:
+        timings.exit()
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    timings = conn.info.pop('metrics_timings', None) if conn is not None else None
+    if timings is not None:
+        timings.exit()
+
+
+def init_app(app):
+    """Times every request by stage and serves the totals on /metrics (METRICS_ENABLED, off by default).
+
+    With METRICS_TOKEN set, /metrics answers 401 unless the request carries
+    ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    METRICS_SERVER_TIMING adds a Server-Timing header with the breakdown
+    (not on streamed responses, which are recorded once their body is sent).
+    Metrics are per process; scrape every worker.
+    """
+    if not app.config.get('METRICS_ENABLED', False):
+        return
+    metrics = app.extensions['request_metrics'] = RequestMetrics()
+    send_server_timing = app.config.get('METRICS_SERVER_TIMING', False)
+    token = app.config.get('METRICS_TOKEN')
+    app.json = TimedJSONProvider(app)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    def record(timings, method, endpoint, status):
+        total = time.perf_counter() - timings.start
+        metrics.record(method, endpoint, status, total, timings.stages)
+        return total
+
+    def request_endpoint():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def finish(status):
+        timings = g.pop('request_timings', None)
+        _current.set(None)
+        if timings is None or request.endpoint == 'metrics':
+            return None, 0.0
+        return timings, record(timings, request.method, request_endpoint(), status)
+
+    @app.before_request
+    def start_timing():
+        g.request_timings = RequestTimings()
+        _current.set(g.request_timings)
+
+    @app.after_request
+    def record_timing(response):
+        if response.is_streamed and 'request_timings' in g and request.endpoint != 'metrics':
+            # The body (SSE, NDJSON) is generated after this returns: keep timing its
+            # stages until the server closes the response, then record the request
+            timings = g.pop('request_timings')
+            method, endpoint, status = request.method, request_endpoint(), response.status_code
+
+            def record_stream():
+                _current.set(None)
+                record(timings, method, endpoint, status)
+
+            response.call_on_close(record_stream)
+            return response
+        timings, total = finish(response.status_code)
+        if timings is not None and send_server_timing:
+            response.headers['Server-Timing'] = server_timing(timings, total)
+        return response
+
+    @app.teardown_request
+    def record_failure(exc):
+        # after_request is skipped when the view raised
+        if 'request_timings' in g:
+            finish(500)
+
+    def metrics_view():
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return create_error(message='Unauthorized', status=401)
+        return Response(metrics.render(), mimetype=PROMETHEUS_MIMETYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
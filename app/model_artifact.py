@@ -0,0 +1,144 @@
+"""Compact, memory-mappable form of the emotion classifier pipeline.
+
+The joblib pickle stores the CountVectorizer vocabulary as a Python dict and
+the LogisticRegression weights as float64, so every worker process ends up
+with its own private copy of both. The compact artifact is a directory of
+plain ``.npy`` files that ``np.load(mmap_mode='r')`` maps straight from the
+page cache, letting every worker on the host share the same pages:
+
+    meta.json        classes, tokenizer settings, source checksum
+    vocabulary.npy   UTF-8 encoded terms, sorted (row i == feature column i)
+    coef.npy         float32, shape (n_features, n_classes)
+    intercept.npy    float32, shape (n_classes,)
+"""
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_pipeline(pipeline, out_dir, source_path=None):
+    """Writes a fitted CountVectorizer + LogisticRegression pipeline as a compact artifact."""
+    vectorizer = pipeline.steps[0][1]
+    classifier = pipeline.steps[-1][1]
+
+    if not hasattr(vectorizer, 'vocabulary_'):
+        raise ValueError('Only vocabulary based vectorizers (CountVectorizer) can be exported')
+    # stop_words need no support: with unigrams they are simply absent from the vocabulary
+    if (vectorizer.analyzer != 'word' or tuple(vectorizer.ngram_range) != (1, 1) or vectorizer.binary
+            or vectorizer.preprocessor is not None or vectorizer.tokenizer is not None
+            or vectorizer.strip_accents is not None):
+        raise ValueError('Unsupported CountVectorizer settings for the compact artifact')
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    encoded = [term.encode('utf-8') for term in terms]
+    if encoded != sorted(encoded):
+        raise ValueError('Vocabulary order does not match feature column order')
+
+    if classifier.coef_.shape[0] < 3:
+        raise ValueError('The compact artifact only supports multi-class classifiers')
+
+    coef = np.asarray(classifier.coef_, dtype=np.float32)
+    intercept = np.asarray(classifier.intercept_, dtype=np.float32)
+    classes = [str(c) for c in classifier.classes_]
+    multinomial = getattr(classifier, 'multi_class', 'auto') != 'ovr' \
+        and getattr(classifier, 'solver', 'lbfgs') != 'liblinear'
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, 'vocabulary.npy'), np.array(encoded, dtype=np.bytes_))
+    # Stored feature-major so scoring a document gathers contiguous rows
+    np.save(os.path.join(out_dir, 'coef.npy'), np.ascontiguousarray(coef.T))
+    np.save(os.path.join(out_dir, 'intercept.npy'), intercept)
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'classes': classes,
+        'multinomial': bool(multinomial),
+        'lowercase': bool(vectorizer.lowercase),
+        'token_pattern': vectorizer.token_pattern,
+        'n_features': len(terms),
+        'source_sha256': _file_sha256(source_path) if source_path else None,
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return meta
+
+
+class CompactPipeline:
+    """Inference-only stand-in for the sklearn pipeline backed by a compact artifact.
+
+    Exposes ``classes_``, ``predict_proba`` and ``predict`` so it can be used
+    wherever the joblib pipeline is.
+    """
+
+    def __init__(self, path, mmap=True):
+        mmap_mode = 'r' if mmap else None
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format: {self.meta.get('format_version')}")
+
+        self.path = path
+        self.vocabulary = np.load(os.path.join(path, 'vocabulary.npy'), mmap_mode=mmap_mode)
+        self.coef = np.load(os.path.join(path, 'coef.npy'), mmap_mode=mmap_mode)
+        self.intercept = np.load(os.path.join(path, 'intercept.npy'), mmap_mode=mmap_mode)
+        self.classes_ = np.array(self.meta['classes'])
+        self._token_re = re.compile(self.meta['token_pattern'])
+        self._max_term_bytes = self.vocabulary.dtype.itemsize
+
+    def _tokenize(self, text):
+        if self.meta['lowercase']:
+            text = text.lower()
+        return self._token_re.findall(text)
+
+    def build_analyzer(self):
+        """Same contract as the sklearn vectorizers': text -> the tokens that get scored."""
+        return self._tokenize
+
+    def decision_function(self, texts):
+        scores = np.tile(np.asarray(self.intercept, dtype=np.float64), (len(texts), 1))
+        for row, text in enumerate(texts):
+            counts = Counter(token.encode('utf-8') for token in self._tokenize(text))
+            keys = [token for token in counts if len(token) <= self._max_term_bytes]
+            if not keys:
+                continue
+            lookup = np.array(keys, dtype=self.vocabulary.dtype)
+            idx = np.searchsorted(self.vocabulary, lookup)
+            idx[idx == len(self.vocabulary)] = 0
+            found = self.vocabulary[idx] == lookup
+            if not found.any():
+                continue
+            weights = np.array([counts[key] for key in keys], dtype=np.float64)[found]
+            scores[row] += weights @ self.coef[idx[found]]
+        return scores
+
+    def predict_proba(self, texts):
+        scores = self.decision_function(list(texts))
+        if self.meta['multinomial']:
+            scores -= scores.max(axis=1, keepdims=True)
+            np.exp(scores, out=scores)
+        else:
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def predict(self, texts):
+        return self.classes_[self.predict_proba(texts).argmax(axis=1)]
+
+
+def load_compact_pipeline(path, mmap=True):
+    return CompactPipeline(path, mmap=mmap)
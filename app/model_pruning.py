@@ -0,0 +1,52 @@
+"""Smaller CountVectorizer + LogisticRegression pipelines: vocabulary pruning and float32 weights.
+
+A term is kept when it occurs in at least ``min_df`` training documents and
+its largest absolute weight over the classes is at least ``min_weight``;
+dropped terms simply stop contributing to the scores, as unknown words
+already do. The result is an ordinary sklearn pipeline, so the app loads it
+from EMOTION_MODEL_PATH like the original, and tools/export_compact_model.py
+still accepts it.
+"""
+import copy
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+
+
+def document_frequencies(pipeline, texts):
+    """Number of ``texts`` each vocabulary term of the pipeline's vectorizer occurs in."""
+    counts = pipeline.steps[0][1].transform(texts)
+    return np.bincount(counts.indices, minlength=counts.shape[1])
+
+
+def select_features(pipeline, doc_freq=None, min_df=1, min_weight=0.0):
+    """Boolean mask over the feature columns that survive the two thresholds."""
+    coef = pipeline.steps[-1][1].coef_
+    keep = np.abs(coef).max(axis=0) >= min_weight
+    if doc_freq is not None:
+        keep &= doc_freq >= min_df
+    return keep
+
+
+def prune_pipeline(pipeline, keep=None, dtype=np.float32):
+    """Copy of ``pipeline`` restricted to the ``keep`` columns, with weights cast to ``dtype``."""
+    (vec_name, vectorizer), (clf_name, classifier) = pipeline.steps[0], pipeline.steps[-1]
+    if not hasattr(vectorizer, 'vocabulary_'):
+        raise ValueError('Only vocabulary based vectorizers (CountVectorizer) can be pruned')
+    if keep is None:
+        keep = np.ones(classifier.coef_.shape[1], dtype=bool)
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    kept = sorted((term, column) for column, term in enumerate(terms) if keep[column])
+    columns = np.array([column for _, column in kept], dtype=np.intp)
+
+    # A fixed vocabulary in sorted order, so the compact exporter still accepts the result
+    pruned_vectorizer = clone(vectorizer).set_params(vocabulary={term: i for i, (term, _) in enumerate(kept)})
+    pruned_vectorizer.fit([term for term, _ in kept])
+
+    pruned_classifier = copy.deepcopy(classifier)
+    pruned_classifier.coef_ = np.ascontiguousarray(classifier.coef_[:, columns], dtype=dtype)
+    pruned_classifier.intercept_ = np.asarray(classifier.intercept_, dtype=dtype)
+    pruned_classifier.n_features_in_ = len(kept)
+    return Pipeline(steps=[(vec_name, pruned_vectorizer), (clf_name, pruned_classifier)])
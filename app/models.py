@@ -12,27 +12,79 @@ class User(db.Model):
 
 class DiaryEntry(db.Model):
     __tablename__ = 'diary_entries'
+    __table_args__ = (
+        # Per-user range scans and keyset pages ordered by (created_at, id)
+        db.Index('ix_diary_entries_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     main_emotion = db.Column(db.String(50))
     main_emotion_percentage = db.Column(db.Float)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    # All emotion percentages as packed float32s (app/emotion_vectors.py), written when EMOTION_STORAGE != 'rows'
+    emotion_vector = db.Column(db.LargeBinary)
 
-    emotion_reports = db.relationship('EmotionReport', backref='diary_entry', lazy=True)
+    emotion_reports = db.relationship('EmotionReport', backref='diary_entry', lazy=True,
+                                      order_by='EmotionReport.id')
 
 
 class EmotionReport(db.Model):
     __tablename__ = 'emotion_reports'
+    __table_args__ = (
+        # Covers the diary_id lookups (eager loading and the report aggregations) without touching the table
+        db.Index('ix_emotion_reports_diary_id_emotion', 'diary_id', 'emotion_name', 'emotion_percentage'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     diary_id = db.Column(db.Integer, db.ForeignKey('diary_entries.id'), nullable=False)
     emotion_name = db.Column(db.String(50))
     emotion_percentage = db.Column(db.Float)
 
 
+class DailyEmotionRollup(db.Model):
+    """Per user, day and emotion running totals of EmotionReport percentages.
+
+    Maintained by the write path in the same transaction as the reports, so
+    range reports read one row per day and emotion instead of every report.
+    """
+    __tablename__ = 'daily_emotion_rollups'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    emotion_name = db.Column(db.String(50), primary_key=True)
+    sum = db.Column(db.Float, nullable=False, default=0.0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
 class Recommendation(db.Model):
+    """LLM generated text. Rows with a cache_key are entries of the LLM response cache (app/llm_cache.py)."""
     __tablename__ = 'recommendations'
     id = db.Column(db.Integer, primary_key=True)
-    diary_id = db.Column(db.Integer, db.ForeignKey('diary_entries.id'), nullable=False)
+    diary_id = db.Column(db.Integer, db.ForeignKey('diary_entries.id'), nullable=True)
     recommendation_text = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    cache_key = db.Column(db.String(64), unique=True, index=True)
+    model = db.Column(db.String(50))
+    expires_at = db.Column(db.DateTime)
+    last_used_at = db.Column(db.DateTime, index=True)
+
+
+class ReportJob(db.Model):
+    """An /emotion-reports run whose LLM stages happen in the background (app/jobs.py).
+
+    ``payload`` holds the SQL aggregation the job works from, ``result`` the
+    report fields produced so far as JSON.
+    """
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        # Workers pick the oldest queued job
+        db.Index('ix_report_jobs_status_created_at', 'status', 'created_at'),
+    )
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    payload = db.Column(db.Text, nullable=False)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Filled from the app config by init_app()
+_settings = {
+    'method': 'scrypt',
+    'canonical_method': 'scrypt:32768:8:1',
+    'workers': 0,
+    'timeout': 30.0,
+}
+
+
+class PasswordHashingUnavailable(Exception):
+    """The hashing pool timed out or died; the routes answer it with a 503."""
+
+
+def init_app(app):
+    """Reads the hashing settings; the process pool is started by warm_up() or on first use."""
+    global _pool
+    method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+    settings = {
+        'method': method,
+        'canonical_method': canonical_method(method),
+        'workers': app.config.get('PASSWORD_HASH_WORKERS', 0),
+        'timeout': app.config.get('PASSWORD_HASH_TIMEOUT', 30.0),
+    }
+    with _pool_lock:
+        if settings != _settings:
+            _settings.update(settings)
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+                _pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Started from a request thread while the batcher, group commit, job and LLM threads run;
+                # a forked child could inherit one of their locks held, so start workers from a clean server
+                _pool = ProcessPoolExecutor(max_workers=_settings['workers'],
+                                            mp_context=multiprocessing.get_context('forkserver'))
+    return _pool
+
+
+def warm_up():
+    """Starts every hashing process now, so the first logins do not wait for the pool to spawn."""
+    if not _settings['workers']:
+        return
+    pool = _get_pool()
+    # Each submit made while no worker is idle spawns one
+    for future in [pool.submit(os.getpid) for _ in range(_settings['workers'])]:
+        future.result(timeout=_settings['timeout'])
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _run(fn, *args):
+    # A waiting request thread holds no GIL, so other requests keep being served meanwhile
+    if not _settings['workers']:
+        return fn(*args)
+    pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+        return future.result(timeout=_settings['timeout'])
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHashingUnavailable(f"hashing took longer than {_settings['timeout']}s") from None
+    except BrokenProcessPool as e:
+        # A worker died; the next call starts a fresh pool
+        _discard_pool(pool)
+        raise PasswordHashingUnavailable('hashing pool is broken') from e
+
+
+def hash_password(password):
+    """Hashes with PASSWORD_HASH_METHOD in the hashing pool."""
+    return _run(generate_password_hash, password, _settings['method'])
+
+
+def verify_password(pwhash, password):
+    return _run(check_password_hash, pwhash, password)
+
+
+def canonical_method(method):
+    """``method`` with werkzeug's defaults filled in, as it prefixes the hashes ('scrypt' -> 'scrypt:32768:8:1')."""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        if not args:
+            return 'scrypt:32768:8:1'
+        if len(args) != 3:
+            raise ValueError("'scrypt' takes 3 arguments.")
+        return 'scrypt:' + ':'.join(str(int(arg)) for arg in args)
+    if name == 'pbkdf2':
+        if len(args) > 2:
+            raise ValueError("'pbkdf2' takes 2 arguments.")
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f"Invalid hash method '{name}'.")
+
+
+def needs_rehash(pwhash):
+    """True when ``pwhash`` was made with other parameters than PASSWORD_HASH_METHOD."""
+    return pwhash.split('$', 1)[0] != _settings['canonical_method']
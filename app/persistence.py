@@ -0,0 +1,312 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+
+from app.emotion_vectors import pack_emotions, storage_mode, unpack_emotions, writes_rows, writes_vectors
+from app.models import db, DiaryEntry, EmotionReport, DailyEmotionRollup
+
+
+def _add_diary_entries(user_id, predictions):
+    """Adds the entries and their reports/rollups to the session without committing; returns the entry ids."""
+    with_vectors = writes_vectors()
+    entries = [
+        DiaryEntry(user_id=user_id, content=item['text'], main_emotion=item['main_emotion'],
+                   main_emotion_percentage=item['probability'][item['main_emotion']],
+                   created_at=item['diary_date'],
+                   emotion_vector=pack_emotions(item['probability']) if with_vectors else None)
+        for item in predictions
+    ]
+    db.session.add_all(entries)
+    db.session.flush()
+
+    report_rows = [
+        {'diary_id': entry.id, 'emotion_name': emotion_name, 'emotion_percentage': emotion_percentage}
+        for entry, item in zip(entries, predictions)
+        for emotion_name, emotion_percentage in item['probability'].items()
+    ] if writes_rows() else []
+    if report_rows:
+        db.session.execute(insert(EmotionReport), report_rows)
+
+    update_daily_rollups(user_id, predictions)
+    # Read while the flushed state is current; after the commit every entry.id would reload its row
+    return [entry.id for entry in entries]
+
+
+def save_diary_entries(user_id, predictions):
+    """Persists scored diary entries and their emotion reports in one transaction.
+
+    ``predictions`` is a list of dicts with ``text``, ``diary_date``,
+    ``main_emotion`` and ``probability`` keys. Entries are flushed together so
+    their ids are known, then every EmotionReport row goes in as a single bulk
+    insert. Depending on EMOTION_STORAGE the percentages go into those rows,
+    the packed emotion_vector column or both. Returns the new entry ids in
+    input order.
+    """
+    try:
+        entry_ids = _add_diary_entries(user_id, predictions)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return entry_ids
+
+
+def write_diary_entries(user_id, predictions):
+    """Persists predictions like save_diary_entries and returns the new entry ids.
+
+    With PERSISTENCE_GROUP_COMMIT the rows are handed to the app's
+    GroupCommitWriter and this blocks until the shared transaction committed,
+    so the caller only answers once the entries are durable.
+    """
+    writer = current_app.extensions.get('group_commit')
+    if writer is not None:
+        return writer.submit(user_id, predictions).result()
+    return save_diary_entries(user_id, predictions)
+
+
+class GroupCommitWriter:
+    """Coalesces writes from concurrent requests into one transaction.
+
+    The first submission opens a window of ``window_ms`` milliseconds; all
+    submissions queued before it closes (up to ``max_batch_size``) are written
+    and committed together, so N requests cost one commit (one fsync) instead
+    of N. If the shared transaction fails, each submission is retried on its
+    own so one bad write does not fail its neighbours.
+    """
+
+    def __init__(self, app, window_ms=2, max_batch_size=64):
+        self.app = app
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, predictions):
+        """Queues a write; the returned Future resolves to the new entry ids once committed."""
+        future = Future()
+        self._queue.put((user_id, predictions, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            added = [_add_diary_entries(user_id, predictions) for user_id, predictions, _ in batch]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            if len(batch) == 1:
+                raise
+            for item in batch:
+                self._write_one(item)
+            return
+        for (_, _, future), entry_ids in zip(batch, added):
+            future.set_result(entry_ids)
+
+    def _write_one(self, item):
+        user_id, predictions, future = item
+        try:
+            future.set_result(save_diary_entries(user_id, predictions))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self.app.app_context():
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    batch[0][2].set_exception(e)
+
+
+def init_app(app):
+    if app.config.get('PERSISTENCE_GROUP_COMMIT'):
+        app.extensions['group_commit'] = GroupCommitWriter(
+            app, window_ms=app.config.get('GROUP_COMMIT_WINDOW_MS', 2),
+            max_batch_size=app.config.get('GROUP_COMMIT_MAX_BATCH', 64))
+
+
+def _as_day(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _upsert_statement(dialect_name):
+    """Dialect specific INSERT that adds to an existing rollup row, or None if unsupported."""
+    table = DailyEmotionRollup.__table__
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=['user_id', 'day', 'emotion_name'],
+            set_={'sum': table.c.sum + stmt.excluded.sum, 'count': table.c.count + stmt.excluded.count})
+    if dialect_name in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update(sum=table.c.sum + stmt.inserted.sum,
+                                            count=table.c.count + stmt.inserted.count)
+    return None
+
+
+def update_daily_rollups(user_id, predictions):
+    """Adds the predictions' emotion percentages to daily_emotion_rollups.
+
+    Runs inside the caller's transaction; the caller commits.
+    """
+    increments = defaultdict(lambda: [0.0, 0])
+    for item in predictions:
+        day = _as_day(item['diary_date'])
+        for emotion_name, emotion_percentage in item['probability'].items():
+            increment = increments[(day, emotion_name)]
+            increment[0] += emotion_percentage
+            increment[1] += 1
+    if not increments:
+        return
+
+    rows = [{'user_id': user_id, 'day': day, 'emotion_name': emotion_name, 'sum': total, 'count': count}
+            for (day, emotion_name), (total, count) in increments.items()]
+
+    stmt = _upsert_statement(db.session.get_bind().dialect.name)
+    if stmt is not None:
+        db.session.execute(stmt, rows)
+        return
+
+    # Portable fallback: lock the touched rows, then update or insert each one
+    days = {row['day'] for row in rows}
+    existing = set(db.session.execute(
+        select(DailyEmotionRollup.day, DailyEmotionRollup.emotion_name)
+        .where(DailyEmotionRollup.user_id == user_id, DailyEmotionRollup.day.in_(days))
+        .with_for_update()).all())
+    for row in rows:
+        if (row['day'], row['emotion_name']) in existing:
+            db.session.execute(
+                update(DailyEmotionRollup)
+                .where(DailyEmotionRollup.user_id == user_id, DailyEmotionRollup.day == row['day'],
+                       DailyEmotionRollup.emotion_name == row['emotion_name'])
+                .values(sum=DailyEmotionRollup.sum + row['sum'], count=DailyEmotionRollup.count + row['count']))
+        else:
+            db.session.execute(insert(DailyEmotionRollup), [row])
+
+
+def rebuild_daily_rollups(user_id=None):
+    """Recomputes daily_emotion_rollups from diary_entries/emotion_reports.
+
+    Limited to one user when ``user_id`` is given. In 'vector' storage mode the
+    packed vectors are the source instead. Returns the number of rollup rows
+    written. The caller commits.
+    """
+    if storage_mode() == 'vector':
+        return _rebuild_daily_rollups_from_vectors(user_id)
+
+    delete_stmt = DailyEmotionRollup.__table__.delete()
+    source = (select(DiaryEntry.user_id, func.date(DiaryEntry.created_at).label('day'), EmotionReport.emotion_name,
+                     func.sum(EmotionReport.emotion_percentage), func.count(EmotionReport.id))
+              .join(EmotionReport, EmotionReport.diary_id == DiaryEntry.id)
+              .where(EmotionReport.emotion_percentage.isnot(None))
+              .group_by(DiaryEntry.user_id, func.date(DiaryEntry.created_at), EmotionReport.emotion_name))
+    if user_id is not None:
+        delete_stmt = delete_stmt.where(DailyEmotionRollup.user_id == user_id)
+        source = source.where(DiaryEntry.user_id == user_id)
+
+    db.session.execute(delete_stmt)
+    result = db.session.execute(
+        insert(DailyEmotionRollup).from_select(['user_id', 'day', 'emotion_name', 'sum', 'count'], source))
+    return result.rowcount
+
+
+def _rebuild_daily_rollups_from_vectors(user_id=None):
+    stmt = select(DiaryEntry.user_id, DiaryEntry.created_at, DiaryEntry.emotion_vector) \
+        .where(DiaryEntry.emotion_vector.isnot(None))
+    delete_stmt = delete(DailyEmotionRollup)
+    if user_id is not None:
+        stmt = stmt.where(DiaryEntry.user_id == user_id)
+        delete_stmt = delete_stmt.where(DailyEmotionRollup.user_id == user_id)
+
+    totals = defaultdict(lambda: [0.0, 0])
+    for entry_user_id, created_at, vector in db.session.execute(stmt.execution_options(yield_per=1000)):
+        for emotion_name, emotion_percentage in unpack_emotions(vector).items():
+            total = totals[(entry_user_id, _as_day(created_at), emotion_name)]
+            total[0] += emotion_percentage
+            total[1] += 1
+
+    db.session.execute(delete_stmt)
+    if totals:
+        db.session.execute(insert(DailyEmotionRollup), [
+            {'user_id': key[0], 'day': key[1], 'emotion_name': key[2], 'sum': total, 'count': count}
+            for key, (total, count) in totals.items()])
+    return len(totals)
+
+
+def pack_emotion_reports(batch_size=1000):
+    """Fills emotion_vector for entries that only have EmotionReport rows.
+
+    Works in batches of ``batch_size`` entries, committing after each one so
+    it can run against a live database. Returns the number of entries packed.
+    """
+    packed = 0
+    while True:
+        entry_ids = db.session.scalars(
+            select(DiaryEntry.id).where(DiaryEntry.emotion_vector.is_(None))
+            .where(select(EmotionReport.id).where(EmotionReport.diary_id == DiaryEntry.id).exists())
+            .order_by(DiaryEntry.id).limit(batch_size)).all()
+        if not entry_ids:
+            return packed
+
+        probabilities = defaultdict(dict)
+        for diary_id, emotion_name, emotion_percentage in db.session.execute(
+                select(EmotionReport.diary_id, EmotionReport.emotion_name, EmotionReport.emotion_percentage)
+                .where(EmotionReport.diary_id.in_(entry_ids))):
+            probabilities[diary_id][emotion_name] = emotion_percentage
+        db.session.execute(update(DiaryEntry), [
+            {'id': entry_id, 'emotion_vector': pack_emotions(probabilities[entry_id])} for entry_id in entry_ids])
+        db.session.commit()
+        packed += len(entry_ids)
+
+
+def unpack_emotion_vectors(batch_size=1000):
+    """Recreates EmotionReport rows for entries that only have a vector (the way back to 'rows')."""
+    unpacked = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            select(DiaryEntry.id, DiaryEntry.emotion_vector)
+            .where(DiaryEntry.id > last_id, DiaryEntry.emotion_vector.isnot(None))
+            .where(~select(EmotionReport.id).where(EmotionReport.diary_id == DiaryEntry.id).exists())
+            .order_by(DiaryEntry.id).limit(batch_size)).all()
+        if not batch:
+            return unpacked
+
+        db.session.execute(insert(EmotionReport), [
+            {'diary_id': entry_id, 'emotion_name': emotion_name, 'emotion_percentage': emotion_percentage}
+            for entry_id, vector in batch for emotion_name, emotion_percentage in unpack_emotions(vector).items()])
+        db.session.commit()
+        unpacked += len(batch)
+        last_id = batch[-1][0]
+
+
+def drop_packed_emotion_reports():
+    """Deletes the EmotionReport rows of entries that have a vector. Returns the number of rows deleted."""
+    deleted = db.session.execute(delete(EmotionReport).where(EmotionReport.diary_id.in_(
+        select(DiaryEntry.id).where(DiaryEntry.emotion_vector.isnot(None))))).rowcount
+    db.session.commit()
+    return deleted
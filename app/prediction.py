@@ -1,28 +1,418 @@
-import joblib
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
-pipe_lr = joblib.load(open("./models/emotion_classifier_pipe_lr.pkl", "rb"))
-#pipe_lr = joblib.load(open("../models/emotion_classifier_pipe_lr.pkl", "rb"))
+from app.metrics import stage
+
+# Either the joblib pickle or a directory produced by tools/export_compact_model.py
+DEFAULT_MODEL_PATH = './models/emotion_classifier_pipe_lr.pkl'
+
+_model = None
+_model_version = None
+_model_analyzer = None
+_model_path = os.getenv('EMOTION_MODEL_PATH', DEFAULT_MODEL_PATH)
+_model_lock = threading.Lock()
+
+
+def load_model(path):
+    """Loads the joblib pipeline, or memory-maps a compact artifact directory."""
+    if os.path.isdir(path):
+        from app.model_artifact import load_compact_pipeline
+        return load_compact_pipeline(path)
+    import joblib
+    with open(path, 'rb') as f:
+        return joblib.load(f)
+
+
+def model_fingerprint(path):
+    """sha256 over the artifact bytes (every file, for a compact artifact directory)."""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))]
+    else:
+        files = [path]
+    for file_path in files:
+        digest.update(os.path.basename(file_path).encode())
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_analyzer(model):
+    """The callable turning a text into the tokens ``model`` scores, or None if it has none to offer.
+
+    Covers sklearn pipelines starting with a Count/Hashing/Tfidf vectorizer and
+    the compact artifact.
+    """
+    vectorizer = model.steps[0][1] if hasattr(model, 'steps') else model
+    build = getattr(vectorizer, 'build_analyzer', None)
+    return build() if build is not None else None
+
+
+def get_model():
+    """Returns the emotion pipeline, loading it on first use."""
+    global _model, _model_version, _model_analyzer
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model_version = model_fingerprint(_model_path)
+                model = load_model(_model_path)
+                _model_analyzer = text_analyzer(model)
+                _model = model
+    return _model
+
+
+def get_model_version():
+    """Fingerprint of the loaded artifact; part of every prediction cache key."""
+    get_model()
+    return _model_version
+
+
+def get_model_analyzer():
+    get_model()
+    return _model_analyzer
+
+
+def is_model_loaded():
+    return _model is not None
+
+
+# Order matches the model's classes_ (the model calls the neutral class "neutral",
+# the API has always returned it as "natural").
+labels = [
+    "anger",
+    "disgust",
+    "fear",
+    "joy",
+    "natural",
+    "sadness",
+    "shame",
+    "surprise"
+]
+
+_batcher = None
+_cache = None
+
+
+def init_app(app):
+    """Reads the model settings and starts the micro-batching engine when enabled.
+
+    The model itself is not loaded here; see get_model() and app.warm_up().
+    """
+    global _batcher, _cache, _model, _model_path
+    model_path = app.config.get('EMOTION_MODEL_PATH', _model_path)
+    if model_path != _model_path:
+        with _model_lock:
+            _model, _model_path = None, model_path
+    if app.config.get('PREDICTION_BATCHING') and _batcher is None:
+        _batcher = MicroBatcher(window_ms=app.config.get('PREDICTION_BATCH_WINDOW_MS', 5),
+                                max_batch_size=app.config.get('PREDICTION_BATCH_MAX_SIZE', 64))
+    _cache = create_cache(app.config)
+
+
+def _to_result(prob_values):
+    prob_dict = {label: prob for label, prob in zip(labels, prob_values)}
+    main_emotion = max(prob_dict, key=prob_dict.get)
+    return main_emotion, prob_dict
+
+
+def _score_texts(texts):
+    """Scores all texts with one predict_proba call, bypassing the cache."""
+    if not texts:
+        return []
+    prob_values = get_model().predict_proba(list(texts)).tolist()
+    return [_to_result(row) for row in prob_values]
+
+
+@stage('inference')
+def predict_batch(texts):
+    """Predicts many texts, scoring every cache miss with one predict_proba call.
+
+    Returns a list of (main_emotion, probability dict) tuples in input order.
+    """
+    texts = list(texts)
+    if _cache is None:
+        return _score_texts(texts)
+
+    results = [_cache.get(text) for text in texts]
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, result in zip(missing, _score_texts([texts[i] for i in missing])):
+        _cache.set(texts[i], result)
+        results[i] = result
+    return results
+
+
+@stage('inference')
+def predict_emotion_details(text):
+    """Single inference entry point: main emotion and probabilities from one pass."""
+    if _cache is not None:
+        cached = _cache.get(text)
+        if cached is not None:
+            return cached
+
+    if _batcher is not None:
+        result = _batcher.submit(text).result()
+    else:
+        result = _score_texts([text])[0]
+
+    if _cache is not None:
+        _cache.set(text, result)
+    return result
 
 
 def predict_emotions(text):
-    return pipe_lr.predict([text])[0]
+    return predict_emotion_details(text)[0]
+
 
 def get_prediction_proba(text):
-    prob_values = pipe_lr.predict_proba([text]).tolist()
-    print('prob values', prob_values)
-    labels = [
-        "anger",
-        "disgust",
-        "fear",
-        "joy",
-        "natural",
-        "sadness",
-        "shame",
-        "surprise"
-    ]
-    prob_dict = {
-        label: prob for label,
-        prob in zip(labels, prob_values[0])
-    }
-    print(prob_dict)
-    return prob_dict
\ No newline at end of file
+    return predict_emotion_details(text)[1]
+
+
+class MicroBatcher:
+    """Collects texts from concurrent request threads and scores them together.
+
+    The first text to arrive opens a window of ``window_ms`` milliseconds; every
+    text queued before it closes (up to ``max_batch_size``) is vectorized into a
+    single sparse matrix and scored with one predict_proba call.
+    """
+
+    def __init__(self, window_ms=5, max_batch_size=64):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, text):
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            futures = [future for _, future in batch]
+            try:
+                results = _score_texts([text for text, _ in batch])
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+def normalize_text(text, analyzer=None):
+    """The form of a diary text the model actually sees, so equivalent texts share a cache entry.
+
+    ``analyzer`` is the loaded model's (see text_analyzer): a bag-of-words
+    model scores only the multiset of its tokens, so their sorted join
+    identifies the prediction exactly, whatever the vectorizer's case,
+    token pattern or stop word settings. Without one the raw text is used.
+    """
+    if analyzer is None:
+        return text
+    return ' '.join(sorted(analyzer(text)))
+
+
+def cache_key(text, model_version, analyzer=None):
+    return hashlib.sha256(f'{model_version}\0{normalize_text(text, analyzer)}'.encode('utf-8')).hexdigest()
+
+
+class LRUEviction:
+    """Entries never expire; the least recently used one goes when the cache is full."""
+
+    def expired(self, stored_at, now):
+        return False
+
+
+class TTLEviction(LRUEviction):
+    """Entries expire ``ttl`` seconds after they were stored."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def expired(self, stored_at, now):
+        return now - stored_at > self.ttl
+
+
+class MemoryCacheBackend:
+    """Per-process bounded cache."""
+
+    def __init__(self, max_entries, eviction):
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (value, evicted count); value is None on a miss."""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None, 0
+            value, stored_at = item
+            if self.eviction.expired(stored_at, time.time()):
+                del self._entries[key]
+                return None, 1
+            self._entries.move_to_end(key)
+            return value, 0
+
+    def set(self, key, value):
+        """Stores value; returns the number of entries evicted to make room."""
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteCacheBackend:
+    """Cache shared by every worker process on the host through one SQLite file."""
+
+    def __init__(self, path, max_entries, eviction):
+        self.path = path
+        self.max_entries = max_entries
+        self.eviction = eviction
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS prediction_cache ('
+                         'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                         'stored_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_prediction_cache_accessed_at '
+                         'ON prediction_cache (accessed_at)')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            row = conn.execute('SELECT value, stored_at FROM prediction_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None, 0
+            if self.eviction.expired(row[1], now):
+                conn.execute('DELETE FROM prediction_cache WHERE key = ?', (key,))
+                return None, 1
+            conn.execute('UPDATE prediction_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        main_emotion, probability = json.loads(row[0])
+        return (main_emotion, probability), 0
+
+    def set(self, key, value):
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO prediction_cache (key, value, stored_at, accessed_at) '
+                         'VALUES (?, ?, ?, ?)', (key, json.dumps(value), now, now))
+            cursor = conn.execute(
+                'DELETE FROM prediction_cache WHERE key IN ('
+                'SELECT key FROM prediction_cache ORDER BY accessed_at '
+                'LIMIT max((SELECT COUNT(*) FROM prediction_cache) - ?, 0))', (self.max_entries,))
+            return max(cursor.rowcount, 0)
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM prediction_cache')
+
+
+class PredictionCache:
+    """Content-addressed prediction cache with hit/miss/eviction counters.
+
+    Keys hash the text as the model's own analyzer tokenizes it together with
+    the model fingerprint, so swapping the model artifact invalidates every
+    existing entry.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, text):
+        value, evicted = self.backend.get(cache_key(text, get_model_version(), get_model_analyzer()))
+        with self._lock:
+            self.evictions += evicted
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            return None
+        main_emotion, probability = value
+        return main_emotion, dict(probability)
+
+    def set(self, text, result):
+        main_emotion, probability = result
+        evicted = self.backend.set(cache_key(text, get_model_version(), get_model_analyzer()),
+                                   (main_emotion, dict(probability)))
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+def create_cache(config):
+    """Builds the cache described by the PREDICTION_CACHE* settings, or None when disabled."""
+    backend_name = (config.get('PREDICTION_CACHE') or 'none').lower()
+    if backend_name == 'none':
+        return None
+
+    ttl = config.get('PREDICTION_CACHE_TTL', 0)
+    eviction = TTLEviction(ttl) if ttl else LRUEviction()
+    max_entries = config.get('PREDICTION_CACHE_MAX_ENTRIES', 10000)
+
+    if backend_name == 'memory':
+        backend = MemoryCacheBackend(max_entries, eviction)
+    elif backend_name == 'sqlite':
+        backend = SqliteCacheBackend(config.get('PREDICTION_CACHE_PATH', 'prediction_cache.sqlite3'),
+                                     max_entries, eviction)
+    else:
+        raise ValueError(f'Unknown PREDICTION_CACHE backend: {backend_name}')
+    return PredictionCache(backend)
+
+
+def get_cache_stats():
+    """Hit/miss/eviction counters of this process, or None when caching is off."""
+    return _cache.stats() if _cache is not None else None
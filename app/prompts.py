@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from datetime import date
+
+try:
+    import tiktoken
+except ImportError:  # optional; the estimate below is close enough for budgeting
+    tiktoken = None
+
+RESOLUTIONS = ('daily', 'weekly', 'monthly')
+
+_encoding = None
+
+
+def estimate_tokens(text):
+    """Token count of ``text`` for the chat models (tiktoken if installed, otherwise ~4 chars per token)."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding('o200k_base')
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _bucket_start(day, resolution):
+    if resolution == 'weekly':
+        return date.fromordinal(day.toordinal() - day.weekday())
+    return day.replace(day=1)
+
+
+def bucket_series(entries, resolution):
+    """Groups [{'date', 'value'}] points into weekly or monthly buckets.
+
+    Returns (bucket start, mean, min, max, points) tuples in date order.
+    """
+    buckets = OrderedDict()
+    for entry in sorted(entries, key=lambda e: e['date']):
+        start = _bucket_start(date.fromisoformat(entry['date']), resolution)
+        buckets.setdefault(start, []).append(entry['value'])
+    return [(start, sum(values) / len(values), min(values), max(values), len(values))
+            for start, values in buckets.items()]
+
+
+def format_emotion_data(emotion_data, resolution='daily'):
+    """Readable prompt text for detailed (per date) or overall (average) emotion data.
+
+    'daily' lists every point as before; 'weekly' and 'monthly' summarise each
+    bucket as mean/min/max so the text grows with the number of buckets.
+    """
+    if resolution == 'daily':
+        prompt = "Here is the emotion data over a period of time:\n\n"
+    else:
+        prompt = f"Here is the emotion data over a period of time, as {resolution} mean/min/max values:\n\n"
+
+    for emotion, entries in emotion_data.items():
+        prompt += f"Emotion: {emotion.capitalize()}\n"
+
+        # Handle detailed reports (list of date-value pairs)
+        if isinstance(entries, list):
+            if resolution == 'daily':
+                for entry in entries:
+                    prompt += f"- On {entry['date']}, the value was {entry['value']:.5f}.\n"
+            else:
+                for start, mean, low, high, points in bucket_series(entries, resolution):
+                    label = f"Week of {start.isoformat()}" if resolution == 'weekly' else start.strftime('%Y-%m')
+                    prompt += f"- {label}: mean {mean:.3f}, min {low:.3f}, max {high:.3f} ({points} values).\n"
+        # Handle overall report (float values)
+        elif isinstance(entries, float):
+            prompt += f"- The average value was {entries:.5f}.\n"
+
+        prompt += "\n"
+
+    return prompt
+
+
+def build_emotion_prompt(emotion_data, token_budget=None):
+    """Formats emotion data at the finest resolution whose text fits ``token_budget``.
+
+    Tries daily, then weekly, then monthly; monthly is used even if it is
+    still over budget. No budget, or no per-date series to bucket (overall
+    averages), means daily. Returns (text, resolution).
+    """
+    if not token_budget or not any(isinstance(entries, list) for entries in emotion_data.values()):
+        return format_emotion_data(emotion_data, 'daily'), 'daily'
+    for resolution in RESOLUTIONS:
+        text = format_emotion_data(emotion_data, resolution)
+        if resolution == RESOLUTIONS[-1] or estimate_tokens(text) <= token_budget:
+            return text, resolution
@@ -0,0 +1,156 @@
+import base64
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import selectinload
+
+from app.emotion_vectors import unpack_emotions
+from app.models import db, DiaryEntry, EmotionReport, DailyEmotionRollup
+
+
+def encode_cursor(entry):
+    """Opaque keyset cursor pointing just past ``entry`` in (created_at, id) order."""
+    raw = json.dumps([entry.created_at.isoformat(), entry.id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Returns (created_at, id); raises ValueError for a malformed cursor."""
+    try:
+        created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (TypeError, ValueError, UnicodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def diary_entries_page(user_id, after=None, limit=None, load_reports=True):
+    """Select for a user's diary entries in (created_at, id) order, reports eager loaded.
+
+    ``after`` is a decoded cursor; only entries strictly after it are returned.
+    The emotion reports of the whole page are fetched with one extra IN query,
+    unless ``load_reports`` is False (entries carry packed emotion vectors).
+    """
+    stmt = (select(DiaryEntry)
+            .where(DiaryEntry.user_id == user_id)
+            .order_by(DiaryEntry.created_at, DiaryEntry.id))
+    if load_reports:
+        stmt = stmt.options(selectinload(DiaryEntry.emotion_reports))
+    if after is not None:
+        created_at, entry_id = after
+        stmt = stmt.where(or_(DiaryEntry.created_at > created_at,
+                              and_(DiaryEntry.created_at == created_at, DiaryEntry.id > entry_id)))
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _in_range(stmt, user_id, start_date, end_date):
+    # Compare against datetimes, [start, end + 1 day), so the whole end day is included on
+    # every backend (SQLite compares a bare date string lexically against stored datetimes)
+    start = datetime.combine(start_date, time.min)
+    end = datetime.combine(end_date + timedelta(days=1), time.min)
+    return stmt.where(DiaryEntry.user_id == user_id, DiaryEntry.created_at >= start,
+                      DiaryEntry.created_at < end)
+
+
+def emotion_series(user_id, start_date, end_date):
+    """Select of (created_at, emotion_name, emotion_percentage) for every report in range, in date order."""
+    stmt = (select(DiaryEntry.created_at, EmotionReport.emotion_name, EmotionReport.emotion_percentage)
+            .join(EmotionReport, EmotionReport.diary_id == DiaryEntry.id)
+            .order_by(DiaryEntry.created_at, DiaryEntry.id, EmotionReport.id))
+    return _in_range(stmt, user_id, start_date, end_date)
+
+
+def emotion_averages(user_id, start_date, end_date):
+    """Select of (emotion_name, average percentage) over the range."""
+    stmt = (select(EmotionReport.emotion_name, func.avg(EmotionReport.emotion_percentage))
+            .join(DiaryEntry, EmotionReport.diary_id == DiaryEntry.id)
+            .group_by(EmotionReport.emotion_name))
+    return _in_range(stmt, user_id, start_date, end_date)
+
+
+def aggregate_emotion_reports(user_id, start_date, end_date):
+    """Builds the /emotion-reports data with two queries, however long the range is.
+
+    Returns (detailed, overall): detailed maps each emotion to its
+    [{'date', 'value'}] series, overall maps it to its average. Both are empty
+    when the user has no entries in the range.
+    """
+    detailed = defaultdict(list)
+    for created_at, emotion_name, emotion_percentage in db.session.execute(
+            emotion_series(user_id, start_date, end_date)):
+        detailed[emotion_name].append({'date': created_at.strftime('%Y-%m-%d'), 'value': emotion_percentage})
+
+    if not detailed:
+        return {}, {}
+
+    overall = {emotion_name: average for emotion_name, average in db.session.execute(
+        emotion_averages(user_id, start_date, end_date))}
+    return dict(detailed), overall
+
+
+def aggregate_emotion_vectors(user_id, start_date, end_date):
+    """Same shape as aggregate_emotion_reports, read from the packed emotion vectors.
+
+    One query over diary_entries (no join); the series and the averages are
+    computed while unpacking. Entries without a vector are skipped, so run
+    `flask emotions pack` before relying on it.
+    """
+    detailed = defaultdict(list)
+    totals = defaultdict(lambda: [0.0, 0])
+    stmt = (select(DiaryEntry.created_at, DiaryEntry.emotion_vector)
+            .where(DiaryEntry.emotion_vector.isnot(None))
+            .order_by(DiaryEntry.created_at, DiaryEntry.id))
+    for created_at, vector in db.session.execute(_in_range(stmt, user_id, start_date, end_date)):
+        day = created_at.strftime('%Y-%m-%d')
+        for emotion_name, emotion_percentage in unpack_emotions(vector).items():
+            detailed[emotion_name].append({'date': day, 'value': emotion_percentage})
+            total = totals[emotion_name]
+            total[0] += emotion_percentage
+            total[1] += 1
+
+    overall = {emotion_name: total / count for emotion_name, (total, count) in totals.items()}
+    return dict(detailed), overall
+
+
+def _rollups_in_range(stmt, user_id, start_date, end_date):
+    return stmt.where(DailyEmotionRollup.user_id == user_id, DailyEmotionRollup.day >= start_date,
+                      DailyEmotionRollup.day <= end_date)
+
+
+def rollup_series(user_id, start_date, end_date):
+    """Select of (day, emotion_name, daily average) from daily_emotion_rollups, in day order."""
+    stmt = (select(DailyEmotionRollup.day, DailyEmotionRollup.emotion_name,
+                   DailyEmotionRollup.sum / DailyEmotionRollup.count)
+            .where(DailyEmotionRollup.count > 0)
+            .order_by(DailyEmotionRollup.day, DailyEmotionRollup.emotion_name))
+    return _rollups_in_range(stmt, user_id, start_date, end_date)
+
+
+def rollup_averages(user_id, start_date, end_date):
+    """Select of (emotion_name, average over every entry in the range) from daily_emotion_rollups."""
+    stmt = (select(DailyEmotionRollup.emotion_name,
+                   func.sum(DailyEmotionRollup.sum) / func.sum(DailyEmotionRollup.count))
+            .where(DailyEmotionRollup.count > 0)
+            .group_by(DailyEmotionRollup.emotion_name))
+    return _rollups_in_range(stmt, user_id, start_date, end_date)
+
+
+def aggregate_emotion_rollups(user_id, start_date, end_date):
+    """Same shape as aggregate_emotion_reports, read from the daily rollups.
+
+    The detailed series has one point per day (the mean of that day's
+    entries); the overall averages weigh every entry equally, as before.
+    """
+    detailed = defaultdict(list)
+    for day, emotion_name, average in db.session.execute(rollup_series(user_id, start_date, end_date)):
+        detailed[emotion_name].append({'date': day.strftime('%Y-%m-%d'), 'value': average})
+
+    if not detailed:
+        return {}, {}
+
+    overall = {emotion_name: average for emotion_name, average in db.session.execute(
+        rollup_averages(user_id, start_date, end_date))}
+    return dict(detailed), overall
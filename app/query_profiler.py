@@ -0,0 +1,165 @@
+import logging
+import time
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# The profile of the request being served in this thread/context, None outside requests
+_current = ContextVar('query_profile', default=None)
+
+
+class QueryProfile:
+    """Statements seen while profiling, as (statement, parameters, seconds)."""
+
+    def __init__(self):
+        self.queries = []
+
+    def before(self, conn):
+        conn.info[self] = time.perf_counter()
+
+    def after(self, conn, statement, parameters):
+        start = conn.info.pop(self, None)
+        if start is not None:
+            self.queries.append((statement, parameters, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(seconds for _, _, seconds in self.queries)
+
+    def slowest(self, n):
+        return sorted(self.queries, key=lambda query: query[2], reverse=True)[:n]
+
+    def repeated(self, min_count):
+        """{statement: times run} for statements run at least ``min_count`` times (N+1 suspects)."""
+        counts = {}
+        for statement, _, _ in self.queries:
+            counts[statement] = counts.get(statement, 0) + 1
+        return {statement: n for statement, n in counts.items() if n >= min_count}
+
+
+def _format(queries):
+    return '\n'.join(f'  {seconds * 1000:8.2f} ms  {_one_line(statement)}  {_short(parameters)}'
+                     for statement, parameters, seconds in queries)
+
+
+def _one_line(statement):
+    return ' '.join(statement.split())
+
+
+def _short(parameters, limit=200):
+    text = repr(parameters)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget(ContextDecorator):
+    """Fails with QueryBudgetExceeded when the block runs more than ``max_queries`` statements on ``engine``.
+
+    Usable as ``with QueryBudget(3, engine): ...`` or as a decorator; the
+    captured statements stay on ``.profile`` for further assertions.
+    """
+
+    def __init__(self, max_queries, engine):
+        self.max_queries = max_queries
+        self.engine = engine
+        self.profile = QueryProfile()
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self.profile.before(conn)
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.profile.after(conn, statement, parameters)
+
+    @property
+    def statements(self):
+        return [statement for statement, _, _ in self.profile.queries]
+
+    def __enter__(self):
+        self.profile = QueryProfile()
+        event.listen(self.engine, 'before_cursor_execute', self._before)
+        event.listen(self.engine, 'after_cursor_execute', self._after)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(self.engine, 'before_cursor_execute', self._before)
+        event.remove(self.engine, 'after_cursor_execute', self._after)
+        if exc_type is None and self.profile.count > self.max_queries:
+            raise QueryBudgetExceeded(f'{self.profile.count} queries, budget is {self.max_queries}:\n'
+                                      f'{_format(self.profile.queries)}')
+        return False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is not None:
+        profile.before(conn)
+        conn.info['query_profile'] = profile
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = conn.info.pop('query_profile', None)
+    if profile is not None:
+        profile.after(conn, statement, parameters)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    profile = conn.info.pop('query_profile', None) if conn is not None else None
+    if profile is not None:
+        conn.info.pop(profile, None)
+
+
+def init_app(app):
+    """Logs the SQL of every request when SQL_PROFILER_ENABLED is set.
+
+    Each request gets one INFO line with its query count and SQL time plus its
+    SQL_PROFILER_LOG_SLOWEST slowest statements with their parameters.
+    Statements over SQL_PROFILER_SLOW_MS and statements repeated
+    SQL_PROFILER_REPEAT_WARNING times in one request (N+1 suspects) are
+    logged as warnings.
+    """
+    if not app.config.get('SQL_PROFILER_ENABLED', False):
+        return
+    slow_ms = app.config.get('SQL_PROFILER_SLOW_MS', 100)
+    log_slowest = app.config.get('SQL_PROFILER_LOG_SLOWEST', 3)
+    repeat_warning = app.config.get('SQL_PROFILER_REPEAT_WARNING', 10)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+    @app.before_request
+    def start_profile():
+        g.query_profile = QueryProfile()
+        _current.set(g.query_profile)
+
+    @app.teardown_request
+    def log_profile(exc):
+        profile = g.pop('query_profile', None)
+        _current.set(None)
+        if profile is None or not profile.count:
+            return
+        where = f'{request.method} {request.path}'
+        logger.info('%s: %d queries, %.1f ms in SQL\n%s', where, profile.count, profile.total_time * 1000,
+                    _format(profile.slowest(log_slowest)))
+
+        for statement, parameters, seconds in profile.queries:
+            if seconds * 1000 >= slow_ms:
+                logger.warning('%s: slow query (%.1f ms): %s  %s', where, seconds * 1000, _one_line(statement),
+                               _short(parameters))
+        for statement, n in profile.repeated(repeat_warning).items():
+            logger.warning('%s: statement ran %d times, possible N+1: %s', where, n, _one_line(statement))
@@ -1,29 +1,34 @@
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-
-from app.prediction import predict_emotions, get_prediction_proba
-from app.utils import create_response, create_error
-
-from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
-from app.models import db, User, EmotionReport, DiaryEntry  # Import db from models, not directly from app
+from flask_jwt_extended import create_access_token, jwt_required, current_user
+
+from app.prediction import predict_emotion_details, predict_batch
+from app.persistence import write_diary_entries
+from app.queries import (diary_entries_page, encode_cursor, decode_cursor, aggregate_emotion_reports,
+                         aggregate_emotion_rollups, aggregate_emotion_vectors)
+from app.emotion_vectors import entry_emotions, storage_mode
+from app.utils import (create_response, create_error, create_ndjson_response, create_sse_response, wants_ndjson,
+                       wants_sse)
+
+from flask import Blueprint, request, jsonify, session, current_app, url_for
+from app.models import db, User, EmotionReport, DiaryEntry, ReportJob  # Import db from models, not directly from app
 from datetime import datetime
-from openai import OpenAI
 from datetime import timedelta
-from collections import defaultdict
-import json
-import re
-import os
-from dotenv import load_dotenv
+from app.llm import generate_report_texts, stream_report_texts
+from app.jobs import enqueue_report_job, serialize_job
+from app.identity import token_claims
+from app.passwords import PasswordHashingUnavailable, hash_password, needs_rehash, verify_password
 
 main = Blueprint('main', __name__)
-load_dotenv()
-users_db = {}
 
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+@main.errorhandler(PasswordHashingUnavailable)
+def password_hashing_unavailable(e):
+    return create_error(message='Password service unavailable, try again', status=503)
+
+
+users_db = {}
 
 @main.route('/register', methods=['POST'])
 def register():
-    print(request.json)
     data = request.json
     username = data.get('username')
     email = data.get('email')
@@ -36,7 +41,8 @@ def register():
     if existing_user:
         return jsonify({'message': 'User already exists'}), 400
 
-    hashed_password = generate_password_hash(password)
+    # Hashed in the process pool, off the request thread
+    hashed_password = hash_password(password)
 
     # Create a new user instance
     new_user = User(username=username, email=email, password=hashed_password)
@@ -52,98 +58,168 @@ def login():
     data = request.json
     email = data.get('email')
     password = data.get('password')
-    print('loged')
     # Query the user from the database
     user = User.query.filter_by(email=email).first()
 
     if not user:
         return create_error(message='Invalid email or password', status=401)
 
-    print(user.password, password)
-    if user and check_password_hash(user.password, password):
-        access_token = create_access_token(identity={'email': user.email}, expires_delta=timedelta(hours=24))
+    if user and verify_password(user.password, password):
+        # Bring the stored hash up to the configured PASSWORD_HASH_METHOD while we have the password
+        if needs_rehash(user.password):
+            user.password = hash_password(password)
+            db.session.commit()
+        access_token = create_access_token(identity={'email': user.email}, expires_delta=timedelta(hours=24),
+                                           additional_claims=token_claims(user))
         return create_response(data={'access_token': access_token}, message='Login successful', status=200)
     else:
         return create_error(message='Invalid email or password', status=401)
 
 
 
-@main.route('/predict_details', methods=['POST'])
-@jwt_required()
-def predict():
-    data = request.get_json()
+def parse_diary_item(data):
+    """Validates a {text, selected_dairy_date} payload.
+
+    Returns (text, diary_date, error_message); error_message is None when valid.
+    """
+    if not isinstance(data, dict):
+        return None, None, 'Each item must be an object'
+
     text = data.get('text', '')
     selected_dairy_date = data.get('selected_dairy_date', '')  # Date from the frontend
 
-    if not text:
-        return create_error(message='Text input is required', status=400)
+    if not text or not isinstance(text, str):
+        return None, None, 'Text input is required'
 
     if not selected_dairy_date:
-        return create_error(message='Selected dairy date is required', status=400)
+        return None, None, 'Selected dairy date is required'
 
     # Parse the selected diary date
     try:
         diary_date = datetime.strptime(selected_dairy_date, '%Y-%m-%d').date()
-    except ValueError:
-        return create_error(message='Invalid date format. Use YYYY-MM-DD.', status=400)
-
-    # Perform emotion prediction
-    prediction = predict_emotions(text)
-    probability = get_prediction_proba(text)
-
-    # Identify the main emotion and its percentage
-    main_emotion = max(probability, key=probability.get)
-    main_emotion_percentage = probability[main_emotion]
-
-    # Get the current user from the JWT token
-    current_user_email = get_jwt_identity()['email']
-    user = User.query.filter_by(email=current_user_email).first()
-
-    # Create a new DiaryEntry instance
-    new_entry = DiaryEntry(user_id=user.id, content=text, main_emotion=main_emotion,
-                           main_emotion_percentage=main_emotion_percentage, created_at=diary_date
-                           # Save the selected diary date
-                           )
-    db.session.add(new_entry)
-    db.session.commit()
+    except (TypeError, ValueError):
+        return None, None, 'Invalid date format. Use YYYY-MM-DD.'
 
-    # Save the emotion reports
-    for emotion_name, emotion_percentage in probability.items():
-        new_emotion_report = EmotionReport(diary_id=new_entry.id, emotion_name=emotion_name,
-                                           emotion_percentage=emotion_percentage)
-        db.session.add(new_emotion_report)
+    return text, diary_date, None
 
-    db.session.commit()
+
+@main.route('/predict_details', methods=['POST'])
+@jwt_required()
+def predict():
+    data = request.get_json()
+    text, diary_date, error = parse_diary_item(data)
+
+    if error:
+        return create_error(message=error, status=400)
+
+    # Perform emotion prediction (main emotion and probabilities in a single pass)
+    main_emotion, probability = predict_emotion_details(text)
+
+    # Current user from the JWT token (cached identity, no query)
+    user = current_user
+
+    # The entry, its emotion reports and the rollups are written in one transaction
+    entry_id, = write_diary_entries(user.id, [{'text': text, 'diary_date': diary_date, 'main_emotion': main_emotion,
+                                               'probability': probability}])
 
     # Prepare the response data
-    response_data = {'id': new_entry.id, 'prediction': main_emotion, 'probability': probability}
+    response_data = {'id': entry_id, 'prediction': main_emotion, 'probability': probability}
 
     return create_response(data=response_data, message='Prediction successful', status=200)
 
 
+@main.route('/predict_details/batch', methods=['POST'])
+@jwt_required()
+def predict_batch_details():
+    data = request.get_json(silent=True) or {}
+    items = data.get('items') if isinstance(data, dict) else None
+
+    if not isinstance(items, list) or not items:
+        return create_error(message='A non-empty items list is required', status=400)
+
+    max_items = current_app.config.get('DIARY_BATCH_MAX_ITEMS', 500)
+    if len(items) > max_items:
+        return create_error(message=f'A batch can contain at most {max_items} items', status=413)
+
+    user = current_user
+
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        text, diary_date, error = parse_diary_item(item)
+        if error:
+            results[index] = {'index': index, 'status': 400, 'message': error}
+        else:
+            valid.append((index, text, diary_date))
+
+    if valid:
+        # Score every valid text in one predict_proba call
+        scored = predict_batch([text for _, text, _ in valid])
+        predictions = [
+            {'text': text, 'diary_date': diary_date, 'main_emotion': main_emotion, 'probability': probability}
+            for (_, text, diary_date), (main_emotion, probability) in zip(valid, scored)
+        ]
+        entry_ids = write_diary_entries(user.id, predictions)
+
+        for (index, _, _), entry_id, item in zip(valid, entry_ids, predictions):
+            results[index] = {'index': index, 'status': 200,
+                              'data': {'id': entry_id, 'prediction': item['main_emotion'],
+                                       'probability': item['probability']}}
+
+    return create_response(data=results, message=f'Processed {len(valid)} of {len(items)} items', status=200)
+
+
+def serialize_diary_entry(entry):
+    return {'id': entry.id, 'content': entry.content, 'main_emotion': entry.main_emotion,
+            'main_emotion_percentage': entry.main_emotion_percentage,
+            'created_at': entry.created_at.strftime('%Y-%m-%d %H:%M:%S'), 'emotion_reports': [
+            {'emotion_name': emotion_name, 'emotion_percentage': emotion_percentage} for emotion_name, emotion_percentage
+            in entry_emotions(entry)]}
+
+
 @main.route('/diary-reports', methods=['GET'])
 @jwt_required()
 def get_diary_reports():
-    current_user_email = get_jwt_identity()['email']
+    user = current_user
 
-    user = User.query.filter_by(email=current_user_email).first()
+    # Optional keyset pagination: ?limit=N&cursor=<next_cursor of the previous page>
+    limit = None
+    max_limit = current_app.config.get('DIARY_REPORTS_MAX_LIMIT', 1000)
+    if 'limit' in request.args:
+        try:
+            limit = int(request.args['limit'])
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= max_limit:
+            return create_error(message=f'limit must be between 1 and {max_limit}', status=400)
 
-    if not user:
-        return create_error(message="User not found", status=404)
+    after = None
+    if request.args.get('cursor'):
+        try:
+            after = decode_cursor(request.args['cursor'])
+        except ValueError:
+            return create_error(message='Invalid cursor', status=400)
+
+    # With packed vectors only the entries themselves are read
+    stmt = diary_entries_page(user.id, after=after, limit=limit, load_reports=storage_mode() != 'vector')
 
-    diary_entries = DiaryEntry.query.filter_by(user_id=user.id).all()
+    if wants_ndjson():
+        # Stream the history in chunks; each chunk's emotion reports come from one IN query
+        chunk_size = current_app.config.get('DIARY_REPORTS_STREAM_CHUNK', 500)
+        entries = db.session.scalars(stmt.execution_options(yield_per=chunk_size))
+        return create_ndjson_response(serialize_diary_entry(entry) for entry in entries)
 
-    reports = []
-    for entry in diary_entries:
-        emotion_reports = EmotionReport.query.filter_by(diary_id=entry.id).all()
-        report = {'id': entry.id, 'content': entry.content, 'main_emotion': entry.main_emotion,
-                  'main_emotion_percentage': entry.main_emotion_percentage,
-                  'created_at': entry.created_at.strftime('%Y-%m-%d %H:%M:%S'), 'emotion_reports': [
-                {'emotion_name': emotion.emotion_name, 'emotion_percentage': emotion.emotion_percentage} for emotion in
-                emotion_reports]}
-        reports.append(report)
+    # One query for the page of entries, one for all of their emotion reports
+    diary_entries = db.session.scalars(stmt).all()
 
-    return create_response(data=reports, message="Diary reports fetched successfully", status=200)
+    reports = [serialize_diary_entry(entry) for entry in diary_entries]
+
+    next_cursor = None
+    if limit is not None and len(diary_entries) == limit:
+        next_cursor = encode_cursor(diary_entries[-1])
+
+    return create_response(data=reports, message="Diary reports fetched successfully", status=200,
+                           meta={'next_cursor': next_cursor})
 
 
 
@@ -168,108 +244,6 @@ def get_diary_reports():
 #
 
 
-def generate_gpt_description(data_type, data):
-    prompt_created = convert_emotion_data_to_prompt(data)
-
-    prompt = f"Here is the {data_type} data about emotions: {prompt_created}. Can you provide a summary or description of the emotional state in a paragraph?write using simple english.and limit your pargaph into 800 words. "
-
-    try:
-
-        completion = client.chat.completions.create(model="gpt-4o", messages=[
-            {"role": "system", "content": f"Summarize the given {data_type} emotion data."},
-            {"role": "user", "content": prompt}])
-
-        print(completion)
-        return completion.choices[0].message.content
-
-    except KeyError as e:
-        return f"Error generating description: Key {str(e)} missing in response"
-    except Exception as e:
-        return f"Error generating description: {str(e)}"
-
-
-def convert_emotion_data_to_prompt(emotion_data):
-    """Converts detailed or overall emotion data into a readable prompt format for GPT."""
-    prompt = "Here is the emotion data over a period of time:\n\n"
-
-    for emotion, entries in emotion_data.items():
-        prompt += f"Emotion: {emotion.capitalize()}\n"
-
-        # Handle detailed reports (list of date-value pairs)
-        if isinstance(entries, list):
-            for entry in entries:
-                date = entry['date']
-                value = entry['value']
-                prompt += f"- On {date}, the value was {value:.5f}.\n"
-        # Handle overall report (float values)
-        elif isinstance(entries, float):
-            prompt += f"- The average value was {entries:.5f}.\n"
-
-        prompt += "\n"
-
-    return prompt
-
-
-def generate_gpt_suggestions(main_emotions):
-    """Generates suggestions for managing emotions based on the main detected emotions."""
-    global suggestions_temp
-    print(main_emotions)
-    prompt = f"""
-        Act like an expert psychologist with 20 years of experience in emotional well-being and mental health. You specialize in creating practical, evidence-based strategies for managing emotions and promoting mental health.
-
-        Objective: You are provided with the following emotions: {', '.join(main_emotions)}. Your task is to create 10 highly actionable and detailed suggestions that individuals can use to improve their emotional well-being and manage the listed emotions effectively. 
-
-        Instructions:
-        1. Each suggestion should focus on real-world application, providing clear steps that individuals can follow.
-        2. Use simple language to ensure accessibility for all audiences, but ensure depth and detail to offer meaningful solutions.
-        
-        can you give this suggestion as a array object
-         Output Format (JSON):
-    [
-       {{
-          "topic": "Practice Mindfulness Meditation",
-          "explanation": "Mindfulness meditation allows you to become more aware of your emotions in a non-judgmental way. This practice helps manage emotions like anxiety or sadness by focusing on the present moment.",
-          "steps": "Start with 5 minutes a day, focusing on your breath."
-       }},
-       {{
-          "topic": "Engage in Creative Expression",
-          "explanation": "Creative activities such as drawing or journaling can provide an emotional outlet and help reduce stress by externalizing your emotions in a constructive way.",
-          "steps": "Set aside 30 minutes for drawing or journaling daily."
-       }},
-       ...other suggestions
-    ]
-        """
-    try:
-        completion = client.chat.completions.create(model="gpt-4o", messages=[
-            {"role": "system", "content": "You are an expert in mental health and well-being."},
-            {"role": "user", "content": prompt}])
-
-        print(completion)
-        response_text = completion.choices[0].message.content
-
-        # Log the raw response for debugging purposes
-        print('=======================================')
-        print(response_text)
-        print('=======================================')
-
-        json_array_match = re.search(r'(\[\s*{.*}\s*\])', response_text, re.DOTALL)
-        if json_array_match:
-            json_array_str = json_array_match.group(1)
-
-            # Parse the JSON string into a Python list
-            suggestions_temp = json.loads(json_array_str)
-            print('=======================================')
-            print(suggestions_temp)
-            print('=======================================')
-
-        return suggestions_temp
-
-
-
-    except Exception as e:
-        return f"Error generating suggestions: {str(e)}"
-
-
 @main.route('/emotion-reports', methods=['POST'])
 @jwt_required()
 def get_emotion_reports_by_date_range():
@@ -282,6 +256,11 @@ def get_emotion_reports_by_date_range():
     if not start_date_str or not end_date_str:
         return jsonify({'message': 'Start date and end date are required'}), 400
 
+    # A real JSON bool: the string "false" would otherwise count as true
+    run_async = data.get('async', current_app.config.get('EMOTION_REPORTS_ASYNC', False))
+    if not isinstance(run_async, bool):
+        return jsonify({'message': 'async must be true or false'}), 400
+
     # Parse the dates
     try:
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
@@ -289,56 +268,56 @@ def get_emotion_reports_by_date_range():
     except ValueError:
         return jsonify({'message': 'Invalid date format. Use YYYY-MM-DD.'}), 400
 
-    current_user_email = get_jwt_identity()
+    # Get current user from the JWT token (a missing user is answered with 404 by the user lookup)
+    user = current_user
 
-    if not current_user_email:
-        return jsonify({'message': 'Unauthorized access'}), 401
-
-    # Get current user from the JWT token
-    current_user_email = get_jwt_identity()['email']
-    user = User.query.filter_by(email=current_user_email).first()
+    # Per-day series and overall averages straight from SQL (two queries for any range length).
+    # The rollup table keeps the cost proportional to the number of days, not entries.
+    if current_app.config.get('EMOTION_REPORTS_SOURCE', 'rollups') == 'rollups':
+        emotions_data, overall_report = aggregate_emotion_rollups(user.id, start_date, end_date)
+    elif storage_mode() == 'vector':
+        emotions_data, overall_report = aggregate_emotion_vectors(user.id, start_date, end_date)
+    else:
+        emotions_data, overall_report = aggregate_emotion_reports(user.id, start_date, end_date)
 
-    if not user:
-        return jsonify({'message': 'User not found'}), 404
+    if not emotions_data:
+        return jsonify({'message': 'No diary entries found for the given date range'}), 404
 
-    # Query diary entries within the specified date range for the current user
-    diary_entries = DiaryEntry.query.filter(DiaryEntry.user_id == user.id, DiaryEntry.created_at >= start_date,
-                                            DiaryEntry.created_at <= end_date).all()
+    main_emotions = sorted(overall_report, key=overall_report.get, reverse=True)[:3]
 
-    if not diary_entries:
-        return jsonify({'message': 'No diary entries found for the given date range'}), 404
+    # Async mode: answer now and let the job pool run the slow LLM stages
+    if run_async:
+        job = enqueue_report_job(user.id, emotions_data, overall_report, main_emotions)
+        status_url = url_for('main.get_emotion_report_job', job_id=job.id)
+        return jsonify({'job_id': job.id, 'status': job.status, 'status_url': status_url}), 202, \
+            {'Location': status_url}
 
-    # Initialize a dictionary to store emotions and their corresponding values
-    emotions_data = defaultdict(list)
-    overall_emotions = defaultdict(float)
-    entry_count = defaultdict(int)  # Track how many times each emotion appears for averaging
+    # SSE mode: the numbers go out right away, the texts token by token as the model writes them
+    if wants_sse():
+        def events():
+            yield 'report', {'detailed_reports': emotions_data, 'overall_report': overall_report}
+            for kind, field, value in stream_report_texts(emotions_data, overall_report, main_emotions):
+                yield kind, ({'field': field, 'text': value} if kind == 'delta' else {'field': field, 'value': value})
+            yield 'done', {}
 
-    # Loop through each diary entry and its associated emotion reports
-    for entry in diary_entries:
-        emotion_reports = EmotionReport.query.filter_by(diary_id=entry.id).all()
+        return create_sse_response(events())
 
-        for report in emotion_reports:
-            # Add to detailed emotion data
-            emotions_data[report.emotion_name].append(
-                {'date': entry.created_at.strftime('%Y-%m-%d'), 'value': report.emotion_percentage})
+    # The two descriptions and the suggestions are generated concurrently
+    texts, _ = generate_report_texts(emotions_data, overall_report, main_emotions)
 
-            # Add to overall emotion totals
-            overall_emotions[report.emotion_name] += report.emotion_percentage
-            entry_count[report.emotion_name] += 1
+    return jsonify({'detailed_reports': emotions_data, 'overall_report': overall_report,
+                    'detailed_reports_desc': texts['detailed_reports_desc'],
+                    'overall_report_desc': texts['overall_report_desc'],
+                    'suggestions': texts['suggestions']}), 200
 
-    # Calculate the average percentage for each emotion (overall report)
-    overall_report = {}
-    for emotion, total_value in overall_emotions.items():
-        if entry_count[emotion] > 0:
-            average_value = total_value / entry_count[emotion]
-            overall_report[emotion] = average_value
 
-    main_emotions = sorted(overall_report, key=overall_report.get, reverse=True)[:3]
+@main.route('/emotion-reports/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_emotion_report_job(job_id):
+    job = db.session.get(ReportJob, job_id)
 
-    detailed_reports_desc = generate_gpt_description("detailed reports", emotions_data)
-    overall_report_desc = generate_gpt_description("overall report", overall_report)
-    suggestions = generate_gpt_suggestions(main_emotions)
+    # Someone else's job looks the same as a missing one
+    if not job or job.user_id != current_user.id:
+        return jsonify({'message': 'Job not found'}), 404
 
-    return jsonify({'detailed_reports': emotions_data, 'overall_report': overall_report,
-                    'detailed_reports_desc': detailed_reports_desc, 'overall_report_desc': overall_report_desc,
-                    'suggestions': suggestions}), 200
+    return jsonify(serialize_job(job)), 200
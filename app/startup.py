@@ -0,0 +1,17 @@
+import time
+from contextlib import contextmanager
+
+
+def get_startup_timings(app):
+    """Per-component initialization cost (seconds) recorded for this app, in order."""
+    return app.extensions.setdefault('startup_timings', {})
+
+
+@contextmanager
+def timed(app, component):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = get_startup_timings(app)
+        timings[component] = timings.get(component, 0.0) + time.perf_counter() - start
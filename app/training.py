@@ -0,0 +1,192 @@
+"""Offline training of the emotion classifier (replaces the Colab notebook).
+
+Reads ``nookbook/data/emotion_dataset_raw.csv``, holds out the notebook's 30%
+split (random_state 42) and runs a
+cross-validated grid search over the LogisticRegression C (and, with the
+hashing vectorizer, its width) on all cores. The winner is written as a
+versioned artifact directory:
+
+    model.pkl      joblib pipeline; point EMOTION_MODEL_PATH at this file
+    metrics.json   data checksum, search results and the evaluate() metrics
+
+The notebook cleaned the texts before training while the app predicts on
+raw text. Here the cleaning (dropping @user handles and English stop words)
+is done by the vectorizer itself, so the saved pipeline cleans its own input
+and the held-out metrics are measured on exactly what the app serves.
+
+'count' is the notebook's CountVectorizer, whose vocabulary dict is most of
+the pickle. 'hashing' hashes terms into a fixed number of columns instead,
+so nothing but the weights is stored.
+"""
+import csv
+import hashlib
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.pipeline import Pipeline
+
+DATASET = os.path.join(os.path.dirname(__file__), os.pardir, 'nookbook', 'data', 'emotion_dataset_raw.csv')
+TEST_SIZE = 0.3
+SPLIT_SEED = 42
+VECTORIZERS = ('count', 'hashing')
+
+# sklearn's default token pattern, minus words right after an '@' (user handles)
+CLEAN_TOKEN_PATTERN = r'(?u)(?<!@)\b\w\w+\b'
+
+
+def text_options(clean=True):
+    """Vectorizer settings that clean the text like the notebook's neattext calls.
+
+    sklearn's English stop word list stands in for neattext's (not a
+    dependency), so a few borderline words are treated differently.
+    """
+    if not clean:
+        return {}
+    return {'stop_words': 'english', 'token_pattern': CLEAN_TOKEN_PATTERN}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_dataset(path=DATASET):
+    """(raw texts, labels) from the corpus CSV, in file order."""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = [(row['Text'] or '', row['Emotion']) for row in csv.DictReader(f)]
+    return [text for text, _ in rows], [label for _, label in rows]
+
+
+def split_dataset(texts, labels):
+    """The notebook's held-out split: (x_train, x_test, y_train, y_test)."""
+    return train_test_split(texts, labels, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+
+
+def build_pipeline(vectorizer='count', n_features=2 ** 16, max_iter=1000, clean=True):
+    if vectorizer == 'count':
+        step = ('cv', CountVectorizer(**text_options(clean)))
+    elif vectorizer == 'hashing':
+        # Plain counts, as CountVectorizer gives, so the two options are comparable
+        step = ('hv', HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                                        **text_options(clean)))
+    else:
+        raise ValueError(f'Unknown vectorizer {vectorizer!r}; choose from {", ".join(VECTORIZERS)}')
+    return Pipeline(steps=[step, ('lr', LogisticRegression(max_iter=max_iter))])
+
+
+def search(pipeline, x_train, y_train, c_values=(0.3, 1.0, 3.0), n_features=None, cv=3, n_jobs=-1):
+    """Cross-validated grid search; every fold/candidate fit runs in its own process (``n_jobs``)."""
+    grid = {'lr__C': list(c_values)}
+    if n_features and pipeline.steps[0][0] == 'hv':
+        grid['hv__n_features'] = list(n_features)
+    searcher = GridSearchCV(pipeline, grid, cv=cv, n_jobs=n_jobs, scoring='accuracy')
+    searcher.fit(x_train, y_train)
+    return searcher
+
+
+def evaluate(model, x_test, y_test, path=None, latency_samples=200):
+    """Accuracy, artifact size, load time and inference latency, side by side for any model.
+
+    ``path`` is the saved artifact (a joblib file or compact directory); size
+    and load time are only reported when it is given.
+    """
+    from app.prediction import load_model
+
+    metrics = {'accuracy': float(np.mean(model.predict(x_test) == np.asarray(y_test)))}
+    if path is not None:
+        files = [os.path.join(path, name) for name in os.listdir(path)] if os.path.isdir(path) else [path]
+        metrics['size_bytes'] = sum(os.path.getsize(file) for file in files)
+        loads = []
+        for _ in range(3):
+            start = time.perf_counter()
+            load_model(path)
+            loads.append(time.perf_counter() - start)
+        metrics['load_time_ms'] = min(loads) * 1000
+
+    texts = list(x_test[:latency_samples])
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        model.predict_proba([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    metrics['latency_p50_ms'] = statistics.median(latencies)
+    metrics['latency_p95_ms'] = latencies[int(0.95 * (len(latencies) - 1))]
+
+    batch = list(x_test[:1000])
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    metrics['batch_texts_per_s'] = len(batch) / (time.perf_counter() - start)
+    return metrics
+
+
+def artifact_version(vectorizer, now=None):
+    now = now or datetime.now(timezone.utc)
+    return f"emotion-lr-{vectorizer}-{now.strftime('%Y%m%dT%H%M%SZ')}"
+
+
+def save_artifact(model, out_dir, info):
+    """Writes model.pkl and metrics.json into ``out_dir``; returns the model path."""
+    os.makedirs(out_dir, exist_ok=True)
+    model_path = os.path.join(out_dir, 'model.pkl')
+    with open(model_path, 'wb') as f:
+        joblib.dump(model, f)
+    write_metrics(out_dir, info)
+    return model_path
+
+
+def write_metrics(out_dir, info):
+    with open(os.path.join(out_dir, 'metrics.json'), 'w') as f:
+        json.dump(info, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def train(dataset=DATASET, out_root='models', vectorizer='count', c_values=(0.3, 1.0, 3.0), n_features=(2 ** 16,),
+          cv=3, n_jobs=-1, max_iter=1000, clean=True, baseline=None, log=print):
+    """Runs the search, saves the best pipeline as a new versioned artifact and returns its metrics.json data.
+
+    ``baseline`` (a model path, e.g. the served pickle) is scored on the same
+    held-out split and stored next to the new numbers.
+    """
+    texts, labels = load_dataset(dataset)
+    x_train, x_test, y_train, y_test = split_dataset(texts, labels)
+    log(f'{len(x_train)} training / {len(x_test)} held-out texts, {vectorizer} vectorizer')
+
+    start = time.perf_counter()
+    searcher = search(build_pipeline(vectorizer, n_features[0], max_iter, clean), x_train, y_train,
+                      c_values=c_values, n_features=n_features, cv=cv, n_jobs=n_jobs)
+    search_seconds = time.perf_counter() - start
+    log(f'Search: best {searcher.best_params_} (cv accuracy {searcher.best_score_:.4f}) in {search_seconds:.1f}s')
+
+    version = artifact_version(vectorizer)
+    out_dir = os.path.join(out_root, version)
+    info = {
+        'version': version,
+        'vectorizer': vectorizer,
+        'classes': [str(c) for c in searcher.best_estimator_.classes_],
+        'text_options': text_options(clean),
+        'dataset': {'path': os.path.relpath(dataset), 'sha256': file_sha256(dataset),
+                    'train_size': len(x_train), 'test_size': len(x_test), 'split_seed': SPLIT_SEED},
+        'search': {'params': searcher.param_grid, 'cv': cv, 'n_jobs': n_jobs, 'seconds': search_seconds,
+                   'best_params': searcher.best_params_, 'best_cv_accuracy': float(searcher.best_score_)},
+        'sklearn_version': sklearn.__version__,
+    }
+    model_path = save_artifact(searcher.best_estimator_, out_dir, info)
+    info['metrics'] = evaluate(searcher.best_estimator_, x_test, y_test, model_path)
+    if baseline:
+        from app.prediction import load_model
+        info['baseline'] = {'path': baseline, **evaluate(load_model(baseline), x_test, y_test, baseline)}
+    write_metrics(out_dir, info)
+    return info
@@ -1,12 +1,19 @@
-from flask import jsonify
+import json
 
+from flask import Response, jsonify, request, stream_with_context
 
-def create_response(data=None, message='', status=200):
+NDJSON_MIMETYPE = 'application/x-ndjson'
+SSE_MIMETYPE = 'text/event-stream'
+
+
+def create_response(data=None, message='', status=200, meta=None):
     response = {
         'status': status,
         'message': message,
         'data': data
     }
+    if meta is not None:
+        response['meta'] = meta
     return jsonify(response), status
 
 
@@ -20,6 +27,52 @@ def create_error(message='', status=400):
     return jsonify(response), status
 
 
+def wants_ndjson():
+    """True when the client asked for a streamed NDJSON body (?stream=1 or Accept header)."""
+    if request.args.get('stream') in ('1', 'true', 'ndjson'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def create_ndjson_response(rows, status=200, flush_every=100):
+    """Streams an iterable of JSON-serializable objects, one object per line.
+
+    Rows are consumed lazily while the response is written, so the caller can
+    pass a generator over a ``yield_per`` query and memory stays flat.
+    """
+    def generate():
+        buffer = []
+        for row in rows:
+            buffer.append(json.dumps(row, separators=(',', ':')))
+            if len(buffer) >= flush_every:
+                yield '\n'.join(buffer) + '\n'
+                buffer = []
+        if buffer:
+            yield '\n'.join(buffer) + '\n'
+
+    return Response(stream_with_context(generate()), status=status, mimetype=NDJSON_MIMETYPE)
+
+
+def wants_sse():
+    """True when the client asked for server-sent events (?stream=sse or Accept header)."""
+    if request.args.get('stream') == 'sse':
+        return True
+    return request.accept_mimetypes.best == SSE_MIMETYPE
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
 
+def create_sse_response(events, status=200):
+    """Streams ``(event, data)`` pairs as server-sent events.
 
+    Every event is written as soon as the iterable produces it; the headers
+    keep proxies from buffering the stream.
+    """
+    def generate():
+        for event, data in events:
+            yield sse_event(event, data)
 
+    return Response(stream_with_context(generate()), status=status, mimetype=SSE_MIMETYPE,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,83 @@
+"""Benchmarks the /emotion-reports aggregation: per-entry queries vs. SQL GROUP BY.
+
+    python -m benchmarks.bench_emotion_reports [--entries 10000] [--days 365] [--db sqlite:///bench.db]
+
+Only the data step is timed; the LLM calls are not part of it. Both
+implementations run against the same seeded database and must agree.
+"""
+import argparse
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import event
+
+from app import db
+from app.models import DiaryEntry, EmotionReport
+from app.queries import aggregate_emotion_reports
+from benchmarks.common import make_app, create_user, seed_entries, measure
+
+
+def legacy_aggregate(user_id, start_date, end_date):
+    """The loop /emotion-reports used before aggregation moved into SQL."""
+    diary_entries = DiaryEntry.query.filter(DiaryEntry.user_id == user_id, DiaryEntry.created_at >= start_date,
+                                            DiaryEntry.created_at <= end_date).all()
+    emotions_data = defaultdict(list)
+    overall_emotions = defaultdict(float)
+    entry_count = defaultdict(int)
+    for entry in diary_entries:
+        for report in EmotionReport.query.filter_by(diary_id=entry.id).all():
+            emotions_data[report.emotion_name].append(
+                {'date': entry.created_at.strftime('%Y-%m-%d'), 'value': report.emotion_percentage})
+            overall_emotions[report.emotion_name] += report.emotion_percentage
+            entry_count[report.emotion_name] += 1
+    overall_report = {emotion: total / entry_count[emotion] for emotion, total in overall_emotions.items()}
+    return emotions_data, overall_report
+
+
+def _count_queries(engine, fn):
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return len(statements)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--db', default='sqlite:///:memory:')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    app = make_app(args.db)
+    with app.app_context():
+        user = create_user()
+        seed_entries(user.id, args.entries, days=args.days)
+        start, end = date(2024, 1, 1), date(2024, 1, 1).replace(year=2030)
+
+        legacy_detailed, legacy_overall = legacy_aggregate(user.id, start, end)
+        detailed, overall = aggregate_emotion_reports(user.id, start, end)
+        assert sorted(legacy_overall) == sorted(overall)
+        assert all(abs(legacy_overall[k] - overall[k]) < 1e-9 for k in overall)
+        assert {k: len(v) for k, v in legacy_detailed.items()} == {k: len(v) for k, v in detailed.items()}
+
+        rows = [('legacy (per-entry queries)', lambda: legacy_aggregate(user.id, start, end)),
+                ('sql (join + group by)', lambda: aggregate_emotion_reports(user.id, start, end))]
+        print(f'{args.entries} entries over {args.days} days')
+        print(f"{'implementation':<28}{'queries':>9}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, fn in rows:
+            queries = _count_queries(db.engine, fn)
+            stats = measure(fn, repeat=args.repeat, warmup=1)
+            db.session.expunge_all()
+            print(f"{name:<28}{queries:>9}{stats['mean_ms']:>10.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
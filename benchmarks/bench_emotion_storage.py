@@ -0,0 +1,82 @@
+"""Storage size, write and read latency of emotion_reports rows vs. packed emotion vectors.
+
+    python -m benchmarks.bench_emotion_storage [--entries 20000] [--days 365] [--page 100]
+
+Each EMOTION_STORAGE mode gets its own SQLite file with the same synthetic
+entries. Size is the vacuumed file; writes go through save_diary_entries
+in batches; reads are one /diary-reports page (query + serialization) and
+the per-entry /emotion-reports aggregation.
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+
+from app import db
+from app.models import DiaryEntry
+from app.persistence import save_diary_entries
+from app.prediction import labels
+from app.queries import aggregate_emotion_reports, aggregate_emotion_vectors, diary_entries_page
+from app.routes import serialize_diary_entry
+from benchmarks.common import make_app, create_user, seed_entries, measure
+
+
+def _predictions(count, seed=1):
+    rng = random.Random(seed)
+    predictions = []
+    for i in range(count):
+        weights = [rng.random() for _ in labels]
+        probability = {label: weight / sum(weights) for label, weight in zip(labels, weights)}
+        main_emotion = max(probability, key=probability.get)
+        predictions.append({'text': f'Benchmark entry {i}', 'diary_date': datetime(2025, 1, 1) + timedelta(minutes=i),
+                            'main_emotion': main_emotion, 'probability': probability})
+    return predictions
+
+
+def run_mode(mode, path, args):
+    app = make_app(f'sqlite:///{path}', EMOTION_STORAGE=mode)
+    start, end = date(2024, 1, 1), date(2030, 1, 1)
+    with app.test_request_context():
+        user = create_user()
+        seed_entries(user.id, args.entries, days=args.days, storage=mode)
+        db.session.execute(db.text('VACUUM'))
+        size = os.path.getsize(path)
+
+        batches = iter([_predictions(args.batch, seed=i) for i in range(args.repeat + 1)])
+        write = measure(lambda: save_diary_entries(user.id, next(batches)), repeat=args.repeat, warmup=1)
+
+        def read_page():
+            entries = db.session.scalars(diary_entries_page(user.id, limit=args.page,
+                                                            load_reports=mode != 'vector')).all()
+            [serialize_diary_entry(entry) for entry in entries]
+            db.session.expunge_all()
+
+        aggregate = aggregate_emotion_vectors if mode == 'vector' else aggregate_emotion_reports
+        page = measure(read_page, repeat=args.repeat * 5)
+        report = measure(lambda: aggregate(user.id, start, end), repeat=args.repeat)
+        assert db.session.query(DiaryEntry).count() == args.entries + args.batch * (args.repeat + 1)
+        db.engine.dispose()
+    return size, write, page, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--page', type=int, default=100, help='/diary-reports page size')
+    parser.add_argument('--batch', type=int, default=100, help='entries per save_diary_entries call')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f'{args.entries} entries, {args.page}-entry pages, {args.batch}-entry write batches')
+    print(f"{'storage':<9}{'db MB':>8}{'write ms':>10}{'page ms':>10}{'report ms':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('rows', 'dual', 'vector'):
+            size, write, page, report = run_mode(mode, os.path.join(tmp, f'{mode}.sqlite3'), args)
+            print(f"{mode:<9}{size / 1e6:>8.2f}{write['p50_ms']:>10.2f}{page['p50_ms']:>10.2f}"
+                  f"{report['p50_ms']:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
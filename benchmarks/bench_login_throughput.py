@@ -0,0 +1,118 @@
+"""Login throughput under concurrent load: inline password hashing vs. the hashing process pool.
+
+    python -m benchmarks.bench_login_throughput [--clients 16] [--seconds 5] [--method scrypt:32768:8:1]
+
+Serves the app with werkzeug's threaded server on a SQLite file and hammers
+/login from ``--clients`` threads. One extra client keeps polling
+/diary-reports to show what hashing does to unrelated requests. The app is
+warmed up (model, hashing processes) before the clock starts, as serving
+processes are.
+"""
+import argparse
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+
+from flask_jwt_extended import create_access_token
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import db, warm_up
+from app.models import User
+from benchmarks.common import make_app, percentile
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def _post(conn, path, payload, headers=None):
+    conn.request('POST', path, body=json.dumps(payload),
+                 headers={'Content-Type': 'application/json', **(headers or {})})
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def _get(conn, path, headers):
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def run_mode(workers, path, args):
+    app = make_app(f'sqlite:///{path}', PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_METHOD=args.method)
+    with app.app_context():
+        users = [User(username=f'user{i}', email=f'user{i}@example.com',
+                      password=generate_password_hash('benchpass', args.method)) for i in range(args.clients)]
+        db.session.add_all(users)
+        db.session.commit()
+        token = create_access_token(identity={'email': users[0].email}, additional_claims={'uid': users[0].id})
+
+    warm_up(app)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    stop = threading.Event()
+    logins, others = [], []
+    lock = threading.Lock()
+
+    def login_client(i):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        while not stop.is_set():
+            start = time.perf_counter()
+            status = _post(conn, '/login', {'email': f'user{i}@example.com', 'password': 'benchpass'})
+            assert status == 200, status
+            with lock:
+                logins.append((time.perf_counter() - start) * 1000)
+
+    def other_client():
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        while not stop.is_set():
+            start = time.perf_counter()
+            assert _get(conn, '/diary-reports', {'Authorization': f'Bearer {token}'}) == 200
+            with lock:
+                others.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_client, args=(i,)) for i in range(args.clients)]
+    threads.append(threading.Thread(target=other_client))
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    logins.sort()
+    others.sort()
+    return len(logins) / args.seconds, percentile(logins, 50), percentile(logins, 95), percentile(others, 95)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent login clients')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--method', default='scrypt:32768:8:1', help='PASSWORD_HASH_METHOD')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='hashing processes for the pool run')
+    args = parser.parse_args(argv)
+
+    print(f'{args.clients} login clients for {args.seconds:.0f}s, {args.method}, {os.cpu_count()} CPUs')
+    print(f"{'hashing':<14}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'other p95 ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in (0, args.workers):
+            label = 'inline' if not workers else f'pool ({workers})'
+            throughput, p50, p95, other_p95 = run_mode(workers, os.path.join(tmp, f'login{workers}.sqlite3'), args)
+            print(f'{label:<14}{throughput:>10.1f}{p50:>10.1f}{p95:>10.1f}{other_p95:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
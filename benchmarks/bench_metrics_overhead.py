@@ -0,0 +1,57 @@
+"""Cost of per-request stage timing: the same requests with METRICS_ENABLED off and on.
+
+    python -m benchmarks.bench_metrics_overhead [--repeat 200] [--rounds 5] [--entries 1000]
+
+Times /predict_details (inference, two writes) and the first /diary-reports
+page (SQL, JSON) through the test client, so the difference is the before/after
+request hooks, the SQL cursor events and the timed JSON encoding. The two
+apps are measured in alternating rounds and the median round is reported, so
+drift on a busy machine hits both alike. The cursor events are registered
+process-wide, so 'off' still pays their (no-op) check.
+"""
+import argparse
+import statistics
+
+from flask_jwt_extended import create_access_token
+
+from benchmarks.common import make_app, create_user, seed_entries, measure
+
+PAYLOAD = {'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'}
+
+
+def make_requests(enabled, entries):
+    app = make_app(METRICS_ENABLED=enabled, METRICS_SERVER_TIMING=enabled, PREDICTION_CACHE='none')
+    with app.app_context():
+        user = create_user()
+        seed_entries(user.id, entries)
+        token = create_access_token(identity={'email': user.email}, additional_claims={'uid': user.id})
+    headers = {'Authorization': f'Bearer {token}'}
+    client = app.test_client()
+    return {
+        'predict_details': lambda: client.post('/predict_details', headers=headers, json=PAYLOAD),
+        'diary_reports.page100': lambda: client.get('/diary-reports?limit=100', headers=headers),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help='requests per case and mode')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--entries', type=int, default=1000, help='seeded diary entries')
+    args = parser.parse_args(argv)
+
+    modes = {'off': make_requests(False, args.entries), 'on': make_requests(True, args.entries)}
+    p50s = {(mode, name): [] for mode in modes for name in modes[mode]}
+    for _ in range(args.rounds):
+        for mode, requests in modes.items():
+            for name, fn in requests.items():
+                p50s[mode, name].append(measure(fn, repeat=max(1, args.repeat // args.rounds), warmup=2)['p50_ms'])
+
+    print(f"{'request':<24}{'off p50 ms':>12}{'on p50 ms':>12}{'overhead ms':>13}")
+    for name in modes['off']:
+        before, after = statistics.median(p50s['off', name]), statistics.median(p50s['on', name])
+        print(f'{name:<24}{before:>12.3f}{after:>12.3f}{after - before:>13.3f}')
+
+
+if __name__ == '__main__':
+    main()
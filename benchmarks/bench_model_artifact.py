@@ -0,0 +1,111 @@
+"""Compares the joblib pickle with the compact memory-mapped artifact.
+
+    python -m benchmarks.bench_model_artifact [--artifact DIR] [--requests N]
+
+Each loader runs in a fresh subprocess so RSS and load time are not skewed by
+the other. Reported per loader: load time (including any imports the loader
+needs beyond numpy and the app package), RSS and private memory after load
+and after serving requests, and single-text predict_proba latency. Private memory is what each
+extra worker process costs; mapped artifact pages show up as shared instead.
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DATASET = os.path.join('nookbook', 'data', 'emotion_dataset_raw.csv')
+PICKLE = os.path.join('models', 'emotion_classifier_pipe_lr.pkl')
+
+CHILD = r'''
+import json, sys, time, warnings
+warnings.simplefilter('ignore')
+import numpy as np
+import app  # the web app is already imported in a worker; keep it out of the measurement
+
+def memory():
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Private_Clean:', 'Private_Dirty:'):
+                values[parts[0][:-1]] = int(parts[1]) * 1024
+    return values['Rss'], values['Private_Clean'] + values['Private_Dirty']
+
+kind, path, texts_file, n = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+texts = json.load(open(texts_file))[:n]
+rss_before, private_before = memory()
+
+start = time.perf_counter()
+if kind == 'joblib':
+    import joblib
+    model = joblib.load(open(path, 'rb'))
+else:
+    from app.model_artifact import load_compact_pipeline
+    model = load_compact_pipeline(path)
+load_time = time.perf_counter() - start
+rss_loaded, private_loaded = memory()
+
+latencies = []
+for text in texts:
+    t0 = time.perf_counter()
+    model.predict_proba([text])
+    latencies.append(time.perf_counter() - t0)
+rss_served, private_served = memory()
+
+proba = model.predict_proba(texts[:200]).tolist()
+json.dump({
+    'load_time_s': load_time,
+    'rss_load_delta_mb': (rss_loaded - rss_before) / 2**20,
+    'private_load_delta_mb': (private_loaded - private_before) / 2**20,
+    'rss_served_delta_mb': (rss_served - rss_before) / 2**20,
+    'private_served_delta_mb': (private_served - private_before) / 2**20,
+    'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+    'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+    'proba': proba,
+}, sys.stdout)
+'''
+
+
+def _run(kind, path, texts_file, n):
+    output = subprocess.check_output([sys.executable, '-c', CHILD, kind, path, texts_file, str(n)])
+    return json.loads(output)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--artifact', help='compact artifact directory (exported to a temp dir if omitted)')
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with open(DATASET, newline='', encoding='utf-8') as f:
+        texts = [row['Text'] for row in csv.DictReader(f)][:args.requests]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        artifact = args.artifact
+        if not artifact:
+            from tools.export_compact_model import main as export
+            artifact = os.path.join(tmp, 'compact')
+            export([PICKLE, artifact])
+
+        texts_file = os.path.join(tmp, 'texts.json')
+        with open(texts_file, 'w') as f:
+            json.dump(texts, f)
+
+        results = {'joblib': _run('joblib', PICKLE, texts_file, args.requests),
+                   'compact': _run('compact', artifact, texts_file, args.requests)}
+
+    import numpy as np
+    max_diff = float(np.abs(np.array(results['joblib'].pop('proba')) -
+                            np.array(results['compact'].pop('proba'))).max())
+
+    print(f"{'metric':<26}{'joblib':>12}{'compact':>12}")
+    for metric in results['joblib']:
+        print(f"{metric:<26}{results['joblib'][metric]:>12.3f}{results['compact'][metric]:>12.3f}")
+    print(f'max |proba difference|: {max_diff:.2e}')
+
+
+if __name__ == '__main__':
+    main()
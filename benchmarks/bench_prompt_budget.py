@@ -0,0 +1,75 @@
+"""Prompt size and /emotion-reports latency across range lengths, with and without the token budget.
+
+    python -m benchmarks.bench_prompt_budget [--ranges 7,30,90,180,365] [--budget 3000] [--base-url URL]
+
+Without --base-url the LLM is tools/llm_stub_server.py with a fixed latency
+plus --prompt-latency seconds per 1000 prompt tokens, a rough stand-in for
+prefill cost. Point --base-url at a real endpoint (OPENAI_API_KEY set) for
+real numbers. The LLM response cache is off so every call reaches the model.
+"""
+import argparse
+from datetime import date, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app import llm
+from app.persistence import rebuild_daily_rollups
+from app.models import db
+from app.prompts import build_emotion_prompt, estimate_tokens
+from app.queries import aggregate_emotion_rollups
+from benchmarks.common import make_app, create_user, seed_entries, measure
+from tools.llm_stub_server import StubChatCompletionsServer
+
+START = date(2024, 1, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ranges', default='7,30,90,180,365', help='comma separated range lengths in days')
+    parser.add_argument('--budget', type=int, default=3000, help='LLM_PROMPT_TOKEN_BUDGET to compare against none')
+    parser.add_argument('--base-url', default=None, help='chat completions endpoint; default is the local stub')
+    parser.add_argument('--latency', type=float, default=0.3, help='stub: fixed seconds per completion')
+    parser.add_argument('--prompt-latency', type=float, default=0.2, help='stub: seconds per 1000 prompt tokens')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    ranges = [int(days) for days in args.ranges.split(',')]
+
+    stub = None
+    if args.base_url is None:
+        stub = StubChatCompletionsServer(latency=args.latency, prompt_latency=args.prompt_latency).start()
+    app = make_app(OPENAI_BASE_URL=args.base_url or stub.url, LLM_CACHE_ENABLED=False)
+
+    try:
+        with app.app_context():
+            user = create_user()
+            seed_entries(user.id, max(ranges), days=max(ranges), start=START)
+            rebuild_daily_rollups(user.id)
+            db.session.commit()
+            headers = {'Authorization': f"Bearer {create_access_token(identity={'email': user.email})}"}
+
+        client = app.test_client()
+        print(f"{'days':>5}{'budget':>8}{'resolution':>12}{'data tokens':>13}{'mean ms':>10}{'p95 ms':>10}")
+        for days in ranges:
+            payload = {'start_date': START.isoformat(), 'end_date': (START + timedelta(days=days - 1)).isoformat()}
+            with app.app_context():
+                detailed, _ = aggregate_emotion_rollups(user.id, START, START + timedelta(days=days - 1))
+
+            for budget in (0, args.budget):
+                text, resolution = build_emotion_prompt(detailed, budget)
+                app.config['LLM_PROMPT_TOKEN_BUDGET'] = budget
+                llm.init_app(app)
+
+                def call():
+                    response = client.post('/emotion-reports', headers=headers, json=payload)
+                    assert response.status_code == 200, response.get_data(as_text=True)
+
+                stats = measure(call, repeat=args.repeat, warmup=1)
+                print(f"{days:>5}{budget or 'none':>8}{resolution:>12}{estimate_tokens(text):>13}"
+                      f"{stats['mean_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+    finally:
+        if stub is not None:
+            stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Diary write throughput: two commits per entry vs. one transaction vs. group commit.
+
+    python -m benchmarks.bench_write_path [--writes 2000] [--concurrency 16] [--window-ms 2]
+
+Each mode writes to a fresh SQLite file from ``--concurrency`` threads, each
+thread doing what one /predict_details request does after scoring (user
+lookup excluded). SQLite serialises writers, so this mostly shows how many
+commits (fsyncs) each mode pays for.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import DiaryEntry, EmotionReport
+from app.persistence import update_daily_rollups, write_diary_entries
+from app.prediction import labels
+from benchmarks.common import make_app, create_user, percentile
+
+
+def legacy_write(user_id, prediction):
+    """The predict view before the single-transaction write path: entry commit, then reports commit."""
+    entry = DiaryEntry(user_id=user_id, content=prediction['text'], main_emotion=prediction['main_emotion'],
+                       main_emotion_percentage=prediction['probability'][prediction['main_emotion']],
+                       created_at=prediction['diary_date'])
+    db.session.add(entry)
+    db.session.commit()
+    for emotion_name, emotion_percentage in prediction['probability'].items():
+        db.session.add(EmotionReport(diary_id=entry.id, emotion_name=emotion_name,
+                                     emotion_percentage=emotion_percentage))
+    update_daily_rollups(user_id, [prediction])
+    db.session.commit()
+
+
+def _prediction(rng, i):
+    weights = [rng.random() for _ in labels]
+    probability = {label: weight / sum(weights) for label, weight in zip(labels, weights)}
+    return {'text': f'Benchmark entry {i}', 'diary_date': datetime(2024, 1, 1) + timedelta(days=i % 365),
+            'main_emotion': max(probability, key=probability.get), 'probability': probability}
+
+
+def run_mode(mode, path, args):
+    app = make_app(f'sqlite:///{path}', PERSISTENCE_GROUP_COMMIT=mode == 'group commit',
+                   GROUP_COMMIT_WINDOW_MS=args.window_ms, GROUP_COMMIT_MAX_BATCH=args.concurrency * 4)
+    with app.app_context():
+        user_id = create_user().id
+
+    latencies = []
+    lock = threading.Lock()
+    per_thread = args.writes // args.concurrency
+
+    def worker(seed):
+        rng = random.Random(seed)
+        with app.app_context():
+            for i in range(per_thread):
+                prediction = _prediction(rng, i)
+                start = time.perf_counter()
+                if mode == 'two commits':
+                    legacy_write(user_id, prediction)
+                else:
+                    write_diary_entries(user_id, [prediction])
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        assert DiaryEntry.query.count() == per_thread * args.concurrency
+        db.engine.dispose()
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 95)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--window-ms', type=float, default=2.0, help='group commit window')
+    args = parser.parse_args(argv)
+
+    print(f'{args.writes} single-entry writes from {args.concurrency} threads, SQLite file databases')
+    print(f"{'mode':<16}{'writes/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('two commits', 'one transaction', 'group commit'):
+            throughput, p50, p95 = run_mode(mode, os.path.join(tmp, mode.replace(' ', '_') + '.sqlite3'), args)
+            print(f'{mode:<16}{throughput:>10.0f}{p50:>10.2f}{p95:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Helpers shared by the benchmark scripts."""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from werkzeug.security import generate_password_hash
+
+from app import create_app, db
+from app.emotion_vectors import pack_emotions
+from app.models import User, DiaryEntry, EmotionReport
+from app.prediction import labels
+
+
+def make_app(database_uri='sqlite:///:memory:', **config):
+    """TestingConfig app bound to ``database_uri`` with a fresh schema.
+
+    ``config`` goes through create_app's overrides: the engine and the
+    prediction/LLM settings are read in init_app, so setting app.config
+    afterwards would silently have no effect.
+    """
+    app = create_app('TestingConfig', overrides={'SQLALCHEMY_DATABASE_URI': database_uri, **config})
+    with app.app_context():
+        if db.engine.url != make_url(database_uri):
+            raise RuntimeError(f'Benchmark app is bound to {db.engine.url}, not {database_uri}')
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def create_user(email='bench@example.com', password='benchpass'):
+    user = User(username=email.split('@')[0], email=email,
+                password=generate_password_hash(password, method='pbkdf2:sha256:1000'))
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def seed_entries(user_id, count, days=365, start=date(2024, 1, 1), seed=0, storage='rows'):
+    """Bulk inserts ``count`` diary entries with eight emotion reports each.
+
+    Entries are spread over ``days`` consecutive days; probabilities are random
+    but deterministic for a given seed. ``storage`` is an EMOTION_STORAGE
+    mode: 'rows' writes emotion_reports, 'vector' the packed column, 'dual'
+    both. Must run inside an app context.
+    """
+    rng = random.Random(seed)
+    entries = []
+    vectors = []
+    for i in range(count):
+        weights = [rng.random() for _ in labels]
+        total = sum(weights)
+        probability = {label: weight / total for label, weight in zip(labels, weights)}
+        main_emotion = max(probability, key=probability.get)
+        vectors.append(probability)
+        entries.append({'user_id': user_id, 'content': f'Synthetic diary entry {i}', 'main_emotion': main_emotion,
+                        'main_emotion_percentage': probability[main_emotion],
+                        'created_at': start + timedelta(days=i % days),
+                        'emotion_vector': pack_emotions(probability) if storage != 'rows' else None})
+
+    ids = db.session.scalars(insert(DiaryEntry).returning(DiaryEntry.id), entries).all()
+    if storage == 'vector':
+        db.session.commit()
+        return ids
+    db.session.execute(insert(EmotionReport), [
+        {'diary_id': entry_id, 'emotion_name': name, 'emotion_percentage': value}
+        for entry_id, probability in zip(ids, vectors) for name, value in probability.items()])
+    db.session.commit()
+    return ids
+
+
+def measure(fn, repeat=20, warmup=2):
+    """Runs fn repeatedly; returns latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+        'max_ms': samples[-1],
+        'ops_per_s': 1000 / statistics.fmean(samples) if any(samples) else 0.0,
+    }
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    k = (len(sorted_samples) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (k - lower)
@@ -0,0 +1,200 @@
+"""Benchmark suite with a stored baseline and a regression gate.
+
+    python -m benchmarks.suite [--sizes 10,1000,10000] [--repeat 30] [--threshold 0.25] [--min-delta-ms 1]
+                               [--baseline benchmarks/baseline.json] [--update-baseline] [--output FILE]
+
+Cases: model inference (one text, a batch of 64), /predict_details, and
+/diary-reports (first 100-entry page, full history) plus /emotion-reports
+for users with each of ``--sizes`` entries. The LLM is the in-process stub
+with no latency and every cache is off, so the numbers are the app's own.
+
+Each case reports p50/p95/p99 latency and sequential throughput. A case
+regresses when its p50 is more than ``--threshold`` (a fraction,
+BENCH_REGRESSION_THRESHOLD in the environment) above the baseline, or its
+p95 more than twice that; changes under ``--min-delta-ms`` are timer and
+scheduler noise and never count. On a regression the run exits with
+status 1.
+
+Baselines are machine specific, so the gate only compares against one
+recorded on a like machine: same OS, CPU architecture, CPU count and Python
+major.minor (the ``machine`` block of the file; kernel builds and Python
+patch releases do not count). A missing baseline or one from a different
+kind of machine exits with status 2 instead of passing. The committed
+benchmarks/baseline.json was recorded on a 1-CPU x86_64 Linux box with
+Python 3.11; elsewhere record one with ``--baseline <file> --update-baseline``
+first, and refresh it after hardware changes or intended slowdowns.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import warnings
+from datetime import date
+
+from flask_jwt_extended import create_access_token
+from sklearn.exceptions import InconsistentVersionWarning
+
+from app import db
+from app.persistence import rebuild_daily_rollups
+from app.prediction import get_model, predict_batch, predict_emotion_details
+from benchmarks.common import make_app, create_user, seed_entries, measure
+from tools.llm_stub_server import StubChatCompletionsServer
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'ops_per_s')
+# Gated metric -> multiple of the threshold it may move; tails are noisier than medians
+GATED = {'p50_ms': 1, 'p95_ms': 2}
+
+TEXTS = ['I am so happy today', 'I am terrified of tomorrow', 'That made me furious',
+         'Nothing much happened, just a regular day', 'I feel ashamed of what I said',
+         'What a surprise to see everyone there', 'This smells disgusting', 'I miss them so much']
+
+
+def _auth_headers(user):
+    token = create_access_token(identity={'email': user.email}, additional_claims={'uid': user.id})
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _case(stats):
+    return {metric: round(stats[metric], 3) for metric in METRICS}
+
+
+def run_suite(sizes=(10, 1000, 10000), repeat=30, database_uri='sqlite:///:memory:', log=print):
+    """Runs every case and returns {case name: {p50_ms, p95_ms, p99_ms, ops_per_s}}."""
+    results = {}
+    stub = StubChatCompletionsServer(latency=0.0).start()
+    try:
+        app = make_app(database_uri, OPENAI_BASE_URL=stub.url, PREDICTION_CACHE='none', LLM_CACHE_ENABLED=False,
+                       IDENTITY_CACHE_TTL=300, PERSISTENCE_GROUP_COMMIT=False, PREDICTION_BATCHING=False)
+        client = app.test_client()
+
+        def record(name, fn, times=repeat):
+            gc.collect()  # don't bill this case for the previous one's garbage
+            stats = measure(fn, repeat=times, warmup=3 if times == repeat else 1)
+            results[name] = _case(stats)
+            log(f"{name:<32}" + ''.join(f'{results[name][metric]:>12.2f}' for metric in METRICS))
+
+        log(f"{'case':<32}" + ''.join(f'{metric:>12}' for metric in METRICS))
+        with app.app_context():
+            get_model()
+            batch = (TEXTS * 8)[:64]
+            record('inference.single', lambda: predict_emotion_details(TEXTS[0]))
+            record('inference.batch64', lambda: predict_batch(batch))
+
+            writer = create_user('writer@example.com')
+            headers = _auth_headers(writer)
+        payload = {'text': TEXTS[1], 'selected_dairy_date': '2024-09-15'}
+        record('predict_details', lambda: client.post('/predict_details', headers=headers, json=payload))
+
+        for size in sizes:
+            with app.app_context():
+                user = create_user(f'user{size}@example.com')
+                seed_entries(user.id, size, days=min(size, 365))
+                rebuild_daily_rollups(user.id)
+                db.session.commit()
+                headers = _auth_headers(user)
+            report_range = {'start_date': '2024-01-01', 'end_date': date(2024, 12, 31).isoformat()}
+            # Whole-history reads grow with the size, so they get fewer rounds
+            full_repeat = max(3, repeat // max(1, size // 1000))
+
+            record(f'diary_reports.page100@{size}',
+                   lambda: client.get('/diary-reports?limit=100', headers=headers))
+            record(f'diary_reports.full@{size}', lambda: client.get('/diary-reports', headers=headers), full_repeat)
+            record(f'emotion_reports@{size}',
+                   lambda: client.post('/emotion-reports', headers=headers, json=report_range), full_repeat)
+    finally:
+        stub.stop()
+    return results
+
+
+def compare(results, baseline, threshold, min_delta_ms=1.0):
+    """Lists (case, metric, baseline, current, change) for every gated metric over its threshold."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, factor in GATED.items():
+            if not previous.get(metric) or current[metric] - previous[metric] < min_delta_ms:
+                continue
+            if current[metric] > previous[metric] * (1 + threshold * factor):
+                regressions.append((name, metric, previous[metric], current[metric],
+                                    current[metric] / previous[metric] - 1))
+    return regressions
+
+
+def machine_info():
+    """What a baseline must share with this machine to be comparable."""
+    return {'system': platform.system(), 'arch': platform.machine(), 'cpus': os.cpu_count(),
+            'python': '.'.join(platform.python_version_tuple()[:2])}
+
+
+def load_baseline(path):
+    """The baseline file's {'machine': ..., 'cases': ...}, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump({'machine': machine_info(), 'cases': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def gate(results, baseline_path, threshold, min_delta_ms=1.0, log=print):
+    """Exit status of the regression gate: 0 clean, 1 regressions, 2 no baseline for this machine."""
+    baseline = load_baseline(baseline_path)
+    if baseline is None:
+        log(f'No baseline at {baseline_path}; run with --update-baseline on this machine to create one')
+        return 2
+    machine = machine_info()
+    mismatched = {key: (baseline.get('machine', {}).get(key), value) for key, value in machine.items()
+                  if baseline.get('machine', {}).get(key) != value}
+    if mismatched:
+        for key, (recorded, current) in mismatched.items():
+            log(f'Baseline machine differs: {key} {recorded!r} != {current!r}')
+        log(f'{baseline_path} was recorded elsewhere; record one here with --baseline <file> --update-baseline')
+        return 2
+
+    regressions = compare(results, baseline['cases'], threshold, min_delta_ms)
+    for name, metric, previous, current, change in regressions:
+        log(f'REGRESSION {name} {metric}: {previous:.2f} -> {current:.2f} ms (+{change:.0%})')
+    if regressions:
+        return 1
+    log(f'No regressions above {threshold:.0%} against {baseline_path}')
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,10000', help='seeded entries per user, comma separated')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.getenv('BENCH_REGRESSION_THRESHOLD', '0.25')),
+                        help='allowed slowdown as a fraction of the baseline (0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore changes smaller than this many milliseconds')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--output', default=None, help='also write the results to this JSON file')
+    parser.add_argument('--db', default='sqlite:///:memory:')
+    args = parser.parse_args(argv)
+    warnings.simplefilter('ignore', InconsistentVersionWarning)  # the bundled pickle predates this sklearn
+
+    results = run_suite(sizes=[int(size) for size in args.sizes.split(',')], repeat=args.repeat,
+                        database_uri=args.db)
+    if args.output:
+        save_results(args.output, results)
+    if args.update_baseline:
+        save_results(args.baseline, results)
+        print(f'Baseline written to {args.baseline}')
+        return 0
+    return gate(results, args.baseline, args.threshold, args.min_delta_ms)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,9 +10,105 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', '112233344')
 
+    # werkzeug hash method with its cost parameters, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+    # Stored hashes made with other parameters are replaced on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Processes hashing/verifying passwords off the request threads; 0 hashes inline. The pool is per app
+    # process, so N gunicorn workers run N x PASSWORD_HASH_WORKERS hashing processes: keep the product near
+    # the core count. Timeouts and a dead pool are answered with 503.
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '30'))
+
+    # Per-request stage timing (db, inference, llm, serialization) exported on /metrics in Prometheus format.
+    # /metrics shows every endpoint's traffic and latency: set METRICS_TOKEN and scrape with
+    # "Authorization: Bearer <token>", or keep the route unreachable from outside (it is open without a token).
+    # METRICS_SERVER_TIMING also sends the breakdown to clients in a Server-Timing header.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'false').lower() == 'true'
+
+    # SQL profiler: logs each request's query count and SQL time with its slowest statements (app.query_profiler
+    # logger, INFO), and warns about statements over SQL_PROFILER_SLOW_MS or repeated SQL_PROFILER_REPEAT_WARNING
+    # times in one request.
+    SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+    SQL_PROFILER_SLOW_MS = float(os.getenv('SQL_PROFILER_SLOW_MS', '100'))
+    SQL_PROFILER_LOG_SLOWEST = int(os.getenv('SQL_PROFILER_LOG_SLOWEST', '3'))
+    SQL_PROFILER_REPEAT_WARNING = int(os.getenv('SQL_PROFILER_REPEAT_WARNING', '10'))
+
+    # Seconds a token's user (id, email) stays cached per process; 0 looks it up on every request. Users changed or
+    # deleted through the ORM are dropped from that process's cache at once, but other processes (each gunicorn
+    # worker has its own cache) and changes made outside the app keep authorizing the old identity for up to this long.
+    IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '60'))
+    IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv('IDENTITY_CACHE_MAX_ENTRIES', '10000'))
+
+    # joblib pipeline or compact artifact directory; loaded on first use or by app.warm_up()
+    EMOTION_MODEL_PATH = os.getenv('EMOTION_MODEL_PATH', './models/emotion_classifier_pipe_lr.pkl')
+
+    # Cross-request micro-batching of model inference (opt-in)
+    PREDICTION_BATCHING = os.getenv('PREDICTION_BATCHING', 'false').lower() == 'true'
+    PREDICTION_BATCH_WINDOW_MS = float(os.getenv('PREDICTION_BATCH_WINDOW_MS', '5'))
+    PREDICTION_BATCH_MAX_SIZE = int(os.getenv('PREDICTION_BATCH_MAX_SIZE', '64'))
+
+    # Prediction cache: 'memory' (per process), 'sqlite' (shared by all workers on the host) or 'none'.
+    # PREDICTION_CACHE_TTL=0 means plain LRU eviction, otherwise entries also expire after that many seconds.
+    PREDICTION_CACHE = os.getenv('PREDICTION_CACHE', 'memory')
+    PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', '10000'))
+    PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '0'))
+    PREDICTION_CACHE_PATH = os.getenv('PREDICTION_CACHE_PATH', 'prediction_cache.sqlite3')
+
+    # Group commit: diary writes from concurrent requests share one transaction, committed every
+    # GROUP_COMMIT_WINDOW_MS (or at GROUP_COMMIT_MAX_BATCH writes); requests still wait for the commit.
+    PERSISTENCE_GROUP_COMMIT = os.getenv('PERSISTENCE_GROUP_COMMIT', 'false').lower() == 'true'
+    GROUP_COMMIT_WINDOW_MS = float(os.getenv('GROUP_COMMIT_WINDOW_MS', '2'))
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv('GROUP_COMMIT_MAX_BATCH', '64'))
+
+    # Upper bound on items accepted by /predict_details/batch
+    DIARY_BATCH_MAX_ITEMS = int(os.getenv('DIARY_BATCH_MAX_ITEMS', '500'))
+
+    # Largest page size accepted by /diary-reports?limit=
+    DIARY_REPORTS_MAX_LIMIT = int(os.getenv('DIARY_REPORTS_MAX_LIMIT', '1000'))
+    # Rows fetched per round trip when /diary-reports streams NDJSON
+    DIARY_REPORTS_STREAM_CHUNK = int(os.getenv('DIARY_REPORTS_STREAM_CHUNK', '500'))
+
+    # Per-entry emotion percentages: 'rows' (eight emotion_reports rows), 'dual' (rows plus the packed
+    # diary_entries.emotion_vector, read when present) or 'vector' (vector only). Switch rows -> dual,
+    # run `flask emotions pack`, then vector; only then may `flask emotions pack --drop-rows` delete the rows.
+    EMOTION_STORAGE = os.getenv('EMOTION_STORAGE', 'rows')
+
+    # Where /emotion-reports reads from: 'rollups' (daily_emotion_rollups) or 'entries' (raw emotion_reports)
+    EMOTION_REPORTS_SOURCE = os.getenv('EMOTION_REPORTS_SOURCE', 'rollups')
+
+    # OpenAI chat completions. OPENAI_BASE_URL points the client elsewhere (e.g. tools/llm_stub_server.py).
+    OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')
+    LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '60'))
+    LLM_MAX_WORKERS = int(os.getenv('LLM_MAX_WORKERS', '16'))
+    LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o')
+    # Most tokens the emotion data in a description prompt may take; longer ranges go weekly, then monthly.
+    # 0 always sends daily points.
+    LLM_PROMPT_TOKEN_BUDGET = int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', '3000'))
+
+    # Persistent LLM response cache (stored in the recommendations table)
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', str(24 * 3600)))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '10000'))
+
+    # /emotion-reports with "async": true (or EMOTION_REPORTS_ASYNC) answers 202 and runs the LLM stages as a job.
+    # REPORT_JOBS_MODE: 'thread' (pool in each web process) or 'worker' (separate `flask jobs work` processes).
+    EMOTION_REPORTS_ASYNC = os.getenv('EMOTION_REPORTS_ASYNC', 'false').lower() == 'true'
+    REPORT_JOBS_MODE = os.getenv('REPORT_JOBS_MODE', 'thread')
+    REPORT_JOBS_WORKERS = int(os.getenv('REPORT_JOBS_WORKERS', '4'))
+    # Thread mode: jobs left running this long (their process died) are requeued, and queued jobs are picked up,
+    # when a serving process starts (app.warm_up) and every this many seconds after. Keep it above the longest
+    # job (about LLM_TIMEOUT_SECONDS), or a slow job may run twice.
+    REPORT_JOBS_STALE_SECONDS = float(os.getenv('REPORT_JOBS_STALE_SECONDS', '300'))
+
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    OPENAI_API_KEY = 'test-key'
+    PASSWORD_HASH_WORKERS = 0
+    METRICS_ENABLED = True
     WTF_CSRF_ENABLED = False
     SQLALCHEMY_TRACK_MODIFICATIONS = False
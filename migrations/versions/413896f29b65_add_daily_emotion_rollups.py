@@ -0,0 +1,42 @@
+"""Add daily emotion rollups
+
+Revision ID: 413896f29b65
+Revises: fabccf3b6ebb
+Create Date: 2026-10-18 11:02:14.118274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '413896f29b65'
+down_revision = 'fabccf3b6ebb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_emotion_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('emotion_name', sa.String(length=50), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day', 'emotion_name')
+    )
+
+    # Backfill from the existing reports (same as `flask rollups backfill`)
+    op.execute(
+        "INSERT INTO daily_emotion_rollups (user_id, day, emotion_name, sum, count) "
+        "SELECT diary_entries.user_id, date(diary_entries.created_at), emotion_reports.emotion_name, "
+        "sum(emotion_reports.emotion_percentage), count(emotion_reports.id) "
+        "FROM diary_entries JOIN emotion_reports ON emotion_reports.diary_id = diary_entries.id "
+        "WHERE emotion_reports.emotion_percentage IS NOT NULL "
+        "GROUP BY diary_entries.user_id, date(diary_entries.created_at), emotion_reports.emotion_name"
+    )
+
+
+def downgrade():
+    op.drop_table('daily_emotion_rollups')
@@ -0,0 +1,40 @@
+"""Use recommendations as the LLM response cache
+
+Revision ID: ad1904b5fbe3
+Revises: b79e4cc4499a
+Create Date: 2026-10-18 12:04:51.730912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad1904b5fbe3'
+down_revision = 'b79e4cc4499a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.alter_column('diary_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.add_column(sa.Column('cache_key', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('model', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('expires_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_used_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_recommendations_cache_key'), ['cache_key'], unique=True)
+        batch_op.create_index(batch_op.f('ix_recommendations_last_used_at'), ['last_used_at'], unique=False)
+
+
+def downgrade():
+    # Cache rows have no diary; drop them before diary_id becomes NOT NULL again
+    op.execute('DELETE FROM recommendations WHERE cache_key IS NOT NULL')
+    with op.batch_alter_table('recommendations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recommendations_last_used_at'))
+        batch_op.drop_index(batch_op.f('ix_recommendations_cache_key'))
+        batch_op.drop_column('last_used_at')
+        batch_op.drop_column('expires_at')
+        batch_op.drop_column('model')
+        batch_op.drop_column('cache_key')
+        batch_op.alter_column('diary_id', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,36 @@
+"""Add indexes for hot lookups
+
+Revision ID: b79e4cc4499a
+Revises: 413896f29b65
+Create Date: 2026-10-18 11:31:47.204581
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b79e4cc4499a'
+down_revision = '413896f29b65'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /diary-reports pages and the /emotion-reports range filter: user_id = ? AND created_at range, ordered by id
+    op.create_index('ix_diary_entries_user_id_created_at_id', 'diary_entries',
+                    ['user_id', 'created_at', 'id'], unique=False)
+    # diary_id lookups read only these columns (plus the primary key), so the index covers them
+    op.create_index('ix_emotion_reports_diary_id_emotion', 'emotion_reports',
+                    ['diary_id', 'emotion_name', 'emotion_percentage'], unique=False)
+    # users.email already has the unique index behind the JWT identity lookup;
+    # daily_emotion_rollups is served by its (user_id, day, emotion_name) primary key.
+
+
+def downgrade():
+    if op.get_bind().dialect.name in ('mysql', 'mariadb'):
+        # InnoDB dropped its implicit foreign key indexes once these existed; restore them first
+        op.create_index('user_id', 'diary_entries', ['user_id'], unique=False)
+        op.create_index('diary_id', 'emotion_reports', ['diary_id'], unique=False)
+    op.drop_index('ix_emotion_reports_diary_id_emotion', table_name='emotion_reports')
+    op.drop_index('ix_diary_entries_user_id_created_at_id', table_name='diary_entries')
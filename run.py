@@ -1,7 +1,7 @@
-from app import create_app
+from app import create_app, warm_up
 
 app = create_app()
 
-print(app)
 if __name__ == '__main__':
+    warm_up(app)
     app.run(debug=True)
@@ -28,3 +28,49 @@ def client():
         # Teardown: Clean up the database after each test
         with app.app_context():
             db.drop_all()
+
+
+@pytest.fixture
+def auth_headers(client):
+    """Authorization headers for the fixture user (testuser@example.com)."""
+    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
+    return {'Authorization': f"Bearer {login_response.get_json()['data']['access_token']}"}
+
+
+@pytest.fixture
+def seeded_entries(client, auth_headers):
+    """Two diary entries of the fixture user: a happy one on 2024-09-15 and a fearful one on 2024-09-16."""
+    response = client.post('/predict_details/batch', headers=auth_headers, json={'items': [
+        {'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'},
+        {'text': 'I am terrified of tomorrow', 'selected_dairy_date': '2024-09-16'}]})
+    assert response.status_code == 200
+    return response.get_json()['data']
+
+
+@pytest.fixture
+def query_budget(client):
+    """query_budget(n): a context manager failing the test when its block runs more than n SQL statements."""
+    from app.query_profiler import QueryBudget
+
+    with client.application.app_context():
+        engine = db.engine
+    return lambda max_queries: QueryBudget(max_queries, engine)
+
+
+@pytest.fixture
+def llm_stub(client):
+    """Points the app's OpenAI client at a local stand-in server (no network access needed)."""
+    from app import llm
+    from tools.llm_stub_server import StubChatCompletionsServer
+
+    server = StubChatCompletionsServer(latency=0.0).start()
+    app = client.application
+    app.config['OPENAI_BASE_URL'] = server.url
+    llm.init_app(app)
+    llm.get_llm_client()  # pay for the openai import up front, not inside timed requests
+
+    yield server
+
+    server.stop()
+    app.config['OPENAI_BASE_URL'] = None
+    llm.init_app(app)
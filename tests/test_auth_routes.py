@@ -88,3 +88,158 @@ def test_protected_route_without_token(client):
     data = response.get_json()
     assert data['message'] == 'Unauthorized'
 
+
+
+def test_login_token_carries_user_id_and_skips_user_lookup(client, query_budget):
+    from flask_jwt_extended import decode_token
+
+    token = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'}
+                        ).get_json()['data']['access_token']
+    with client.application.app_context():
+        claims = decode_token(token)
+    assert claims['sub'] == {'email': 'testuser@example.com'}
+    assert isinstance(claims['uid'], int)
+
+    headers = {'Authorization': f'Bearer {token}'}
+    client.get('/diary-reports', headers=headers)
+    with query_budget(3) as budget:
+        response = client.get('/diary-reports', headers=headers)
+
+    assert response.status_code == 200
+    assert not any('FROM users' in statement for statement in budget.statements)
+
+
+def test_email_only_tokens_stay_valid(client):
+    from flask_jwt_extended import create_access_token
+
+    with client.application.app_context():
+        legacy_token = create_access_token(identity={'email': 'testuser@example.com'})
+    headers = {'Authorization': f'Bearer {legacy_token}'}
+
+    response = client.post('/predict_details', headers=headers,
+                           json={'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'})
+    assert response.status_code == 200
+    assert len(client.get('/diary-reports', headers=headers).get_json()['data']) == 1
+
+
+def test_deleted_user_is_rejected_right_away(client):
+    from app import db
+    from app.models import User
+
+    token = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'}
+                        ).get_json()['data']['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    assert client.get('/diary-reports', headers=headers).status_code == 200
+
+    with client.application.app_context():
+        user = User.query.filter_by(email='testuser@example.com').first()
+        db.session.delete(user)
+        db.session.commit()
+
+    response = client.get('/diary-reports', headers=headers)
+    assert response.status_code == 404
+    assert response.get_json()['message'] == 'User not found'
+
+
+def test_email_change_drops_cached_identity(client):
+    from flask_jwt_extended import create_access_token
+
+    from app import db
+    from app.models import User
+
+    with client.application.app_context():
+        legacy_token = create_access_token(identity={'email': 'testuser@example.com'})
+    headers = {'Authorization': f'Bearer {legacy_token}'}
+    assert client.get('/diary-reports', headers=headers).status_code == 200
+
+    with client.application.app_context():
+        User.query.filter_by(email='testuser@example.com').first().email = 'renamed@example.com'
+        db.session.commit()
+
+    # The old email no longer names a user
+    assert client.get('/diary-reports', headers=headers).status_code == 404
+
+
+def _login_ok(client, email='testuser@example.com', password='testpass'):
+    return client.post('/login', json={'email': email, 'password': password}).status_code == 200
+
+
+def test_login_rehashes_when_the_hash_method_changes(client):
+    from app import passwords
+    from app.models import User
+
+    app = client.application
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    passwords.init_app(app)
+
+    assert _login_ok(client)
+    with app.app_context():
+        stored = User.query.filter_by(email='testuser@example.com').first().password
+    assert stored.startswith('pbkdf2:sha256:1000$')
+
+    assert _login_ok(client)
+    assert not _login_ok(client, password='wrongpassword')
+    with app.app_context():
+        assert User.query.filter_by(email='testuser@example.com').first().password == stored
+
+
+def test_canonical_method_matches_werkzeug_without_hashing():
+    from app.passwords import canonical_method
+
+    for method in ('scrypt', 'scrypt:16384:8:1', 'pbkdf2', 'pbkdf2:sha512', 'pbkdf2:sha256:1000'):
+        assert canonical_method(method) == generate_password_hash('x', method).split('$', 1)[0]
+    with pytest.raises(ValueError):
+        canonical_method('md5')
+
+
+def test_password_hashing_in_process_pool(client):
+    from app import passwords
+
+    app = client.application
+    app.config.update(PASSWORD_HASH_WORKERS=2, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000')
+    passwords.init_app(app)
+    try:
+        response = client.post('/register', json={'username': 'pooled', 'email': 'pooled@example.com',
+                                                  'password': 'pw'})
+        assert response.status_code == 201
+        assert _login_ok(client, 'pooled@example.com', 'pw')
+        assert not _login_ok(client, 'pooled@example.com', 'nope')
+        assert passwords._pool is not None
+
+        # warm_up() starts every worker before traffic arrives
+        app.config.update(PASSWORD_HASH_WORKERS=3)
+        passwords.init_app(app)
+        passwords.warm_up()
+        assert len(passwords._pool._processes) == 3
+    finally:
+        app.config.update(PASSWORD_HASH_WORKERS=0)
+        passwords.init_app(app)
+
+
+def test_password_pool_failures_return_503(client, monkeypatch):
+    from concurrent.futures.process import BrokenProcessPool
+
+    from app import passwords
+
+    app = client.application
+    app.config.update(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_TIMEOUT=1e-6)
+    passwords.init_app(app)
+    try:
+        assert client.post('/login', json={'email': 'testuser@example.com',
+                                           'password': 'testpass'}).status_code == 503
+
+        class BrokenPool:
+            def submit(self, *args):
+                raise BrokenProcessPool('worker died')
+
+            def shutdown(self, **kwargs):
+                pass
+
+        broken = BrokenPool()
+        monkeypatch.setattr(passwords, '_pool', broken)
+        response = client.post('/register', json={'username': 'new', 'email': 'new@example.com', 'password': 'pw'})
+        assert response.status_code == 503
+        assert passwords._pool is not broken
+    finally:
+        app.config.update(PASSWORD_HASH_WORKERS=0, PASSWORD_HASH_TIMEOUT=30.0)
+        passwords.init_app(app)
@@ -56,3 +56,195 @@ def test_get_all_diary_entries(client):
     assert 'data' in data
     assert isinstance(data['data'], list)  # Ensure the response contains a list of entries
     assert len(data['data']) >= 2
+
+
+# Bulk ingestion of offline diaries
+def test_predict_details_batch(client):
+    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
+    token = login_response.get_json()['data']['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post('/predict_details/batch', headers=headers, json={'items': [
+        {'text': 'Today was a productive day!', 'selected_dairy_date': '2024-09-15'},
+        {'text': '', 'selected_dairy_date': '2024-09-16'},
+        {'text': 'I felt very anxious today.', 'selected_dairy_date': '16-09-2024'},
+        {'text': 'I felt very anxious today.', 'selected_dairy_date': '2024-09-17'},
+    ]})
+
+    assert response.status_code == 200
+    results = response.get_json()['data']
+    assert [result['status'] for result in results] == [200, 400, 400, 200]
+    assert results[1]['message'] == 'Text input is required'
+    assert results[2]['message'] == 'Invalid date format. Use YYYY-MM-DD.'
+    assert len(results[0]['data']['probability']) == 8
+
+    reports = client.get('/diary-reports', headers=headers).get_json()['data']
+    assert [report['id'] for report in reports] == [results[0]['data']['id'], results[3]['data']['id']]
+    assert all(len(report['emotion_reports']) == 8 for report in reports)
+
+
+def test_predict_details_batch_requires_items(client):
+    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
+    token = login_response.get_json()['data']['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.post('/predict_details/batch', headers=headers, json={'items': []})
+
+    assert response.status_code == 400
+
+
+def _seed_entries(client, headers, count):
+    items = [{'text': f'Entry number {i} made me feel happy', 'selected_dairy_date': f'2024-09-{(i % 28) + 1:02d}'}
+             for i in range(count)]
+    response = client.post('/predict_details/batch', headers=headers, json={'items': items})
+    assert response.status_code == 200
+
+
+def test_diary_reports_keyset_pagination(client, auth_headers):
+    _seed_entries(client, auth_headers, 7)
+
+    pages = []
+    cursor = None
+    while True:
+        query = {'limit': 3}
+        if cursor:
+            query['cursor'] = cursor
+        body = client.get('/diary-reports', headers=auth_headers, query_string=query).get_json()
+        pages.append(body['data'])
+        cursor = body['meta']['next_cursor']
+        if not cursor:
+            break
+
+    everything = client.get('/diary-reports', headers=auth_headers).get_json()['data']
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [entry['id'] for page in pages for entry in page] == [entry['id'] for entry in everything]
+    assert [entry['created_at'] for entry in everything] == sorted(entry['created_at'] for entry in everything)
+
+
+def test_diary_reports_rejects_bad_cursor(client, auth_headers):
+    response = client.get('/diary-reports', headers=auth_headers, query_string={'cursor': 'not-a-cursor'})
+
+    assert response.status_code == 400
+
+
+def test_diary_reports_rejects_bad_limit(client, auth_headers):
+    for limit in ['abc', '2.5', '', '0', '-3', '1001']:
+        response = client.get('/diary-reports', headers=auth_headers, query_string={'limit': limit})
+        assert response.status_code == 400, limit
+        assert response.get_json()['message'] == 'limit must be between 1 and 1000'
+
+
+def test_diary_reports_query_count_is_constant(client, auth_headers, query_budget):
+    _seed_entries(client, auth_headers, 25)
+
+    # user lookup + entries + one IN query for all emotion reports
+    with query_budget(3):
+        response = client.get('/diary-reports', headers=auth_headers)
+
+    assert response.status_code == 200
+    assert len(response.get_json()['data']) == 25
+
+
+def test_diary_reports_ndjson_stream(client, auth_headers):
+    import json
+
+    _seed_entries(client, auth_headers, 5)
+    expected = client.get('/diary-reports', headers=auth_headers).get_json()['data']
+
+    response = client.get('/diary-reports', headers=auth_headers, query_string={'stream': 1})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == expected
+
+    response = client.get('/diary-reports', headers={**auth_headers, 'Accept': 'application/x-ndjson'})
+    assert response.mimetype == 'application/x-ndjson'
+    assert len(response.get_data(as_text=True).splitlines()) == 5
+
+
+def test_predict_details_writes_in_one_transaction(client, auth_headers):
+    from sqlalchemy import event
+    from app import db
+    from app.models import EmotionReport
+
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    with client.application.app_context():
+        engine = db.engine
+    event.listen(engine, 'commit', on_commit)
+    try:
+        response = client.post('/predict_details', headers=auth_headers,
+                               json={'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'})
+    finally:
+        event.remove(engine, 'commit', on_commit)
+
+    assert response.status_code == 200
+    assert len(commits) == 1
+    with client.application.app_context():
+        assert EmotionReport.query.filter_by(diary_id=response.get_json()['data']['id']).count() == 8
+
+
+def test_group_commit_coalesces_concurrent_writes(tmp_path):
+    from datetime import datetime
+
+    import pytest
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    from app import create_app, db
+    from app.models import DiaryEntry, User
+    from app.query_profiler import QueryBudget
+
+    app = create_app('TestingConfig', overrides={'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'gc.db'}",
+                                                 'PERSISTENCE_GROUP_COMMIT': True, 'GROUP_COMMIT_WINDOW_MS': 100})
+    writer = app.extensions['group_commit']
+    with app.app_context():
+        db.create_all()
+        user = User(username='gc', email='gc@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        engine = db.engine
+
+    def prediction(i):
+        return [{'text': f'entry {i}', 'diary_date': datetime(2024, 9, 15), 'main_emotion': 'joy',
+                 'probability': {'joy': 0.75, 'sadness': 0.25}}]
+
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine, 'commit', on_commit)
+    futures = [writer.submit(user_id, prediction(i)) for i in range(10)]
+    bad = writer.submit(user_id, [{'text': 'broken', 'diary_date': datetime(2024, 9, 15), 'main_emotion': 'joy',
+                                   'probability': {}}])
+    ids = [future.result(timeout=5) for future in futures]
+    with pytest.raises(KeyError):
+        bad.result(timeout=5)
+    event.remove(engine, 'commit', on_commit)
+
+    # One shared transaction failed on the bad write, then each write was retried on its own
+    assert len({entry_id for entry_ids in ids for entry_id in entry_ids}) == 10
+    with app.app_context():
+        assert DiaryEntry.query.count() == 10
+
+    # Without a bad write the whole window commits once, and the ids come back without reloading the rows
+    commits.clear()
+    event.listen(engine, 'commit', on_commit)
+    with QueryBudget(30, engine) as budget:
+        for future in [writer.submit(user_id, prediction(i)) for i in range(10)]:
+            future.result(timeout=5)
+    event.remove(engine, 'commit', on_commit)
+    assert len(commits) == 1
+    assert not [statement for statement in budget.statements if statement.startswith('SELECT')]
+
+    with app.test_client() as client:
+        with app.app_context():
+            headers = {'Authorization': f"Bearer {create_access_token(identity={'email': 'gc@example.com'})}"}
+        response = client.post('/predict_details', headers=headers,
+                               json={'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'})
+        assert response.status_code == 200
+        with app.app_context():
+            assert db.session.get(DiaryEntry, response.get_json()['data']['id']) is not None
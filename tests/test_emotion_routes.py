@@ -66,3 +66,66 @@ def test_predict_emotion_missing_jwt(client):
     assert data['message'] == 'Unauthorized'
 
 
+
+
+# Aggregation happens in SQL: averages and per-day series match the stored reports
+def test_emotion_reports_aggregation(client, llm_stub):
+    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
+    headers = {'Authorization': f"Bearer {login_response.get_json()['data']['access_token']}"}
+
+    texts = ['I am so happy today', 'I am terrified of tomorrow', 'That made me furious']
+    dates = ['2024-09-15', '2024-09-14', '2024-09-20']
+    predictions = client.post('/predict_details/batch', headers=headers, json={'items': [
+        {'text': text, 'selected_dairy_date': day} for text, day in zip(texts, dates)]}).get_json()['data']
+    probabilities = [item['data']['probability'] for item in predictions]
+
+    response = client.post('/emotion-reports', headers=headers,
+                           json={'start_date': '2024-09-14', 'end_date': '2024-09-15'})
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert set(data['overall_report']) == set(probabilities[0])
+    for emotion, average in data['overall_report'].items():
+        assert abs(average - (probabilities[0][emotion] + probabilities[1][emotion]) / 2) < 1e-9
+    assert [point['date'] for point in data['detailed_reports']['joy']] == ['2024-09-14', '2024-09-15']
+    assert data['overall_report_desc'].startswith('Over this period')
+
+
+# Daily rollups are maintained on write, match a full backfill and drive /emotion-reports
+def test_emotion_reports_from_daily_rollups(client, llm_stub):
+    from app import db
+    from app.models import DailyEmotionRollup
+
+    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
+    headers = {'Authorization': f"Bearer {login_response.get_json()['data']['access_token']}"}
+
+    single = client.post('/predict_details', headers=headers,
+                         json={'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'}).get_json()['data']
+    batch = client.post('/predict_details/batch', headers=headers, json={'items': [
+        {'text': 'I am terrified of tomorrow', 'selected_dairy_date': '2024-09-15'},
+        {'text': 'That made me furious', 'selected_dairy_date': '2024-09-16'}]}).get_json()['data']
+    probabilities = [single['probability']] + [item['data']['probability'] for item in batch]
+
+    def snapshot():
+        with client.application.app_context():
+            return sorted((r.user_id, r.day.isoformat(), r.emotion_name, round(r.sum, 12), r.count)
+                          for r in DailyEmotionRollup.query.all())
+
+    incremental = snapshot()
+    assert len(incremental) == 16
+    result = client.application.test_cli_runner().invoke(args=['rollups', 'backfill'])
+    assert result.exit_code == 0
+    assert snapshot() == incremental
+
+    data = client.post('/emotion-reports', headers=headers,
+                       json={'start_date': '2024-09-15', 'end_date': '2024-09-16'}).get_json()
+    joy = data['detailed_reports']['joy']
+    assert [point['date'] for point in joy] == ['2024-09-15', '2024-09-16']
+    assert abs(joy[0]['value'] - (probabilities[0]['joy'] + probabilities[1]['joy']) / 2) < 1e-9
+    assert abs(data['overall_report']['joy'] - sum(p['joy'] for p in probabilities) / 3) < 1e-9
+
+    client.application.config['EMOTION_REPORTS_SOURCE'] = 'entries'
+    raw = client.post('/emotion-reports', headers=headers,
+                      json={'start_date': '2024-09-15', 'end_date': '2024-09-16'}).get_json()
+    assert len(raw['detailed_reports']['joy']) == 3
+    assert abs(raw['overall_report']['joy'] - data['overall_report']['joy']) < 1e-9
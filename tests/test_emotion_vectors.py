@@ -0,0 +1,93 @@
+import pytest
+
+from app import db
+from app.emotion_vectors import VECTOR_LABELS, pack_emotions, unpack_emotions
+from app.models import DiaryEntry, EmotionReport
+
+ITEMS = [{'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'},
+         {'text': 'I am terrified of tomorrow', 'selected_dairy_date': '2024-09-16'},
+         {'text': 'That made me furious', 'selected_dairy_date': '2024-09-16'}]
+
+
+def _write_and_read(client, headers, mode):
+    client.application.config['EMOTION_STORAGE'] = mode
+    client.post('/predict_details', headers=headers, json=ITEMS[0])
+    client.post('/predict_details/batch', headers=headers, json={'items': ITEMS[1:]})
+    return client.get('/diary-reports', headers=headers).get_json()['data']
+
+
+def _assert_same_reports(actual, expected):
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert [r['emotion_name'] for r in got['emotion_reports']] == \
+            [r['emotion_name'] for r in want['emotion_reports']]
+        for r_got, r_want in zip(got['emotion_reports'], want['emotion_reports']):
+            assert r_got['emotion_percentage'] == pytest.approx(r_want['emotion_percentage'], abs=1e-6)
+
+
+def test_pack_round_trip():
+    probability = {label: i / 10 for i, label in enumerate(VECTOR_LABELS)}
+    blob = pack_emotions(probability)
+    assert len(blob) == 4 * len(VECTOR_LABELS)
+    assert unpack_emotions(blob) == pytest.approx(probability)
+
+    # Missing emotions and shorter (older) vectors unpack to fewer keys
+    assert list(unpack_emotions(pack_emotions({'joy': 0.5}))) == ['joy']
+    assert unpack_emotions(blob[:8]) == pytest.approx({'anger': 0.0, 'disgust': 0.1})
+    assert unpack_emotions(pack_emotions({})) == {}
+
+
+@pytest.mark.parametrize('mode', ['dual', 'vector'])
+def test_vector_storage_keeps_the_api_shape(client, auth_headers, mode):
+    expected = _write_and_read(client, auth_headers, 'rows')
+    with client.application.app_context():
+        EmotionReport.query.delete()
+        DiaryEntry.query.delete()
+        db.session.commit()
+
+    actual = _write_and_read(client, auth_headers, mode)
+    _assert_same_reports(actual, expected)
+
+    with client.application.app_context():
+        assert DiaryEntry.query.filter(DiaryEntry.emotion_vector.is_(None)).count() == 0
+        assert EmotionReport.query.count() == (0 if mode == 'vector' else 3 * len(VECTOR_LABELS))
+
+
+def test_vector_mode_reads_diary_reports_in_one_query(client, auth_headers, query_budget):
+    _write_and_read(client, auth_headers, 'vector')
+    # Only the entries (the user comes from the cached token identity), no emotion_reports query
+    with query_budget(1) as budget:
+        client.get('/diary-reports', headers=auth_headers)
+    assert len(budget.statements) == 1
+    assert not any('emotion_reports' in statement for statement in budget.statements)
+
+
+def test_pack_commands_and_vector_aggregation(client, auth_headers, llm_stub):
+    expected = _write_and_read(client, auth_headers, 'rows')
+    payload = {'start_date': '2024-09-01', 'end_date': '2024-09-30'}
+    client.application.config['EMOTION_REPORTS_SOURCE'] = 'entries'
+    from_rows = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()
+
+    runner = client.application.test_cli_runner()
+    # Dropping the rows is refused while the read paths still use them
+    refused = runner.invoke(args=['emotions', 'pack', '--drop-rows'])
+    assert refused.exit_code != 0 and "needs EMOTION_STORAGE=vector, not 'rows'" in refused.output
+    assert 'Packed 3 entries' in runner.invoke(args=['emotions', 'pack']).output
+    client.application.config['EMOTION_STORAGE'] = 'vector'
+    assert 'Deleted 24 emotion_reports rows' in runner.invoke(args=['emotions', 'pack', '--drop-rows']).output
+    _assert_same_reports(client.get('/diary-reports', headers=auth_headers).get_json()['data'], expected)
+
+    from_vectors = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()
+    assert from_vectors['detailed_reports'].keys() == from_rows['detailed_reports'].keys()
+    assert from_vectors['overall_report'] == pytest.approx(from_rows['overall_report'])
+
+    # Rollups rebuilt from vectors match the ones maintained on write
+    client.application.config['EMOTION_REPORTS_SOURCE'] = 'rollups'
+    before = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()['overall_report']
+    runner.invoke(args=['rollups', 'backfill'])
+    after = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()['overall_report']
+    assert after == pytest.approx(before)
+
+    assert 'Unpacked 3 entries' in runner.invoke(args=['emotions', 'unpack']).output
+    client.application.config['EMOTION_STORAGE'] = 'rows'
+    _assert_same_reports(client.get('/diary-reports', headers=auth_headers).get_json()['data'], expected)
@@ -0,0 +1,177 @@
+import json
+import time
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import llm
+
+
+def test_emotion_reports_llm_calls_run_concurrently(client, auth_headers, seeded_entries, llm_stub):
+    llm_stub.latency = 0.5
+
+    start = time.perf_counter()
+    response = client.post('/emotion-reports', headers=auth_headers,
+                           json={'start_date': '2024-09-01', 'end_date': '2024-09-30'})
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['overall_report_desc'].startswith('Over this period')
+    assert data['suggestions'][0]['topic'] == 'Practice Mindfulness Meditation'
+    assert len(llm_stub.requests) == 3
+    assert llm_stub.max_in_flight == 3
+    # Serially this takes at least 3 x 0.5s
+    assert elapsed < 1.2
+
+
+def test_emotion_reports_llm_timeout(client, auth_headers, seeded_entries, llm_stub):
+    llm_stub.latency = 2.0
+    client.application.config['LLM_TIMEOUT_SECONDS'] = 0.3
+    llm.init_app(client.application)
+
+    start = time.perf_counter()
+    data = client.post('/emotion-reports', headers=auth_headers,
+                       json={'start_date': '2024-09-01', 'end_date': '2024-09-30'}).get_json()
+
+    assert time.perf_counter() - start < 1.5
+    assert data['overall_report_desc'].startswith('Error generating description')
+    assert data['suggestions'].startswith('Error generating suggestions')
+    assert 'joy' in data['overall_report']
+
+
+def test_llm_responses_are_cached(client, auth_headers, seeded_entries, llm_stub):
+    from app.models import Recommendation
+
+    payload = {'start_date': '2024-09-01', 'end_date': '2024-09-30'}
+
+    first = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()
+    second = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()
+
+    assert len(llm_stub.requests) == 3
+    assert second == first
+
+    # New data changes the prompts, so only the affected completions are requested again
+    client.post('/predict_details', headers=auth_headers,
+                json={'text': 'That made me furious', 'selected_dairy_date': '2024-09-20'})
+    client.post('/emotion-reports', headers=auth_headers, json=payload)
+    assert len(llm_stub.requests) > 3
+
+    with client.application.app_context():
+        assert Recommendation.query.filter(Recommendation.cache_key.isnot(None)).count() >= 3
+
+
+def test_llm_cache_expiry_and_size_bound(client):
+    from app.llm_cache import LLMResponseCache
+
+    with client.application.app_context():
+        cache = LLMResponseCache(ttl=3600, max_entries=2)
+        keys = {name: cache.make_key('gpt-4o', [{'role': 'user', 'content': name}]) for name in 'abc'}
+        for name, key in keys.items():
+            cache.set_many({key: name.upper()}, 'gpt-4o')
+
+        assert cache.get_many(keys) == {'b': 'B', 'c': 'C'}
+
+        expired = LLMResponseCache(ttl=-1, max_entries=10)
+        expired.set_many({keys['a']: 'A'}, 'gpt-4o')
+        assert cache.get_many({'a': keys['a']}) == {}
+
+
+def test_llm_cache_write_race(client, monkeypatch):
+    from app import llm_cache
+    from app.models import User, db
+    from app.llm_cache import LLMResponseCache
+
+    with client.application.app_context():
+        cache = LLMResponseCache(ttl=3600, max_entries=10)
+        key = cache.make_key('gpt-4o', [{'role': 'user', 'content': 'race'}])
+
+        # Both requests missed on the key; the later write overwrites the earlier one
+        cache.set_many({key: 'first'}, 'gpt-4o')
+        cache.set_many({key: 'second'}, 'gpt-4o')
+        assert cache.get_many({'race': key}) == {'race': 'second'}
+
+        # Without an upsert the duplicate insert fails inside its SAVEPOINT only
+        monkeypatch.setattr(llm_cache, '_upsert_statement', lambda dialect_name: None)
+        monkeypatch.setattr(llm_cache.Recommendation, 'query',
+                            llm_cache.Recommendation.query.filter(llm_cache.Recommendation.id.is_(None)))
+        db.session.add(User(username='pending', email='pending@example.com', password='x'))
+        with pytest.raises(IntegrityError):
+            cache.set_many({key: 'third'}, 'gpt-4o')
+        db.session.commit()
+        assert User.query.filter_by(username='pending').count() == 1
+        assert cache.get_many({'race': key}) == {'race': 'second'}
+
+
+def test_llm_cache_errors_count_as_misses(client, auth_headers, seeded_entries, llm_stub, monkeypatch):
+    from app.llm_cache import LLMResponseCache
+
+    def broken(*args):
+        raise OperationalError('SELECT', {}, Exception('database is gone'))
+
+    monkeypatch.setattr(LLMResponseCache, 'get_many', broken)
+    monkeypatch.setattr(LLMResponseCache, 'set_many', broken)
+
+    response = client.post('/emotion-reports', headers=auth_headers,
+                           json={'start_date': '2024-09-01', 'end_date': '2024-09-30'})
+    assert response.status_code == 200
+    assert response.get_json()['overall_report_desc'].startswith('Over this period')
+    assert len(llm_stub.requests) == 3
+
+
+def test_llm_errors_are_not_cached(client, auth_headers, seeded_entries, llm_stub):
+    payload = {'start_date': '2024-09-01', 'end_date': '2024-09-30'}
+    client.application.config['OPENAI_BASE_URL'] = 'http://127.0.0.1:9/v1'
+    llm.init_app(client.application)
+
+    failed = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()
+    assert failed['overall_report_desc'].startswith('Error generating description')
+
+    client.application.config['OPENAI_BASE_URL'] = llm_stub.url
+    llm.init_app(client.application)
+    recovered = client.post('/emotion-reports', headers=auth_headers, json=payload).get_json()
+    assert recovered['overall_report_desc'].startswith('Over this period')
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_emotion_reports_stream_as_server_sent_events(client, auth_headers, seeded_entries, llm_stub):
+    from tools.llm_stub_server import DESCRIPTION
+
+    llm_stub.latency = 0.5
+    llm_stub.token_delay = 0.01
+
+    start = time.perf_counter()
+    response = client.post('/emotion-reports', headers={**auth_headers, 'Accept': 'text/event-stream'},
+                           json={'start_date': '2024-09-01', 'end_date': '2024-09-30'}, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    time_to_first_event = time.perf_counter() - start
+    events = _parse_sse((first + b''.join(chunks)).decode())
+
+    assert response.mimetype == 'text/event-stream'
+    assert time_to_first_event < 0.5
+    assert events[0][0] == 'report'
+    assert 'joy' in events[0][1]['overall_report']
+    assert events[-1] == ('done', {})
+
+    deltas = [data for kind, data in events if kind == 'delta']
+    results = {data['field']: data['value'] for kind, data in events if kind == 'result'}
+    assert ''.join(d['text'] for d in deltas if d['field'] == 'overall_report_desc') == DESCRIPTION
+    assert len([d for d in deltas if d['field'] == 'overall_report_desc']) > 1
+    assert results['overall_report_desc'] == DESCRIPTION
+    assert results['suggestions'][0]['topic'] == 'Practice Mindfulness Meditation'
+    assert all(request['stream'] for request in llm_stub.requests)
+
+    # Streamed outputs go into the LLM cache like the buffered ones
+    repeat = client.post('/emotion-reports?stream=sse', headers=auth_headers,
+                         json={'start_date': '2024-09-01', 'end_date': '2024-09-30'})
+    assert [kind for kind, _ in _parse_sse(repeat.get_data(as_text=True))] == \
+        ['report', 'result', 'result', 'result', 'done']
+    assert len(llm_stub.requests) == 3
@@ -0,0 +1,26 @@
+import pytest
+
+from tools.loadgen import LoadGenerator, load_texts, local_server, parse_mix
+
+
+def test_parse_mix():
+    assert parse_mix('predict_details=70,login=5') == {'predict_details': 70.0, 'login': 5.0}
+    with pytest.raises(ValueError):
+        parse_mix('predict_details=70,unknown=5')
+
+
+def test_load_generator_reports_every_endpoint():
+    texts = load_texts(limit=50)
+    mix = parse_mix('predict_details=1,diary_reports=1,emotion_reports=1,login=1,register=1')
+
+    with local_server(llm_latency=0.0, PASSWORD_HASH_METHOD='pbkdf2:sha256:1000') as (host, port):
+        report = LoadGenerator(host, port, texts, mix, users=2, concurrency=2, duration=60, max_requests=40,
+                               entries=1).run()
+
+    assert report['setup']['register']['requests'] == 2
+    assert report['setup']['predict_details']['requests'] == 2
+    assert report['total']['requests'] >= 40  # new users also log in and write entries
+    assert report['total']['errors'] == 0, {n: s['statuses'] for n, s in report['endpoints'].items()}
+    for summary in report['endpoints'].values():
+        assert sum(summary['histogram'].values()) == summary['requests']
+        assert summary['p50_ms'] <= summary['p95_ms'] <= summary['p99_ms']
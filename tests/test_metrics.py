@@ -0,0 +1,108 @@
+import re
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.metrics import RequestTimings, _current, stage
+from app.models import User
+
+
+def _sample(text, name, **labels):
+    """Value of one sample line in the /metrics output, or None."""
+    pattern = re.escape(name) + r'\{([^}]*)\} (\S+)'
+    for found_labels, value in re.findall(pattern, text):
+        pairs = dict(re.findall(r'(\w+)="([^"]*)"', found_labels))
+        if all(pairs.get(key) == value_ for key, value_ in labels.items()):
+            return float(value)
+    return None
+
+
+def test_metrics_endpoint_reports_requests_and_stages(client, auth_headers, llm_stub):
+    client.post('/predict_details', headers=auth_headers,
+                json={'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'})
+    client.post('/emotion-reports', headers=auth_headers, json={'start_date': '2024-09-01', 'end_date': '2024-09-30'})
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert _sample(text, 'http_requests_total', method='POST', endpoint='/predict_details', status='200') == 1
+    assert _sample(text, 'http_request_duration_seconds_count', method='POST', endpoint='/login') == 1
+    for stage_name in ('db', 'inference', 'serialization', 'other'):
+        assert _sample(text, 'http_request_stage_duration_seconds_count',
+                       endpoint='/predict_details', stage=stage_name) == 1
+    assert _sample(text, 'http_request_stage_duration_seconds_count', endpoint='/emotion-reports', stage='llm') == 1
+    assert _sample(text, 'http_request_stage_duration_seconds_bucket',
+                   endpoint='/emotion-reports', stage='llm', le='+Inf') == 1
+    # /metrics does not count itself
+    assert 'endpoint="/metrics"' not in text
+
+
+def test_streamed_requests_record_their_body_stages(client, auth_headers, llm_stub):
+    client.post('/predict_details', headers=auth_headers,
+                json={'text': 'I am so happy today', 'selected_dairy_date': '2024-09-15'})
+    llm_stub.latency = 0.05
+
+    response = client.post('/emotion-reports?stream=sse', headers=auth_headers,
+                           json={'start_date': '2024-09-01', 'end_date': '2024-09-30'})
+    assert 'event: done' in response.get_data(as_text=True)
+    response.close()
+    stream = client.get('/diary-reports?stream=1', headers=auth_headers)
+    assert len(stream.get_data(as_text=True).splitlines()) == 1
+    stream.close()
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert _sample(text, 'http_requests_total', method='POST', endpoint='/emotion-reports', status='200') == 1
+    assert _sample(text, 'http_request_stage_duration_seconds_sum', endpoint='/emotion-reports', stage='llm') >= 0.05
+    assert _sample(text, 'http_request_duration_seconds_sum', method='POST', endpoint='/emotion-reports') >= 0.05
+    assert _sample(text, 'http_request_stage_duration_seconds_count', endpoint='/diary-reports', stage='db') == 1
+
+
+def test_metrics_is_opt_in_and_token_protected():
+    assert 'metrics' not in create_app('TestingConfig', overrides={'METRICS_ENABLED': False}).view_functions
+
+    client = create_app('TestingConfig', overrides={'METRICS_TOKEN': 's3cret'}).test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+
+
+def test_server_timing_header():
+    app = create_app('TestingConfig', overrides={'METRICS_SERVER_TIMING': True})
+    with app.app_context():
+        db.create_all()
+        user = User(username='timing', email='timing@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity={'email': user.email}, additional_claims={'uid': user.id})
+
+    response = app.test_client().get('/diary-reports', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    timing = dict(part.split(';dur=') for part in response.headers['Server-Timing'].split(', '))
+    assert set(timing) >= {'db', 'serialization', 'total'}
+    assert sum(float(value) for name, value in timing.items() if name != 'total') <= float(timing['total']) + 0.1
+
+    with app.app_context():
+        db.drop_all()
+
+
+def test_nested_stages_are_exclusive():
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with stage('llm'):
+            with stage('db'):
+                pass
+    finally:
+        _current.reset(token)
+    assert timings.stages['db'] > 0
+    assert timings.stages['llm'] > 0
+    assert timings.stages['inference'] == 0
+
+    # Outside a request the stages do nothing
+    with stage('db'):
+        pass
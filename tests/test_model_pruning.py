@@ -0,0 +1,66 @@
+import joblib
+import numpy as np
+
+from app.model_artifact import export_pipeline
+from app.model_pruning import document_frequencies, prune_pipeline, select_features
+from app.prediction import DEFAULT_MODEL_PATH, load_model
+from tools.prune_model import format_report, pick, sweep
+
+TEXTS = ['I am so happy today', 'this is terrible and I hate it', 'I miss you so much', 'what a surprise']
+
+
+def test_float32_only_keeps_predictions():
+    model = load_model(DEFAULT_MODEL_PATH)
+    quantized = prune_pipeline(model)
+
+    assert quantized.steps[-1][1].coef_.dtype == np.float32
+    assert quantized.steps[-1][1].coef_.shape == model.steps[-1][1].coef_.shape
+    assert list(quantized.classes_) == list(model.classes_)
+    np.testing.assert_allclose(quantized.predict_proba(TEXTS), model.predict_proba(TEXTS), atol=1e-5)
+
+
+def test_pruned_model_drops_rare_and_weak_terms(tmp_path):
+    model = load_model(DEFAULT_MODEL_PATH)
+    doc_freq = document_frequencies(model, TEXTS * 3 + ['surprise'])
+    pruned = prune_pipeline(model, select_features(model, doc_freq, min_df=4))
+
+    # 'so' and 'surprise' occur in 4+ documents; every other term fewer
+    vocabulary = pruned.steps[0][1].vocabulary_
+    assert vocabulary == {'so': 0, 'surprise': 1}
+
+    weights = np.abs(model.steps[-1][1].coef_).max(axis=0)
+    keep = select_features(model, min_weight=0.5)
+    assert keep.sum() == (weights >= 0.5).sum() < len(weights)
+    pruned = prune_pipeline(model, keep)
+    vocabulary = pruned.steps[0][1].vocabulary_
+    assert len(vocabulary) == keep.sum() and 'happy' in vocabulary
+
+    # The kept columns score exactly as before; the dropped ones are treated as unknown words
+    column = model.steps[0][1].vocabulary_['happy']
+    np.testing.assert_allclose(pruned.steps[-1][1].coef_[:, vocabulary['happy']],
+                               model.steps[-1][1].coef_[:, column], rtol=1e-6)
+
+    # Loads through the app and converts to the compact artifact
+    path = tmp_path / 'pruned.pkl'
+    joblib.dump(pruned, path)
+    served = load_model(str(path))
+    export_pipeline(served, str(tmp_path / 'compact'))
+    compact = load_model(str(tmp_path / 'compact'))
+    np.testing.assert_allclose(compact.predict_proba(TEXTS), served.predict_proba(TEXTS), atol=1e-5)
+
+
+def test_sweep_reports_and_picks_operating_point(tmp_path):
+    model = load_model(DEFAULT_MODEL_PATH)
+    rows = sweep(model, TEXTS * 3, TEXTS, ['joy', 'anger', 'sadness', 'surprise'], [1, 3], [0.0, 0.5],
+                 str(tmp_path), latency_samples=5)
+
+    assert [row['name'] for row in rows] == ['original', 'pruned-df1-w0.pkl', 'pruned-df1-w0.5.pkl',
+                                             'pruned-df3-w0.pkl', 'pruned-df3-w0.5.pkl']
+    assert all(row['size_bytes'] < rows[0]['size_bytes'] for row in rows[1:])
+    assert pick(rows, 1.0)['size_bytes'] == min(row['size_bytes'] for row in rows[1:])
+    assert pick(rows, -1.0) is None
+
+    report = format_report(rows).splitlines()
+    assert report[0].split() == ['min_df', 'min_weight', 'features', 'accuracy', 'size_kb', 'load_ms', 'p50_ms',
+                                 'p95_ms']
+    assert len(report) == 6 and report[1].split()[:2] == ['-', '-']
@@ -1,25 +1,69 @@
-import time
+from app import db, llm, prediction
+from benchmarks.common import make_app
+from benchmarks.suite import compare, gate, run_suite, save_results
 
 
-# TC015 - Test API Response Time Under Normal Load
-def test_predict_details_performance(client):
-    # Step 1: Perform a login to get a JWT token
-    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
-    assert login_response.status_code == 200
-    token = login_response.get_json()['data']['access_token']
+# TC015 - Test the benchmark suite and its regression gate
+def test_benchmark_suite_reports_latency_percentiles():
+    results = run_suite(sizes=[10], repeat=3, log=lambda *args: None)
 
-    headers = {'Authorization': f'Bearer {token}'}
+    assert {'inference.single', 'inference.batch64', 'predict_details', 'diary_reports.page100@10',
+            'diary_reports.full@10', 'emotion_reports@10'} <= set(results)
+    for stats in results.values():
+        assert set(stats) == {'p50_ms', 'p95_ms', 'p99_ms', 'ops_per_s'}
+        assert stats['p50_ms'] <= stats['p95_ms'] <= stats['p99_ms']
+        assert stats['ops_per_s'] > 0
 
-    # Step 2: Start timer and send a request to /predict_details
-    start_time = time.time()
-    response = client.post('/predict_details', headers=headers,
-                           json={'text': 'I am feeling great today!', 'selected_dairy_date': '2024-09-17'})
-    end_time = time.time()
 
-    # Step 3: Assert response status and time
-    assert response.status_code == 200
-    response_time = end_time - start_time
-    assert response_time < 0.5
+def test_benchmark_regression_gate():
+    baseline = {'case': {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'ops_per_s': 100.0}}
+
+    assert compare({'case': {'p50_ms': 12.0, 'p95_ms': 29.0, 'p99_ms': 90.0, 'ops_per_s': 80.0}},
+                   baseline, 0.25) == []
+    # Relative jumps below the absolute floor are noise
+    assert compare({'case': {'p50_ms': 0.9, 'p95_ms': 20.0}}, {'case': {'p50_ms': 0.1, 'p95_ms': 20.0}},
+                   0.25) == []
+
+    regressions = compare({'case': {'p50_ms': 15.0, 'p95_ms': 31.0, 'p99_ms': 30.0, 'ops_per_s': 60.0}},
+                          baseline, 0.25)
+    assert [(name, metric) for name, metric, *_ in regressions] == [('case', 'p50_ms'), ('case', 'p95_ms')]
+    assert regressions[0][4] == 0.5
+
+
+def test_benchmark_gate_needs_a_baseline_from_this_machine(tmp_path):
+    import json
+
+    results = {'case': {'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0, 'ops_per_s': 100.0}}
+    path = tmp_path / 'baseline.json'
+    quiet = lambda *args: None
+
+    assert gate(results, str(path), 0.25, log=quiet) == 2
+    save_results(str(path), results)
+    assert gate(results, str(path), 0.25, log=quiet) == 0
+    assert gate({'case': dict(results['case'], p50_ms=20.0)}, str(path), 0.25, log=quiet) == 1
+
+    # Only the stable machine keys count, not e.g. the kernel build
+    recorded = json.loads(path.read_text())
+    recorded['machine']['platform'] = 'Linux-6.1.0-other-kernel-x86_64'
+    path.write_text(json.dumps(recorded))
+    assert gate(results, str(path), 0.25, log=quiet) == 0
+
+    recorded['machine']['cpus'] += 1
+    path.write_text(json.dumps(recorded))
+    messages = []
+    assert gate(results, str(path), 0.25, log=messages.append) == 2
+    assert messages[0].startswith('Baseline machine differs: cpus')
+
+
+def test_benchmark_app_applies_database_and_config(tmp_path):
+    database = tmp_path / 'bench.db'
+    app = make_app(f'sqlite:///{database}', LLM_TIMEOUT_SECONDS=7, PREDICTION_CACHE='none')
+
+    with app.app_context():
+        assert db.engine.url.database == str(database)
+    assert database.exists()
+    assert llm._settings['timeout'] == 7
+    assert prediction._cache is None
 
 
 # TC016 - Test System Performance With Large Payloads
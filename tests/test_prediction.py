@@ -0,0 +1,153 @@
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from app import prediction
+
+
+def test_predict_emotion_details_matches_pipeline():
+    text = 'I am feeling very happy today!'
+    main_emotion, probability = prediction.predict_emotion_details(text)
+
+    expected = prediction.get_model().predict_proba([text])[0]
+    assert list(probability) == prediction.labels
+    assert [probability[label] for label in prediction.labels] == list(expected)
+    assert main_emotion == max(probability, key=probability.get)
+
+
+def test_predict_batch_preserves_order():
+    texts = ['I am so angry at you', 'What a lovely surprise!', 'I miss her so much']
+    results = prediction.predict_batch(texts)
+
+    assert results == [prediction.predict_emotion_details(text) for text in texts]
+
+
+def test_micro_batcher_scores_concurrent_requests_together(monkeypatch):
+    calls = []
+    original = prediction._score_texts
+
+    def recording_score_texts(texts):
+        calls.append(len(texts))
+        return original(texts)
+
+    monkeypatch.setattr(prediction, '_score_texts', recording_score_texts)
+    batcher = prediction.MicroBatcher(window_ms=200, max_batch_size=16)
+
+    texts = [f'Today was day number {i} and I felt fine' for i in range(16)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda text: batcher.submit(text).result(timeout=5), texts))
+
+    assert results == original(texts)
+    assert sum(calls) == 16
+    assert len(calls) < 16
+
+
+def test_compact_artifact_matches_pipeline(tmp_path):
+    from app.model_artifact import export_pipeline, load_compact_pipeline
+
+    export_pipeline(prediction.get_model(), str(tmp_path / 'compact'))
+    compact = load_compact_pipeline(str(tmp_path / 'compact'))
+
+    texts = ['I am feeling very happy today!', 'Why ?', 'Ça me rend tellement furieux', '',
+             'supercalifragilisticexpialidocious ' * 3]
+    expected = prediction.get_model().predict_proba(texts)
+
+    assert list(compact.classes_) == list(prediction.get_model().classes_)
+    assert abs(compact.predict_proba(texts) - expected).max() < 1e-5
+    assert list(compact.predict(texts)) == list(prediction.get_model().predict(texts))
+
+
+def test_create_app_does_not_load_heavy_resources():
+    # Needs a fresh interpreter: other tests in this session have already loaded the model
+    code = (
+        "import sys\n"
+        "from app import create_app, prediction\n"
+        "app = create_app('TestingConfig')\n"
+        "assert not prediction.is_model_loaded()\n"
+        "assert 'sklearn' not in sys.modules and 'openai' not in sys.modules\n"
+        "assert {'config', 'extensions', 'blueprints'} <= set(app.extensions['startup_timings'])\n"
+    )
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def _cache_config(**overrides):
+    config = {'PREDICTION_CACHE': 'memory', 'PREDICTION_CACHE_MAX_ENTRIES': 2, 'PREDICTION_CACHE_TTL': 0}
+    config.update(overrides)
+    return config
+
+
+def test_prediction_cache_hits_on_normalized_text(monkeypatch):
+    cache = prediction.create_cache(_cache_config())
+    monkeypatch.setattr(prediction, '_cache', cache)
+
+    first = prediction.predict_emotion_details('I am so happy today!')
+    second = prediction.predict_emotion_details('  i am SO happy, today ')
+
+    assert first == second
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_prediction_cache_lru_eviction_and_batch(monkeypatch):
+    cache = prediction.create_cache(_cache_config())
+    monkeypatch.setattr(prediction, '_cache', cache)
+
+    prediction.predict_batch(['one day', 'two days', 'three days'])
+
+    stats = cache.stats()
+    assert stats['misses'] == 3
+    assert stats['evictions'] == 1
+    assert cache.get('one day') is None
+
+
+def test_prediction_cache_ttl_expiry():
+    backend = prediction.MemoryCacheBackend(10, prediction.TTLEviction(ttl=60))
+    backend.set('key', ('joy', {'joy': 1.0}))
+
+    assert backend.get('key') == (('joy', {'joy': 1.0}), 0)
+    backend._entries['key'] = (backend._entries['key'][0], 0)
+    assert backend.get('key') == (None, 1)
+
+
+def test_sqlite_cache_is_shared_and_bounded(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    writer = prediction.create_cache(_cache_config(PREDICTION_CACHE='sqlite', PREDICTION_CACHE_PATH=path))
+    reader = prediction.create_cache(_cache_config(PREDICTION_CACHE='sqlite', PREDICTION_CACHE_PATH=path))
+
+    for text in ['one day', 'two days', 'three days']:
+        writer.set(text, prediction._score_texts([text])[0])
+
+    assert writer.stats()['evictions'] == 1
+    assert reader.get('one day') is None
+    assert reader.get('Three days!') == prediction._score_texts(['three days'])[0]
+
+
+def test_model_change_invalidates_cache_keys(tmp_path):
+    other_model = tmp_path / 'model.pkl'
+    other_model.write_bytes(open(prediction.DEFAULT_MODEL_PATH, 'rb').read() + b'\0')
+
+    assert prediction.model_fingerprint(str(other_model)) != prediction.model_fingerprint(prediction.DEFAULT_MODEL_PATH)
+    assert prediction.cache_key('text', 'v1') != prediction.cache_key('text', 'v2')
+
+
+def test_cache_key_follows_the_model_analyzer(tmp_path):
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import Pipeline
+
+    from app.model_artifact import export_pipeline
+
+    bundled = prediction.text_analyzer(prediction.load_model(prediction.DEFAULT_MODEL_PATH))
+    assert prediction.cache_key('Happy, happy day!', 'v', bundled) == prediction.cache_key('day happy HAPPY', 'v', bundled)
+
+    case_sensitive = Pipeline([('cv', CountVectorizer(lowercase=False)), ('lr', LogisticRegression())])
+    case_sensitive.fit(['Happy day', 'happy day', 'sad day'], ['joy', 'surprise', 'sadness'])
+    analyzer = prediction.text_analyzer(case_sensitive)
+    assert prediction.cache_key('Happy day', 'v', analyzer) != prediction.cache_key('happy day', 'v', analyzer)
+
+    export_pipeline(case_sensitive, str(tmp_path / 'compact'))
+    compact = prediction.text_analyzer(prediction.load_model(str(tmp_path / 'compact')))
+    assert compact('Happy day!') == ['Happy', 'day']
+
+    # Without an analyzer only identical texts share a key
+    assert prediction.cache_key('happy day', 'v') != prediction.cache_key('happy  day', 'v')
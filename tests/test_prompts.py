@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from app.llm import convert_emotion_data_to_prompt
+from app.prediction import labels
+from app.prompts import build_emotion_prompt, bucket_series, estimate_tokens, format_emotion_data
+
+
+def _series(days, emotions=tuple(labels)):
+    start = date(2024, 1, 1)
+    return {emotion: [{'date': (start + timedelta(days=i)).isoformat(), 'value': (i % 10) / 10 + k / 100}
+                      for i in range(days)]
+            for k, emotion in enumerate(emotions)}
+
+
+def test_daily_format_is_unchanged():
+    data = {'joy': [{'date': '2024-09-15', 'value': 0.5}], 'fear': 0.25}
+    assert convert_emotion_data_to_prompt(data) == (
+        "Here is the emotion data over a period of time:\n\n"
+        "Emotion: Joy\n- On 2024-09-15, the value was 0.50000.\n\n"
+        "Emotion: Fear\n- The average value was 0.25000.\n\n")
+
+
+def test_weekly_and_monthly_buckets():
+    entries = _series(14)[labels[0]]
+    weekly = bucket_series(entries, 'weekly')
+    assert entries[0]['value'] == 0.0
+    assert [b[0] for b in weekly] == [date(2024, 1, 1), date(2024, 1, 8)]
+    assert weekly[0][1:] == (0.3, 0.0, 0.6, 7)
+
+    monthly = bucket_series(_series(60)[labels[0]], 'monthly')
+    assert [(b[0], b[4]) for b in monthly] == [(date(2024, 1, 1), 31), (date(2024, 2, 1), 29)]
+    assert "- 2024-01: mean" in format_emotion_data(_series(60), 'monthly')
+
+
+def test_resolution_follows_token_budget():
+    short, long_ = _series(7), _series(365)
+
+    assert build_emotion_prompt(short, 3000)[1] == 'daily'
+    assert build_emotion_prompt(long_, 0)[1] == 'daily'
+    assert build_emotion_prompt(_series(90), 3000)[1] == 'weekly'
+
+    text, resolution = build_emotion_prompt(long_, 3000)
+    assert resolution == 'monthly'
+    assert estimate_tokens(text) <= 3000
+    assert estimate_tokens(text) * 10 < estimate_tokens(format_emotion_data(long_, 'daily'))
+
+    # Overall averages are tiny and always fit
+    assert build_emotion_prompt({'joy': 0.5}, 10)[1] == 'daily'
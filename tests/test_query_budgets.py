@@ -0,0 +1,102 @@
+"""Per-endpoint SQL query budgets.
+
+Each block fails with the statements it ran when an endpoint issues more
+queries than declared, which is how N+1 patterns show up.
+"""
+import logging
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models import User
+from app.query_profiler import QueryBudget, QueryBudgetExceeded
+
+
+def _items(count, month=9):
+    return [{'text': f'Entry {i} made me happy', 'selected_dairy_date': f'2024-{month:02d}-{i + 1:02d}'}
+            for i in range(count)]
+
+
+def test_auth_query_budgets(client, query_budget):
+    with query_budget(2):
+        assert client.post('/register', json={'username': 'new', 'email': 'new@example.com',
+                                              'password': 'newpass'}).status_code == 201
+    with query_budget(2):
+        assert client.post('/login', json={'email': 'testuser@example.com',
+                                           'password': 'testpass'}).status_code == 200
+
+
+def test_write_query_budgets(client, auth_headers, query_budget):
+    with query_budget(5):
+        client.post('/predict_details', headers=auth_headers, json=_items(1)[0])
+
+    # One INSERT per entry (the ORM needs each id), everything else is batched
+    for count in (5, 20):
+        with query_budget(count + 3):
+            response = client.post('/predict_details/batch', headers=auth_headers,
+                                   json={'items': _items(count, month=count // 5)})
+        assert response.status_code == 200
+
+
+def test_read_query_budgets(client, auth_headers, query_budget, llm_stub):
+    client.post('/predict_details/batch', headers=auth_headers, json={'items': _items(20)})
+    report_range = {'start_date': '2024-09-01', 'end_date': '2024-09-30'}
+
+    with query_budget(3):
+        client.get('/diary-reports', headers=auth_headers, query_string={'limit': 5})
+    # Two aggregates, the LLM cache lookup and one upsert of the three fresh responses plus eviction,
+    # each cache step in its own SAVEPOINT
+    with query_budget(10):
+        assert client.post('/emotion-reports', headers=auth_headers, json=report_range).status_code == 200
+    with query_budget(6):
+        assert client.post('/emotion-reports', headers=auth_headers, json=report_range).status_code == 200
+
+    client.application.config['EMOTION_REPORTS_SOURCE'] = 'entries'
+    with query_budget(6):
+        assert client.post('/emotion-reports', headers=auth_headers, json=report_range).status_code == 200
+
+
+def test_query_budget_failure_lists_statements(client, auth_headers, query_budget):
+    with pytest.raises(QueryBudgetExceeded, match='queries, budget is 0') as excinfo:
+        with query_budget(0):
+            client.get('/diary-reports', headers=auth_headers)
+    assert 'FROM diary_entries' in str(excinfo.value)
+
+    with client.application.app_context():
+        engine = db.engine
+
+    @QueryBudget(1, engine)
+    def two_reads():
+        client.get('/diary-reports', headers=auth_headers)
+        client.get('/diary-reports', headers=auth_headers)
+
+    with pytest.raises(QueryBudgetExceeded):
+        two_reads()
+
+
+def test_profiler_logs_requests_and_repeated_statements(caplog):
+    app = create_app('TestingConfig', overrides={'SQL_PROFILER_ENABLED': True, 'SQL_PROFILER_SLOW_MS': 0,
+                                                 'SQL_PROFILER_REPEAT_WARNING': 3})
+    with app.app_context():
+        db.create_all()
+        user = User(username='profiled', email='profiled@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity={'email': user.email}, additional_claims={'uid': user.id})
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with caplog.at_level(logging.INFO, logger='app.query_profiler'):
+        client.post('/predict_details/batch', headers=headers, json={'items': _items(3)})
+        client.get('/diary-reports', headers=headers)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(message.startswith('GET /diary-reports: 2 queries') and 'FROM diary_entries' in message
+               for message in messages)
+    assert any('slow query' in message for message in messages)
+    repeated = [message for message in messages if 'possible N+1' in message]
+    assert len(repeated) == 1 and 'ran 3 times' in repeated[0] and 'INSERT INTO diary_entries' in repeated[0]
+
+    with app.app_context():
+        db.drop_all()
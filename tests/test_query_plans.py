@@ -0,0 +1,70 @@
+"""Fails when a hot query falls back to a full table scan.
+
+The endpoints are exercised for real; every SELECT they issue is captured
+and fed back to SQLite's EXPLAIN QUERY PLAN with the same parameters.
+"""
+import re
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+# A plan step that reads the whole table; "SCAN t USING [COVERING] INDEX" walks an index instead
+FULL_SCAN = re.compile(r'^SCAN (\w+)(?! USING (COVERING )?INDEX)')
+
+
+@pytest.fixture
+def captured_selects(client):
+    with client.application.app_context():
+        engine = db.engine
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', capture)
+
+
+def _plan(client, statement, parameters):
+    with client.application.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            rows = connection.cursor().execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        finally:
+            connection.close()
+    return [row[-1] for row in rows]
+
+
+def _full_scans(client, statements):
+    problems = []
+    for statement, parameters in statements:
+        for step in _plan(client, statement, parameters):
+            if FULL_SCAN.match(step):
+                problems.append(f'{step}\n  in: {statement}')
+    return problems
+
+
+def test_hot_queries_use_indexes(client, captured_selects, llm_stub):
+    login_response = client.post('/login', json={'email': 'testuser@example.com', 'password': 'testpass'})
+    headers = {'Authorization': f"Bearer {login_response.get_json()['data']['access_token']}"}
+    client.post('/predict_details/batch', headers=headers, json={'items': [
+        {'text': f'Entry {i} made me happy', 'selected_dairy_date': f'2024-09-{i + 1:02d}'} for i in range(5)]})
+
+    captured_selects.clear()
+    page = client.get('/diary-reports', headers=headers, query_string={'limit': 2}).get_json()
+    client.get('/diary-reports', headers=headers, query_string={'limit': 2, 'cursor': page['meta']['next_cursor']})
+    client.get('/diary-reports', headers=headers, query_string={'stream': 1}).get_data()
+    for source in ('rollups', 'entries'):
+        client.application.config['EMOTION_REPORTS_SOURCE'] = source
+        client.post('/emotion-reports', headers=headers, json={'start_date': '2024-09-01', 'end_date': '2024-09-30'})
+
+    assert captured_selects
+    assert _full_scans(client, captured_selects) == []
+
+
+def test_full_scan_is_detected(client):
+    assert _full_scans(client, [('SELECT * FROM diary_entries WHERE content = ?', ('x',))])
@@ -0,0 +1,122 @@
+import time
+
+from app.models import ReportJob
+
+
+def _start_job(client, headers):
+    return client.post('/emotion-reports', headers=headers,
+                       json={'start_date': '2024-09-01', 'end_date': '2024-09-30', 'async': True})
+
+
+def test_async_report_returns_202_before_the_llm_runs(client, auth_headers, seeded_entries, llm_stub):
+    client.application.extensions.pop('report_jobs')  # nothing picks the job up in this test
+
+    response = _start_job(client, auth_headers)
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status'] == 'queued'
+    assert response.headers['Location'] == body['status_url'] == f"/emotion-reports/jobs/{body['job_id']}"
+    assert llm_stub.requests == []
+
+    # The SQL aggregation is already there
+    job = client.get(body['status_url'], headers=auth_headers).get_json()
+    assert job['status'] == 'queued'
+    assert 'joy' in job['result']['overall_report']
+    assert 'suggestions' not in job['result']
+
+
+def test_worker_command_completes_queued_jobs(client, auth_headers, seeded_entries, llm_stub):
+    client.application.extensions.pop('report_jobs')
+    status_url = _start_job(client, auth_headers).get_json()['status_url']
+
+    result = client.application.test_cli_runner().invoke(args=['jobs', 'work', '--once'])
+    assert 'Processed 1 jobs' in result.output
+
+    job = client.get(status_url, headers=auth_headers).get_json()
+    assert job['status'] == 'done'
+    assert job['result']['overall_report_desc'].startswith('Over this period')
+    assert job['result']['suggestions'][0]['topic'] == 'Practice Mindfulness Meditation'
+    assert job['finished_at'] is not None
+    assert len(llm_stub.requests) == 3
+
+
+def test_in_process_pool_runs_jobs(client, auth_headers, seeded_entries, llm_stub):
+    llm_stub.latency = 0.2
+
+    start = time.perf_counter()
+    status_url = _start_job(client, auth_headers).get_json()['status_url']
+    assert time.perf_counter() - start < 0.2
+
+    deadline = time.monotonic() + 10
+    job = client.get(status_url, headers=auth_headers).get_json()
+    while job['status'] in ('queued', 'running') and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = client.get(status_url, headers=auth_headers).get_json()
+
+    assert job['status'] == 'done'
+    assert set(job['result']) == {'detailed_reports', 'overall_report', 'detailed_reports_desc',
+                                  'overall_report_desc', 'suggestions'}
+
+
+def test_jobs_are_private_and_stale_jobs_requeue(client, auth_headers, seeded_entries, llm_stub):
+    from app import db
+    from app.jobs import claim_job, requeue_stale_jobs
+
+    client.application.extensions.pop('report_jobs')
+    job_id = _start_job(client, auth_headers).get_json()['job_id']
+
+    client.post('/register', json={'username': 'other', 'email': 'other@example.com', 'password': 'pw'})
+    login = client.post('/login', json={'email': 'other@example.com', 'password': 'pw'})
+    other = {'Authorization': f"Bearer {login.get_json()['data']['access_token']}"}
+    assert client.get(f'/emotion-reports/jobs/{job_id}', headers=other).status_code == 404
+    assert client.get('/emotion-reports/jobs/missing', headers=auth_headers).status_code == 404
+
+    with client.application.app_context():
+        assert claim_job(job_id)
+        assert requeue_stale_jobs(older_than=60) == 0
+        assert requeue_stale_jobs(older_than=-1) == 1
+        assert db.session.get(ReportJob, job_id).status == 'queued'
+
+
+def test_async_flag_must_be_a_bool(client, auth_headers):
+    response = client.post('/emotion-reports', headers=auth_headers,
+                           json={'start_date': '2024-09-01', 'end_date': '2024-09-30', 'async': 'false'})
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'async must be true or false'
+
+
+def test_runner_recovers_jobs_left_by_a_dead_process(client, auth_headers, seeded_entries, llm_stub):
+    from datetime import datetime, timedelta
+
+    from app import db
+    from app.jobs import JobRunner, claim_job
+
+    client.application.extensions.pop('report_jobs')  # the "previous process" never ran them
+    # One worker: the in-memory test database is a single connection shared by all threads
+    runner = JobRunner(client.application, max_workers=1, stale_after=60)
+    queued_id = _start_job(client, auth_headers).get_json()['job_id']
+    running_id = _start_job(client, auth_headers).get_json()['job_id']
+    with client.application.app_context():
+        assert claim_job(running_id)
+        db.session.get(ReportJob, running_id).started_at = datetime.utcnow() - timedelta(seconds=runner.stale_after + 1)
+        db.session.commit()
+
+    assert runner.recover() == 2
+    runner.shutdown()
+    for job_id in (queued_id, running_id):
+        assert client.get(f'/emotion-reports/jobs/{job_id}', headers=auth_headers).get_json()['status'] == 'done'
+
+
+def test_job_fails_when_every_llm_call_fails(client, auth_headers, seeded_entries, llm_stub):
+    client.application.extensions.pop('report_jobs')
+    llm_stub.error_status = 500
+    status_url = _start_job(client, auth_headers).get_json()['status_url']
+
+    client.application.test_cli_runner().invoke(args=['jobs', 'work', '--once'])
+
+    job = client.get(status_url, headers=auth_headers).get_json()
+    assert job['status'] == 'failed'
+    assert job['error'].count('Stub failure') == 3
+    assert job['result']['suggestions'].startswith('Error generating suggestions')
+    assert job['finished_at'] is not None
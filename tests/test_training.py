@@ -0,0 +1,71 @@
+import csv
+import json
+import os
+
+import numpy as np
+
+from app.prediction import labels, load_model
+from app.model_artifact import export_pipeline
+from app.training import DATASET, build_pipeline, train
+
+
+def _small_dataset(path, per_class=40):
+    """The first ``per_class`` rows of every emotion, so all eight classes are present."""
+    rows, seen = [], {}
+    with open(DATASET, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if seen.get(row['Emotion'], 0) < per_class:
+                seen[row['Emotion']] = seen.get(row['Emotion'], 0) + 1
+                rows.append(row)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Emotion', 'Text'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_pipeline_cleans_its_own_input():
+    analyzer = build_pipeline('count').steps[0][1].build_analyzer()
+    assert analyzer('@someone I am SO happy with the results, happy') == ['happy', 'results', 'happy']
+    # Punctuation no longer shields a stop word ('cry' is one in sklearn's list)
+    assert analyzer('cry, cry') == []
+    assert build_pipeline('count', clean=False).steps[0][1].build_analyzer()('@someone cry,') == ['someone', 'cry']
+
+
+def test_train_writes_versioned_hashing_artifact(tmp_path):
+    dataset = tmp_path / 'emotions.csv'
+    _small_dataset(dataset)
+
+    info = train(str(dataset), str(tmp_path / 'models'), 'hashing', c_values=(0.5, 1.0), n_features=(2 ** 10,),
+                 cv=2, n_jobs=1, log=lambda *args: None)
+
+    out_dir = tmp_path / 'models' / info['version']
+    assert info['version'].startswith('emotion-lr-hashing-')
+    assert sorted(os.listdir(out_dir)) == ['metrics.json', 'model.pkl']
+    assert json.loads((out_dir / 'metrics.json').read_text()) == json.loads(json.dumps(info))
+    assert set(info['metrics']) == {'accuracy', 'size_bytes', 'load_time_ms', 'latency_p50_ms', 'latency_p95_ms',
+                                    'batch_texts_per_s'}
+    assert info['search']['best_params']['lr__C'] in (0.5, 1.0)
+    assert info['dataset']['train_size'] + info['dataset']['test_size'] == 8 * 40
+
+    # The app serves it like the notebook's pickle: same classes, same order
+    model = load_model(str(out_dir / 'model.pkl'))
+    assert len(model.classes_) == len(labels)
+    assert model.predict_proba(['I am so happy today']).shape == (1, len(labels))
+
+
+def test_train_count_artifact_serves_raw_text(tmp_path):
+    dataset = tmp_path / 'emotions.csv'
+    _small_dataset(dataset)
+
+    info = train(str(dataset), str(tmp_path / 'models'), 'count', c_values=(1.0,), cv=2, n_jobs=1,
+                 log=lambda *args: None)
+
+    assert info['text_options']['stop_words'] == 'english'
+    model = load_model(str(tmp_path / 'models' / info['version'] / 'model.pkl'))
+    vocabulary = model.steps[0][1].vocabulary_
+    assert 'the' not in vocabulary and 'happy' in vocabulary
+    # The compact artifact tokenizes the same way
+    export_pipeline(model, str(tmp_path / 'compact'))
+    compact = load_model(str(tmp_path / 'compact'))
+    texts = ['@friend I am SO happy, so so happy!', 'Why did they leave me alone...']
+    np.testing.assert_allclose(compact.predict_proba(texts), model.predict_proba(texts), atol=1e-5)
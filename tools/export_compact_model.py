@@ -0,0 +1,28 @@
+"""Converts the joblib emotion pipeline into the compact memory-mappable artifact.
+
+    python -m tools.export_compact_model \
+        models/emotion_classifier_pipe_lr.pkl models/emotion_classifier_compact
+
+Point EMOTION_MODEL_PATH at the output directory to serve from it.
+"""
+import argparse
+
+import joblib
+
+from app.model_artifact import export_pipeline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('source', help='joblib pipeline (.pkl)')
+    parser.add_argument('out_dir', help='directory to write the compact artifact to')
+    args = parser.parse_args(argv)
+
+    with open(args.source, 'rb') as f:
+        pipeline = joblib.load(f)
+    meta = export_pipeline(pipeline, args.out_dir, source_path=args.source)
+    print(f"Exported {meta['n_features']} features x {len(meta['classes'])} classes to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
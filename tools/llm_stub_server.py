@@ -0,0 +1,187 @@
+"""Local stand-in for the OpenAI chat completions API with configurable latency.
+
+    python -m tools.llm_stub_server [--port 8089] [--latency 1.5] [--token-delay 0.05]
+
+then run the app with OPENAI_BASE_URL=http://127.0.0.1:8089/v1. Prompts that
+ask for suggestions get a JSON array back, anything else a short paragraph.
+Requests with "stream": true get the text as server-sent chunks, one word
+every token_delay seconds after the initial latency. prompt_latency adds that
+many seconds per 1000 prompt tokens (~4 characters each) to model prefill.
+With error_status set every request fails with that HTTP status (and asks
+the client not to retry).
+Tests and benchmarks start it in-process through StubChatCompletionsServer.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUGGESTIONS = [
+    {'topic': 'Practice Mindfulness Meditation',
+     'explanation': 'Mindfulness helps you notice emotions without judging them.',
+     'steps': 'Start with 5 minutes a day, focusing on your breath.'},
+    {'topic': 'Engage in Creative Expression',
+     'explanation': 'Drawing or journaling gives emotions a constructive outlet.',
+     'steps': 'Set aside 30 minutes for drawing or journaling daily.'},
+]
+
+DESCRIPTION = ('Over this period the emotional state was mostly steady, with joy appearing most often '
+               'and occasional moments of sadness and fear that passed quickly.')
+
+
+def prompt_tokens(messages):
+    return sum(len(message.get('content', '')) for message in messages) // 4
+
+
+def completion_text(messages):
+    prompt = ' '.join(message.get('content', '') for message in messages)
+    if 'suggestion' in prompt.lower():
+        return json.dumps(SUGGESTIONS, indent=2)
+    return DESCRIPTION
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, request, content, token_delay):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        tokens = re.findall(r'\s*\S+', content)
+        for index, token in enumerate(tokens):
+            if index and token_delay:
+                time.sleep(token_delay)
+            self._send_chunk(completion_id, request, {'content': token}, None)
+        self._send_chunk(completion_id, request, {}, 'stop')
+        self.wfile.write(b'data: [DONE]\n\n')
+        self.wfile.flush()
+
+    def _send_chunk(self, completion_id, request, delta, finish_reason):
+        chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                 'model': request.get('model', 'gpt-4o'),
+                 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+        self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}', 'type': 'invalid_request_error'}})
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        stub = self.server.stub
+        stub._enter(request)
+        try:
+            time.sleep(stub.latency + stub.prompt_latency * prompt_tokens(request.get('messages', [])) / 1000)
+            if stub.error_status:
+                self._send_json(stub.error_status, {'error': {'message': 'Stub failure', 'type': 'server_error'}},
+                                headers=[('x-should-retry', 'false')])
+                return
+            content = completion_text(request.get('messages', []))
+            if request.get('stream'):
+                self._send_stream(request, content, stub.token_delay)
+                return
+            self._send_json(200, {
+                'id': f'chatcmpl-{uuid.uuid4().hex}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'gpt-4o'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': content}}],
+                'usage': {'prompt_tokens': prompt_tokens(request.get('messages', [])), 'completion_tokens': 0,
+                          'total_tokens': prompt_tokens(request.get('messages', []))},
+            })
+        finally:
+            stub._leave()
+
+
+class StubChatCompletionsServer:
+    """Threaded stand-in server; records requests and peak concurrency."""
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, token_delay=0.0, prompt_latency=0.0,
+                 error_status=None):
+        self.latency = latency
+        self.error_status = error_status
+        self.token_delay = token_delay
+        self.prompt_latency = prompt_latency
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def _enter(self, request):
+        with self._lock:
+            self.requests.append(request)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='llm-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds to wait before every response')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='seconds between streamed words')
+    parser.add_argument('--prompt-latency', type=float, default=0.0, help='extra seconds per 1000 prompt tokens')
+    args = parser.parse_args(argv)
+
+    server = StubChatCompletionsServer(latency=args.latency, host=args.host, port=args.port,
+                                       token_delay=args.token_delay, prompt_latency=args.prompt_latency)
+    print(f'Serving chat completions on {server.url} with {args.latency}s latency')
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,361 @@
+"""Synthetic load generator: many users replaying diary texts from the training corpus.
+
+    python -m tools.loadgen [--users 20] [--concurrency 8] [--duration 30] [--requests N]
+                            [--mix predict_details=70,diary_reports=20,emotion_reports=5,login=5]
+                            [--entries 3] [--url http://127.0.0.1:5000] [--llm-latency 0.5] [--json FILE]
+
+Without --url the app is served in-process by werkzeug's threaded server on
+a temporary SQLite file, with the stub LLM from tools.llm_stub_server (a
+server given by --url must be pointed at a stub itself). Every synthetic
+user first goes through /register and /login and writes ``--entries``
+diary entries through /predict_details; then ``--concurrency``
+clients send requests picked by the ``--mix`` weights for ``--duration``
+seconds or until ``--requests`` have been sent. Diary texts are sampled from
+the emotion corpus. The report has request counts, error rates, throughput,
+latency percentiles and a latency histogram per endpoint.
+"""
+import argparse
+import bisect
+import contextlib
+import csv
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from benchmarks.common import percentile
+
+CORPUS = os.path.join(os.path.dirname(__file__), os.pardir, 'nookbook', 'data', 'emotion_dataset_raw.csv')
+DEFAULT_MIX = 'predict_details=70,diary_reports=20,emotion_reports=5,login=5'
+ENDPOINTS = ('register', 'login', 'predict_details', 'diary_reports', 'emotion_reports')
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PASSWORD = 'loadgen-pass'
+FIRST_DAY = date(2024, 1, 1)
+
+
+def load_texts(path=CORPUS, limit=None, seed=0):
+    """Non-empty diary texts from the corpus CSV, shuffled with ``seed``."""
+    with open(path, newline='', encoding='utf-8') as f:
+        texts = [row['Text'].strip() for row in csv.DictReader(f) if (row.get('Text') or '').strip()]
+    random.Random(seed).shuffle(texts)
+    return texts[:limit] if limit else texts
+
+
+def parse_mix(spec):
+    """'predict_details=70,login=5' -> {'predict_details': 70.0, 'login': 5.0}."""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f'Unknown endpoint {name!r} in --mix; choose from {", ".join(ENDPOINTS)}')
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('--mix needs at least one positive weight')
+    return mix
+
+
+class EndpointStats:
+    """Latency samples, errors and a bucketed histogram for one endpoint."""
+
+    def __init__(self):
+        self.samples = []
+        self.errors = 0
+        self.statuses = {}
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms, status):
+        self.samples.append(elapsed_ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not 200 <= status < 300:
+            self.errors += 1
+        self.histogram[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+    def summary(self, seconds):
+        samples = sorted(self.samples)
+        count = len(samples)
+        return {
+            'requests': count,
+            'errors': self.errors,
+            'error_rate': self.errors / count if count else 0.0,
+            'throughput': count / seconds if seconds else 0.0,
+            'p50_ms': percentile(samples, 50),
+            'p95_ms': percentile(samples, 95),
+            'p99_ms': percentile(samples, 99),
+            'max_ms': samples[-1] if samples else 0.0,
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'histogram': {(f'le_{bound}ms' if i < len(BUCKETS_MS) else f'gt_{BUCKETS_MS[-1]}ms'): n
+                          for i, (bound, n) in enumerate(zip(BUCKETS_MS + (None,), self.histogram))},
+        }
+
+
+class _Client:
+    """One keep-alive connection; reconnects after connection errors."""
+
+    def __init__(self, host, port, timeout):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.conn = None
+
+    def request(self, method, path, payload=None, token=None):
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(payload) if payload is not None else None
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            if response.getheader('Connection', '').lower() == 'close':
+                self.close()
+            return response.status, data
+        except (OSError, http.client.HTTPException):
+            self.close()
+            return 0, b''  # counted as an error
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class LoadGenerator:
+    def __init__(self, host, port, texts, mix, users=20, concurrency=8, duration=30.0, max_requests=None,
+                 seed=0, timeout=60.0, entries=3):
+        self.host, self.port = host, port
+        self.texts = texts
+        self.mix = mix
+        self.users = users
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.seed = seed
+        self.timeout = timeout
+        self.entries = entries
+        self.stats = {name: EndpointStats() for name in ENDPOINTS}
+        self.tokens = {}
+        self._lock = threading.Lock()
+        self._sent = 0
+        self._run_id = f'{int(time.time())}{random.Random(seed).randrange(10 ** 6):06d}'
+
+    def _record(self, name, start, status):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stats[name].add(elapsed_ms, status)
+
+    def _call(self, client, name, method, path, payload=None, token=None):
+        start = time.perf_counter()
+        status, data = client.request(method, path, payload, token)
+        self._record(name, start, status)
+        return status, data
+
+    def _email(self, i):
+        return f'load{self._run_id}-{i}@example.com'
+
+    def _login(self, client, i):
+        status, data = self._call(client, 'login', 'POST', '/login', {'email': self._email(i), 'password': PASSWORD})
+        if status == 200:
+            token = json.loads(data)['data']['access_token']
+            with self._lock:
+                self.tokens[i] = token
+
+    def _predict(self, client, rng, token):
+        day = FIRST_DAY + timedelta(days=rng.randrange(365))
+        self._call(client, 'predict_details', 'POST', '/predict_details',
+                   {'text': rng.choice(self.texts), 'selected_dairy_date': day.isoformat()}, token)
+
+    def _sign_up(self, client, rng, i):
+        """Registers and logs in user ``i`` and writes its first entries; False if it has no token."""
+        self._call(client, 'register', 'POST', '/register',
+                   {'username': self._email(i).split('@')[0], 'email': self._email(i), 'password': PASSWORD})
+        self._login(client, i)
+        if i not in self.tokens:
+            return False
+        for _ in range(self.entries):
+            self._predict(client, rng, self.tokens[i])
+        return True
+
+    def _setup_loop(self, worker, indexes):
+        rng = random.Random(self.seed * 1000 - worker - 1)
+        client = _Client(self.host, self.port, self.timeout)
+        for i in indexes:
+            self._sign_up(client, rng, i)
+        client.close()
+
+    def _next_slot(self, deadline):
+        with self._lock:
+            if time.monotonic() >= deadline or (self.max_requests is not None and self._sent >= self.max_requests):
+                return False
+            self._sent += 1
+            return True
+
+    def _client_loop(self, worker, deadline):
+        rng = random.Random(self.seed * 1000 + worker)
+        client = _Client(self.host, self.port, self.timeout)
+        names, weights = zip(*self.mix.items())
+        users = list(self.tokens)
+        while users and self._next_slot(deadline):
+            i = rng.choice(users)
+            name = rng.choices(names, weights)[0]
+            token = self.tokens[i]
+            if name == 'predict_details':
+                self._predict(client, rng, token)
+            elif name == 'diary_reports':
+                self._call(client, name, 'GET', '/diary-reports?limit=100', token=token)
+            elif name == 'emotion_reports':
+                # The whole year, so users with a few entries still get a report instead of a 404
+                self._call(client, name, 'POST', '/emotion-reports', {'start_date': FIRST_DAY.isoformat(),
+                           'end_date': (FIRST_DAY + timedelta(days=364)).isoformat()}, token)
+            elif name == 'login':
+                self._login(client, i)
+            else:  # register: a brand-new user that signs up and then takes part in the run
+                with self._lock:
+                    new = self.users
+                    self.users += 1
+                if self._sign_up(client, rng, new):
+                    users.append(new)
+        client.close()
+
+    def _run_threads(self, target, args_list):
+        threads = [threading.Thread(target=target, args=args) for args in args_list]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run(self):
+        """Signs the users up, runs the mix and returns the report dict."""
+        started = time.perf_counter()
+        self._run_threads(self._setup_loop, [(worker, range(worker, self.users, self.concurrency))
+                                          for worker in range(min(self.concurrency, self.users))])
+        setup_seconds = time.perf_counter() - started
+        setup = {name: stats.summary(setup_seconds) for name, stats in self.stats.items() if stats.samples}
+        self.stats = {name: EndpointStats() for name in ENDPOINTS}
+
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.duration
+        self._run_threads(self._client_loop, [(worker, deadline) for worker in range(self.concurrency)])
+        seconds = time.perf_counter() - started
+
+        endpoints = {name: stats.summary(seconds) for name, stats in self.stats.items() if stats.samples}
+        total = sum(summary['requests'] for summary in endpoints.values())
+        errors = sum(summary['errors'] for summary in endpoints.values())
+        return {
+            'users': len(self.tokens),
+            'concurrency': self.concurrency,
+            'seconds': seconds,
+            'setup': setup,
+            'endpoints': endpoints,
+            'total': {'requests': total, 'errors': errors, 'error_rate': errors / total if total else 0.0,
+                      'throughput': total / seconds if seconds else 0.0},
+        }
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+@contextlib.contextmanager
+def local_server(llm_latency=0.5, config_name='TestingConfig', **config):
+    """Serves a fresh app on a temporary SQLite file with a stub LLM; yields (host, port)."""
+    from app import create_app, db
+    from tools.llm_stub_server import StubChatCompletionsServer
+
+    with tempfile.TemporaryDirectory() as tmp, StubChatCompletionsServer(latency=llm_latency) as stub:
+        app = create_app(config_name, overrides={
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(tmp, "loadgen.sqlite3")}',
+            'OPENAI_BASE_URL': stub.url, 'OPENAI_API_KEY': 'loadgen', **config})
+        with app.app_context():
+            db.create_all()
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, name='loadgen-app', daemon=True)
+        thread.start()
+        try:
+            yield server.server_address[:2]
+        finally:
+            server.shutdown()
+            server.server_close()
+            with app.app_context():
+                db.engine.dispose()
+
+
+def format_report(report):
+    lines = [f"{report['users']} users, {report['concurrency']} clients, {report['seconds']:.1f}s: "
+             f"{report['total']['requests']} requests, {report['total']['throughput']:.1f} req/s, "
+             f"{report['total']['error_rate']:.1%} errors", '']
+    header = f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    sections = [('setup', report['setup']), ('run', report['endpoints'])]
+    for title, endpoints in sections:
+        lines += [f'[{title}]', header]
+        for name, summary in endpoints.items():
+            lines.append(f"{name:<18}{summary['requests']:>9}{summary['error_rate']:>8.1%}"
+                         f"{summary['throughput']:>9.1f}{summary['p50_ms']:>10.1f}{summary['p95_ms']:>10.1f}"
+                         f"{summary['p99_ms']:>10.1f}")
+        lines.append('')
+
+    lines.append('latency histograms (ms)')
+    for name, summary in report['endpoints'].items():
+        lines.append(f'  {name}')
+        peak = max(summary['histogram'].values()) or 1
+        for bucket, count in summary['histogram'].items():
+            if count:
+                lines.append(f"    {bucket:<12}{count:>7} {'#' * max(1, round(40 * count / peak))}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of mixed traffic after sign-up')
+    parser.add_argument('--requests', type=int, default=None, help='stop after this many mixed requests')
+    parser.add_argument('--entries', type=int, default=3, help='diary entries each user writes during sign-up')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'endpoint=weight pairs from {", ".join(ENDPOINTS)}')
+    parser.add_argument('--url', default=None, help='target a running server instead of an in-process one')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='stub LLM seconds per completion')
+    parser.add_argument('--corpus', default=CORPUS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-request timeout in seconds')
+    parser.add_argument('--json', default=None, help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    texts = load_texts(args.corpus, seed=args.seed)
+
+    def run(host, port):
+        generator = LoadGenerator(host, port, texts, mix, users=args.users, concurrency=args.concurrency,
+                                  duration=args.duration, max_requests=args.requests, seed=args.seed,
+                                  timeout=args.timeout, entries=args.entries)
+        return generator.run()
+
+    if args.url:
+        target = urlsplit(args.url)
+        report = run(target.hostname, target.port or 80)
+    else:
+        with local_server(args.llm_latency) as (host, port):
+            report = run(host, port)
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    return 1 if report['total']['requests'] and report['total']['error_rate'] == 1 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Prunes and float32-quantizes the emotion classifier and reports accuracy against size and speed.
+
+    python -m tools.prune_model [--model models/emotion_classifier_pipe_lr.pkl]
+                                [--min-df 1,2,3] [--min-weight 0,0.1,0.25,0.5]
+                                [--max-accuracy-drop 0.005] [--out models/emotion_classifier_pruned.pkl]
+
+Every (min_df, min_weight) pair is an operating point: terms seen in fewer
+than min_df training texts, or whose largest absolute weight is below
+min_weight, are dropped and the weights stored as float32. Each point is
+saved, reloaded and scored on the held-out split from app/training.py next
+to the original. With ``--out`` the smallest point within
+``--max-accuracy-drop`` of the original's accuracy is written there; serve
+it with EMOTION_MODEL_PATH, or convert it with tools/export_compact_model.py.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import warnings
+
+import joblib
+
+from app.model_pruning import document_frequencies, prune_pipeline, select_features
+from app.prediction import load_model
+from app.training import DATASET, evaluate, load_dataset, split_dataset
+
+# Report columns: (title, row key, width, format)
+COLUMNS = (('min_df', 'min_df', 7, ''), ('min_weight', 'min_weight', 11, '.2f'),
+           ('features', 'n_features', 9, ','), ('accuracy', 'accuracy', 9, '.4f'),
+           ('size_kb', 'size_kb', 9, ',.0f'), ('load_ms', 'load_time_ms', 8, '.1f'),
+           ('p50_ms', 'latency_p50_ms', 7, '.3f'), ('p95_ms', 'latency_p95_ms', 7, '.3f'))
+
+
+def _numbers(text, kind=float):
+    return [kind(float(value)) for value in text.split(',')]
+
+
+def sweep(model, x_train, x_test, y_test, min_dfs, min_weights, work_dir, latency_samples=200):
+    """Scores the original and every pruned operating point; returns one row per model, original first."""
+    original_path = os.path.join(work_dir, 'original.pkl')
+    joblib.dump(model, original_path)
+    rows = [{'name': 'original', 'path': original_path, 'min_df': None, 'min_weight': None,
+             'n_features': model.steps[-1][1].coef_.shape[1],
+             **evaluate(model, x_test, y_test, original_path, latency_samples)}]
+
+    doc_freq = document_frequencies(model, x_train)
+    for min_df in min_dfs:
+        for min_weight in min_weights:
+            pruned = prune_pipeline(model, select_features(model, doc_freq, min_df, min_weight))
+            path = os.path.join(work_dir, f'pruned-df{min_df}-w{min_weight:g}.pkl')
+            joblib.dump(pruned, path)
+            rows.append({'name': os.path.basename(path), 'path': path, 'min_df': min_df, 'min_weight': min_weight,
+                         'n_features': pruned.steps[-1][1].coef_.shape[1],
+                         **evaluate(pruned, x_test, y_test, path, latency_samples)})
+    return rows
+
+
+def pick(rows, max_accuracy_drop):
+    """The smallest pruned row whose accuracy is within ``max_accuracy_drop`` of the original, if any."""
+    floor = rows[0]['accuracy'] - max_accuracy_drop
+    candidates = [row for row in rows[1:] if row['accuracy'] >= floor]
+    return min(candidates, key=lambda row: row['size_bytes']) if candidates else None
+
+
+def format_report(rows):
+    lines = [' '.join(f'{title:>{width}}' for title, _, width, _ in COLUMNS)]
+    for row in rows:
+        row = dict(row, size_kb=row['size_bytes'] / 1024)
+        lines.append(' '.join(f'{"-" if row[key] is None else format(row[key], spec):>{width}}'
+                              for _, key, width, spec in COLUMNS))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=os.path.join('models', 'emotion_classifier_pipe_lr.pkl'))
+    parser.add_argument('--dataset', default=DATASET)
+    parser.add_argument('--min-df', default='1,2,3', help='minimum training document frequencies, comma separated')
+    parser.add_argument('--min-weight', default='0,0.1,0.25,0.5',
+                        help='minimum largest absolute term weights, comma separated')
+    parser.add_argument('--latency-samples', type=int, default=200)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.005)
+    parser.add_argument('--out', help='write the picked operating point to this joblib file')
+    args = parser.parse_args(argv)
+    warnings.simplefilter('ignore', UserWarning)  # the bundled pickle predates this sklearn
+
+    model = load_model(args.model)
+    x_train, x_test, _, y_test = split_dataset(*load_dataset(args.dataset))
+    work_dir = tempfile.mkdtemp(prefix='prune-model-')
+    try:
+        rows = sweep(model, x_train, x_test, y_test, _numbers(args.min_df, int), _numbers(args.min_weight),
+                     work_dir, args.latency_samples)
+        print(format_report(rows))
+        chosen = pick(rows, args.max_accuracy_drop)
+        if chosen is None:
+            print(f'No operating point within {args.max_accuracy_drop} accuracy of the original')
+        else:
+            print(f"Smallest within {args.max_accuracy_drop} accuracy: min_df={chosen['min_df']} "
+                  f"min_weight={chosen['min_weight']:g} ({chosen['size_bytes'] / rows[0]['size_bytes']:.0%} "
+                  f"of the original size)")
+            if args.out:
+                os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+                shutil.copyfile(chosen['path'], args.out)
+                print(f'Wrote {args.out}')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Cold-start timing report: import and initialization cost per component.
+
+    python -m tools.startup_report [--config TestingConfig] [--no-warm-up] [--json]
+
+Run it in a fresh interpreter (it is only meaningful as the first thing the
+process does). Third-party imports are timed in dependency order, so a
+package's cost excludes anything an earlier row already imported. The app
+rows come from the timings create_app() and warm_up() record.
+
+Costs are split in two columns: eager (paid by importing the app and
+create_app(), i.e. by every CLI command and test run) and lazy (the
+model/LLM imports and warm_up(), paid once per serving process). Lazy
+imports are timed right before warm_up(), so its rows exclude them.
+"""
+import argparse
+import importlib
+import json
+import sys
+import time
+
+# Imported by the app package itself
+EAGER_IMPORTS = [
+    'werkzeug',
+    'sqlalchemy',
+    'flask',
+    'flask_sqlalchemy',
+    'flask_migrate',
+    'flask_jwt_extended',
+    'flask_cors',
+]
+
+# Deferred until the model or LLM client is first used (see app.warm_up)
+LAZY_IMPORTS = [
+    'numpy',
+    'scipy.sparse',
+    'sklearn',
+    'joblib',
+    'dotenv',
+    'openai',
+]
+
+
+def _timed_import(name):
+    start = time.perf_counter()
+    importlib.import_module(name)
+    return time.perf_counter() - start
+
+
+def collect(config_name=None, warm=True):
+    """Returns (component, eager seconds, lazy seconds) rows; the column that does not apply is None."""
+    rows = []
+    if 'app' in sys.modules:
+        raise RuntimeError('The app package is already imported; run the report in a fresh process')
+
+    for name in EAGER_IMPORTS:
+        rows.append((f'import {name}', _timed_import(name), None))
+    rows.append(('import app', _timed_import('app'), None))
+
+    from app import create_app, warm_up
+    from app.startup import get_startup_timings
+
+    start = time.perf_counter()
+    app = create_app(config_name)
+    total_create = time.perf_counter() - start
+
+    for name in LAZY_IMPORTS:
+        rows.append((f'import {name}', None, _timed_import(name)))
+    if warm:
+        warm_up(app)
+
+    for component, seconds in get_startup_timings(app).items():
+        if component.startswith('warm_up.'):
+            rows.append((f'app {component}', None, seconds))
+        else:
+            rows.append((f'app {component}', seconds, None))
+    rows.append(('create_app total', total_create, None))
+    return rows
+
+
+def _ms(seconds):
+    return '' if seconds is None else f'{seconds * 1000:.1f}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config', default=None, help='instance.config class name')
+    parser.add_argument('--no-warm-up', action='store_true', help='skip app.warm_up()')
+    parser.add_argument('--json', action='store_true', help='print machine readable output')
+    args = parser.parse_args(argv)
+
+    process_start = time.perf_counter()
+    rows = collect(args.config, warm=not args.no_warm_up)
+    total = time.perf_counter() - process_start
+
+    # create_app total repeats its component rows
+    eager_total = sum(eager for name, eager, _ in rows if eager is not None and name != 'create_app total')
+    lazy_total = sum(lazy for _, _, lazy in rows if lazy is not None)
+
+    if args.json:
+        print(json.dumps({'eager': {name: eager for name, eager, _ in rows if eager is not None},
+                          'lazy': {name: lazy for name, _, lazy in rows if lazy is not None},
+                          'eager_total': eager_total, 'lazy_total': lazy_total, 'total': total}, indent=2))
+        return
+
+    width = max(len(name) for name, _, _ in rows)
+    print(f"{'component':<{width}}  {'eager ms':>9}  {'lazy ms':>9}")
+    for name, eager, lazy in rows:
+        print(f'{name:<{width}}  {_ms(eager):>9}  {_ms(lazy):>9}')
+    print(f"{'sum':<{width}}  {_ms(eager_total):>9}  {_ms(lazy_total):>9}")
+    print(f"{'total':<{width}}  {_ms(total):>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Trains the emotion classifier offline and writes a versioned artifact with its metrics.
+
+    python -m tools.train_model [--vectorizer count|hashing] [--n-features 65536,262144]
+                                [--C 0.3,1,3] [--cv 3] [--jobs -1] [--out models]
+                                [--baseline models/emotion_classifier_pipe_lr.pkl]
+
+The artifact lands in ``<out>/emotion-lr-<vectorizer>-<UTC timestamp>/``;
+serve it with EMOTION_MODEL_PATH=<that dir>/model.pkl. The new model and the
+baseline are scored on the same held-out split and printed side by side.
+"""
+import argparse
+import os
+import warnings
+
+from app.training import DATASET, VECTORIZERS, train
+
+# Report rows: metric -> format
+METRICS = {'accuracy': '.4f', 'size_bytes': ',.0f', 'load_time_ms': '.2f', 'latency_p50_ms': '.3f',
+           'latency_p95_ms': '.3f', 'batch_texts_per_s': ',.0f'}
+
+
+def _numbers(text, kind=float):
+    return [kind(float(value)) for value in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', default=DATASET)
+    parser.add_argument('--vectorizer', choices=VECTORIZERS, default='count')
+    parser.add_argument('--n-features', default=str(2 ** 16), help='hashing widths to search, comma separated')
+    parser.add_argument('--C', default='0.3,1,3', help='LogisticRegression C values to search, comma separated')
+    parser.add_argument('--cv', type=int, default=3, help='cross-validation folds')
+    parser.add_argument('--jobs', type=int, default=-1, help='parallel fits (-1: all cores)')
+    parser.add_argument('--max-iter', type=int, default=1000)
+    parser.add_argument('--no-clean', action='store_true', help='keep stop words and @user handles as features')
+    parser.add_argument('--out', default='models', help='directory for the versioned artifact')
+    parser.add_argument('--baseline', default=os.path.join('models', 'emotion_classifier_pipe_lr.pkl'),
+                        help="model to compare against ('' to skip)")
+    args = parser.parse_args(argv)
+    warnings.simplefilter('ignore', UserWarning)  # the bundled pickle predates this sklearn
+
+    info = train(args.dataset, args.out, args.vectorizer, c_values=_numbers(args.C),
+                 n_features=_numbers(args.n_features, int), cv=args.cv, n_jobs=args.jobs, max_iter=args.max_iter,
+                 clean=not args.no_clean, baseline=args.baseline or None)
+
+    columns = {info['version']: info['metrics']}
+    if 'baseline' in info:
+        columns['baseline'] = info['baseline']
+    width = max(len(name) for name in columns) + 2
+    print(f"{'metric':<20}" + ''.join(f'{name:>{width}}' for name in columns))
+    for metric, spec in METRICS.items():
+        print(f'{metric:<20}' + ''.join(f'{values[metric]:>{width}{spec}}' for values in columns.values()))
+    print(f"Wrote {os.path.join(args.out, info['version'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# Entry point for production workers, e.g. `gunicorn wsgi:app`.
+# Each worker imports this module once and warms up before serving traffic.
+from app import create_app, warm_up
+
+app = warm_up(create_app())